@@ -69,18 +69,50 @@ def on_kafka_relation_created(self, event: RelationCreatedEvent):
     for message in client.messages():
         logger.info(message)
 ```
+
+`KafkaClient` can be used as a context manager, closing all the clients it created on exit.
+Request and connection timeouts can be bounded, e.g for short-lived checks in charm hooks:
+```python
+with KafkaClient(
+    servers=bootstrap_servers,
+    username=username,
+    password=password,
+    security_protocol="SASL_PLAINTEXT",
+    request_timeout_ms=5000,
+    connection_timeout_ms=5000,
+) as client:
+    client.describe_topics([topic])
+```
+
+`AsyncKafkaClient` offers the same interface for asyncio code:
+```python
+async with AsyncKafkaClient(
+    servers=bootstrap_servers,
+    username=username,
+    password=password,
+    security_protocol="SASL_PLAINTEXT",
+    request_timeout_ms=5000,
+) as client:
+    await client.describe_topics([topic])
+```
 """
 from __future__ import annotations
 
 import argparse
+import asyncio
 import logging
 import time
 import sys
 from functools import cached_property
-from typing import Generator, List, Optional
+from types import TracebackType
+from typing import Any, Dict, Generator, List, Optional, Set, Type
 
-from kafka import KafkaAdminClient, KafkaConsumer, KafkaProducer
+from kafka import KafkaAdminClient, KafkaConsumer, KafkaProducer, TopicPartition
+from kafka import KafkaClient as KafkaNetworkClient
 from kafka.admin import NewTopic
+from kafka.errors import KafkaTimeoutError
+from kafka.protocol.admin import DescribeLogDirsRequest
+from kafka.structs import GroupInformation, OffsetAndMetadata
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(stream=sys.stdout, level=logging.INFO)
@@ -93,13 +125,19 @@ LIBAPI = 0
 
 # Increment this PATCH version before using `charmcraft publish-lib` or reset
 # to 0 if you are raising the major API version
-LIBPATCH = 2
+LIBPATCH = 3
 
 
 class KafkaClient:
-    """Simplistic KafkaClient built on top of kafka-python."""
+    """Simplistic KafkaClient built on top of kafka-python.
+
+    `connection_timeout_ms` bounds the API version probe and the reconnection backoff of the
+    clients. Unset, kafka-python's own defaults apply.
+    """
 
     API_VERSION = (2, 5, 0)
+    # kafka-python's default `api_version_auto_timeout_ms`
+    DEFAULT_CONNECTION_TIMEOUT_MS = 2000
 
     def __init__(
         self,
@@ -111,6 +149,8 @@ class KafkaClient:
         certfile_path: Optional[str] = None,
         keyfile_path: Optional[str] = None,
         replication_factor: int = 3,
+        request_timeout_ms: int = 30000,
+        connection_timeout_ms: Optional[int] = None,
     ) -> None:
         self.servers = servers
         self.username = username
@@ -120,6 +160,8 @@ class KafkaClient:
         self.certfile_path = certfile_path
         self.keyfile_path = keyfile_path
         self.replication_factor = replication_factor
+        self.request_timeout_ms = request_timeout_ms
+        self.connection_timeout_ms = connection_timeout_ms
 
         self.sasl = "SASL" in self.security_protocol
         self.ssl = "SSL" in self.security_protocol
@@ -128,37 +170,40 @@ class KafkaClient:
         self._subscription = None
         self._consumer_group_prefix = None
 
+    @property
+    def _common_config(self) -> Dict[str, Any]:
+        """Connection settings shared by all the clients."""
+        config: Dict[str, Any] = {
+            "bootstrap_servers": self.servers,
+            "ssl_check_hostname": False,
+            "security_protocol": self.security_protocol,
+            "sasl_plain_username": self.username if self.sasl else None,
+            "sasl_plain_password": self.password if self.sasl else None,
+            "sasl_mechanism": "SCRAM-SHA-512" if self.sasl else None,
+            "ssl_cafile": self.cafile_path if self.ssl else None,
+            "ssl_certfile": self.certfile_path if self.ssl else None,
+            "ssl_keyfile": self.keyfile_path if self.mtls else None,
+            "api_version": KafkaClient.API_VERSION if self.mtls else None,
+            "request_timeout_ms": self.request_timeout_ms,
+        }
+        if self.connection_timeout_ms is not None:
+            config.update(
+                api_version_auto_timeout_ms=self.connection_timeout_ms,
+                reconnect_backoff_max_ms=self.connection_timeout_ms,
+            )
+
+        return config
+
     @cached_property
     def _admin_client(self) -> KafkaAdminClient:
         """Initialises and caches a `KafkaAdminClient`."""
-        return KafkaAdminClient(
-            client_id=self.username,
-            bootstrap_servers=self.servers,
-            ssl_check_hostname=False,
-            security_protocol=self.security_protocol,
-            sasl_plain_username=self.username if self.sasl else None,
-            sasl_plain_password=self.password if self.sasl else None,
-            sasl_mechanism="SCRAM-SHA-512" if self.sasl else None,
-            ssl_cafile=self.cafile_path if self.ssl else None,
-            ssl_certfile=self.certfile_path if self.ssl else None,
-            ssl_keyfile=self.keyfile_path if self.mtls else None,
-            api_version=KafkaClient.API_VERSION if self.mtls else None,
-        )
+        return KafkaAdminClient(client_id=self.username, **self._common_config)
 
     @cached_property
     def _producer_client(self) -> KafkaProducer:
         """Initialises and caches a `KafkaProducer`."""
         return KafkaProducer(
-            bootstrap_servers=self.servers,
-            ssl_check_hostname=False,
-            security_protocol=self.security_protocol,
-            sasl_plain_username=self.username if self.sasl else None,
-            sasl_plain_password=self.password if self.sasl else None,
-            sasl_mechanism="SCRAM-SHA-512" if self.sasl else None,
-            ssl_cafile=self.cafile_path if self.ssl else None,
-            ssl_certfile=self.certfile_path if self.ssl else None,
-            ssl_keyfile=self.keyfile_path if self.mtls else None,
-            api_version=KafkaClient.API_VERSION if self.mtls else None,
+            **self._common_config,
             acks="all",
             retries=10,
             retry_backoff_ms=1000,
@@ -167,27 +212,169 @@ class KafkaClient:
     @cached_property
     def _consumer_client(self) -> KafkaConsumer:
         """Initialises and caches a `KafkaConsumer`."""
+        # consumers require the request timeout to be larger than the session timeout
+        session_timeout_ms = min(10000, self.request_timeout_ms // 2)
         return KafkaConsumer(
-            bootstrap_servers=self.servers,
-            ssl_check_hostname=False,
-            security_protocol=self.security_protocol,
-            sasl_plain_username=self.username if self.sasl else None,
-            sasl_plain_password=self.password if self.sasl else None,
-            sasl_mechanism="SCRAM-SHA-512" if self.sasl else None,
-            ssl_cafile=self.cafile_path if self.ssl else None,
-            ssl_certfile=self.certfile_path if self.ssl else None,
-            ssl_keyfile=self.keyfile_path if self.mtls else None,
-            api_version=KafkaClient.API_VERSION if self.mtls else None,
+            **self._common_config,
             group_id=self._consumer_group_prefix,
             enable_auto_commit=True,
             auto_offset_reset="earliest",
             consumer_timeout_ms=15000,
+            session_timeout_ms=session_timeout_ms,
+            heartbeat_interval_ms=session_timeout_ms // 3,
         )
 
+    def __enter__(self) -> "KafkaClient":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
     def describe_topics(self, topics: list[str]) -> str:
         """Check wether a connection can be made."""
         return self._admin_client.describe_topics(topics=topics)
 
+    def describe_consumer_group(self, group_id: str) -> GroupInformation:
+        """Describes the state and members of a consumer group.
+
+        Args:
+            group_id: the consumer group to describe
+        """
+        return self._admin_client.describe_consumer_groups([group_id])[0]
+
+    def list_consumer_group_offsets(self, group_id: str) -> Dict[TopicPartition, OffsetAndMetadata]:
+        """Lists the committed offsets of a consumer group.
+
+        Args:
+            group_id: the consumer group to list the offsets of
+        """
+        return self._admin_client.list_consumer_group_offsets(group_id)
+
+    def topic_size(self, topic_name: str) -> Dict[int, int]:
+        """Size in bytes of the replicas of a topic, by broker id.
+
+        A broker only reports the log dirs it hosts, so each broker holding a replica of the
+        topic is asked in turn. Brokers without any replica are not reported.
+
+        Args:
+            topic_name: the topic to get the size of
+        """
+        partitions: Dict[int, List[int]] = {}
+        for topic in self._admin_client.describe_topics([topic_name]):
+            for partition in topic["partitions"]:
+                for broker in partition["replicas"]:
+                    partitions.setdefault(broker, []).append(partition["partition"])
+
+        sizes = {}
+        network_client = KafkaNetworkClient(client_id=self.username, **self._common_config)
+        try:
+            for broker, broker_partitions in sorted(partitions.items()):
+                request = DescribeLogDirsRequest[0](topics=[(topic_name, broker_partitions)])
+                response = self._send_to_broker(network_client, broker, request)
+                sizes[broker] = sum(
+                    partition[1]
+                    for log_dir in response.log_dirs
+                    for topic in log_dir[2]
+                    if topic[0] == topic_name
+                    for partition in topic[1]
+                )
+        finally:
+            network_client.close()
+
+        return sizes
+
+    def _send_to_broker(self, network_client: KafkaNetworkClient, broker: int, request: Any):
+        """Sends a request to a given broker, and waits for its response.
+
+        Raises:
+            KafkaTimeoutError if the broker can't be connected to within the request timeout
+        """
+        deadline = time.monotonic() + self.request_timeout_ms / 1000
+        while not network_client.ready(broker):
+            if time.monotonic() > deadline:
+                raise KafkaTimeoutError(f"Broker {broker} not ready")
+            network_client.poll(timeout_ms=100)
+
+        # in-flight requests fail on their own after the request timeout
+        future = network_client.send(broker, request)
+        network_client.poll(future=future)
+        if future.failed():
+            raise future.exception
+
+        return future.value
+
+    def topic_offsets(
+        self, topic_name: str
+    ) -> tuple[Dict[TopicPartition, int], Dict[TopicPartition, int]]:
+        """Gets the beginning and end offsets of all partitions of a topic.
+
+        Args:
+            topic_name: the topic to get the offsets of
+
+        Returns:
+            Tuple of beginning and end offsets, by partition
+        """
+        reader = self._topic_reader()
+        try:
+            partitions = [
+                TopicPartition(topic_name, partition)
+                for partition in reader.partitions_for_topic(topic_name) or []
+            ]
+            return reader.beginning_offsets(partitions), reader.end_offsets(partitions)
+        finally:
+            reader.close()
+
+    def read_topic(self, topic_name: str, max_records: Optional[int] = None) -> Generator:
+        """Reads a topic from its beginning up to the current end offsets.
+
+        Does not join or commit offsets for any consumer group.
+
+        Args:
+            topic_name: the topic to read
+            max_records: (optional) stop after reading this many records
+
+        Returns:
+            Generator of consumer records
+        """
+        reader = self._topic_reader()
+        try:
+            partitions = [
+                TopicPartition(topic_name, partition)
+                for partition in reader.partitions_for_topic(topic_name) or []
+            ]
+            end_offsets = reader.end_offsets(partitions)
+            reader.assign(partitions)
+            reader.seek_to_beginning()
+
+            def caught_up() -> bool:
+                return all(reader.position(tp) >= end for tp, end in end_offsets.items())
+
+            if caught_up():
+                return
+
+            read = 0
+            for record in reader:
+                yield record
+                read += 1
+                if caught_up() or (max_records is not None and read >= max_records):
+                    return
+        finally:
+            reader.close()
+
+    def _topic_reader(self) -> KafkaConsumer:
+        """Initialises a short-lived `KafkaConsumer` outside of any consumer group."""
+        return KafkaConsumer(
+            **self._common_config,
+            group_id=None,
+            enable_auto_commit=False,
+            consumer_timeout_ms=self.request_timeout_ms,
+        )
+
     def create_topic(self, topic: NewTopic) -> None:
         """Creates a new topic on the Kafka cluster.
 
@@ -263,10 +450,85 @@ class KafkaClient:
         logger.debug(f"Message published to topic={topic_name}, message content: {item_content}")
 
     def close(self) -> None:
-        """Close the connection to the client."""
-        self._admin_client.close()
-        self._producer_client.close()
-        self._consumer_client.close()
+        """Close the connections of the clients created so far."""
+        for client in ["_admin_client", "_producer_client", "_consumer_client"]:
+            # cached_property stores created clients on the instance dict
+            if client in self.__dict__:
+                self.__dict__.pop(client).close()
+
+
+class AsyncKafkaClient:
+    """Asyncio interface to `KafkaClient`.
+
+    kafka-python only offers blocking clients, so calls run in a worker thread, each bounded
+    by the request timeout. The event loop is never blocked on Kafka I/O.
+
+    Threads can't be cancelled: a call that timed out keeps running in its worker thread
+    until kafka-python gives up on its own, i.e after its request timeout. `close()` waits
+    for these abandoned calls before closing the clients they use.
+    """
+
+    def __init__(self, **kwargs) -> None:
+        self._client = KafkaClient(**kwargs)
+        # leave room for the connection to be established before the request is sent
+        connection_timeout_ms = self._client.connection_timeout_ms
+        if connection_timeout_ms is None:
+            connection_timeout_ms = KafkaClient.DEFAULT_CONNECTION_TIMEOUT_MS
+        self._timeout = (self._client.request_timeout_ms + connection_timeout_ms) / 1000
+        self._calls: Set[asyncio.Future] = set()
+
+    async def _run(self, func, *args, **kwargs):
+        call = asyncio.ensure_future(asyncio.to_thread(func, *args, **kwargs))
+        self._calls.add(call)
+        call.add_done_callback(self._forget)
+        # shielded, so that the call is still tracked after the wait is cancelled
+        return await asyncio.wait_for(asyncio.shield(call), timeout=self._timeout)
+
+    def _forget(self, call: asyncio.Future) -> None:
+        """Stops tracking a finished call, retrieving its outcome if nobody waits for it."""
+        self._calls.discard(call)
+        if not call.cancelled():
+            call.exception()
+
+    async def __aenter__(self) -> "AsyncKafkaClient":
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        await self.close()
+
+    async def describe_topics(self, topics: list[str]) -> str:
+        """See `KafkaClient.describe_topics`."""
+        return await self._run(self._client.describe_topics, topics)
+
+    async def create_topic(self, topic: NewTopic) -> None:
+        """See `KafkaClient.create_topic`."""
+        await self._run(self._client.create_topic, topic)
+
+    async def delete_topics(self, topics: list[str]) -> None:
+        """See `KafkaClient.delete_topics`."""
+        await self._run(self._client.delete_topics, topics)
+
+    async def produce_message(
+        self, topic_name: str, message_content: str, timeout: int = 30
+    ) -> None:
+        """See `KafkaClient.produce_message`."""
+        await self._run(self._client.produce_message, topic_name, message_content, timeout)
+
+    async def close(self) -> None:
+        """Close the connections of the clients created so far.
+
+        Calls still running after a timeout are waited for first.
+        """
+        if self._calls:
+            await asyncio.wait(set(self._calls))
+
+        # closing must not be cancelled halfway, so it is not bounded by the timeout
+        await asyncio.to_thread(self._client.close)
 
 
 if __name__ == "__main__":
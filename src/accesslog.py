@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Summarises the latency of a Karapace access log, per route.
+
+Runs inside the workload container, with the standard library only. The log is read one
+line at a time, and reading stops after a maximum number of entries, so that the memory and
+time spent stay bounded on busy units. The report is printed as JSON.
+
+Usage:
+    python3 accesslog.py <access log> <max entries>
+"""
+
+import json
+import math
+import re
+import sys
+from typing import Iterable
+
+# e.g `0.001234s 10.1.0.5 "GET /subjects/orders-value/versions HTTP/1.1" 200 ...`
+ENTRY = re.compile(r'(?P<seconds>\d+(?:\.\d+)?)s .*?"(?P<method>[A-Z]+) (?P<path>\S+) HTTP/')
+
+# path segments followed by a variable one, and the placeholder it is replaced with
+VARIABLES = {
+    "ids": "{id}",
+    "subjects": "{subject}",
+    "versions": "{version}",
+    "config": "{subject}",
+    "mode": "{subject}",
+}
+
+PERCENTILES = [50, 95, 99]
+
+
+def route(path: str) -> str:
+    """The route pattern of a request path, e.g `/schemas/ids/{id}` for `/schemas/ids/3`."""
+    segments = path.split("?", maxsplit=1)[0].strip("/").split("/")
+    for i in range(1, len(segments)):
+        if placeholder := VARIABLES.get(segments[i - 1]):
+            segments[i] = placeholder
+
+    return "/" + "/".join(segments)
+
+
+def percentile(latencies: list[float], pct: int) -> float:
+    """The nearest-rank percentile of sorted latencies."""
+    return latencies[max(0, math.ceil(pct / 100 * len(latencies)) - 1)]
+
+
+def report(lines: Iterable[str], max_entries: int) -> dict:
+    """Request counts and latency percentiles in ms, per method and route pattern."""
+    latencies: dict[str, list[float]] = {}
+    entries = 0
+    for line in lines:
+        if entries >= max_entries:
+            break
+
+        if not (match := ENTRY.search(line)):
+            continue
+
+        entries += 1
+        key = f"{match['method']} {route(match['path'])}"
+        latencies.setdefault(key, []).append(float(match["seconds"]) * 1000)
+
+    routes = {}
+    for key, values in latencies.items():
+        values.sort()
+        routes[key] = {"count": len(values)} | {
+            f"p{pct}-ms": round(percentile(values, pct), 2) for pct in PERCENTILES
+        }
+
+    return {"entries": entries, "truncated": entries >= max_entries, "routes": routes}
+
+
+def main(path: str, max_entries: int) -> None:
+    """Prints the report of an access log."""
+    try:
+        with open(path, errors="replace") as f:
+            print(json.dumps(report(f, max_entries)))
+    except FileNotFoundError:
+        print(json.dumps(report([], max_entries)))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1], int(sys.argv[2]))
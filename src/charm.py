@@ -8,18 +8,25 @@ import logging
 
 import ops
 from charms.data_platform_libs.v0.data_models import TypedCharmBase
+from cosl import JujuTopology
 
 from core.cluster import ClusterContext
 from core.structured_config import CharmConfig
 from events.kafka import KafkaHandler
+from events.logging import LoggingHandler
+from events.metrics import MetricsHandler
 from events.password_actions import PasswordActionEvents
 from events.provider import KarapaceHandler
+from events.restart import RestartHandler
 from events.tls import TLSHandler
 from literals import CHARM_KEY, CONTAINER, DebugLevel, Status, Substrate
+from managers.access_log import AccessLogManager
 from managers.auth import KarapaceAuth
 from managers.config import ConfigManager
+from managers.health import HealthManager
 from managers.k8s import K8sManager
 from managers.kafka import KafkaManager
+from managers.metrics import MetricsManager
 from managers.tls import TLSManager
 from workload import KarapaceWorkload
 
@@ -37,7 +44,15 @@ class KarapaceCharm(TypedCharmBase[CharmConfig]):
         self.name = CHARM_KEY
         self.substrate: Substrate = "k8s"
         self.context = ClusterContext(charm=self, substrate=self.substrate)
-        self.workload = KarapaceWorkload(container=self.unit.get_container(CONTAINER))
+        topology = JujuTopology.from_charm(self).as_dict(remapped_keys={"charm_name": "charm"})
+        self.workload = KarapaceWorkload(
+            container=self.unit.get_container(CONTAINER),
+            workers=self.config.workers,
+            access_log_sampling=self.config.access_log_sampling,
+            access_log_capture=self.context.capturing_access_log,
+            log_endpoints=lambda: self.context.loki_endpoints,
+            log_labels={f"juju_{key}": value for key, value in topology.items()},
+        )
 
         # HANDLERS
 
@@ -45,6 +60,9 @@ class KarapaceCharm(TypedCharmBase[CharmConfig]):
         self.kafka = KafkaHandler(self)
         self.tls = TLSHandler(self)
         self.provider = KarapaceHandler(self)
+        self.restart = RestartHandler(self)
+        self.metrics = MetricsHandler(self)
+        self.logging = LoggingHandler(self)
 
         # MANAGERS
 
@@ -52,6 +70,9 @@ class KarapaceCharm(TypedCharmBase[CharmConfig]):
         self.auth_manager = KarapaceAuth(context=self.context, workload=self.workload)
         self.tls_manager = TLSManager(context=self.context, workload=self.workload)
         self.kafka_manager = KafkaManager(context=self.context, workload=self.workload)
+        self.health_manager = HealthManager(context=self.context, workload=self.workload)
+        self.metrics_manager = MetricsManager(context=self.context, workload=self.workload)
+        self.access_log_manager = AccessLogManager(context=self.context, workload=self.workload)
         self.k8s_manager = K8sManager(
             pod_name=self.context.server.pod_name, namespace=self.model.name
         )
@@ -68,7 +89,7 @@ class KarapaceCharm(TypedCharmBase[CharmConfig]):
     def _on_install(self, event: ops.InstallEvent):
         """Handle install event."""
         if not self.workload.container_can_connect():
-            event.defer()
+            self.metrics.defer(event)
             return
 
         self.unit.set_workload_version(self.workload.get_version())
@@ -82,39 +103,43 @@ class KarapaceCharm(TypedCharmBase[CharmConfig]):
         """Handle pebble ready event."""
         if not self.context.peer_relation:
             self._set_status(Status.NO_PEER_RELATION)
-            event.defer()
+            self.metrics.defer(event)
             return
 
         if not self.workload.container_can_connect():
             self._set_status(Status.CONTAINER_NOT_CONNECTED)
-            event.defer()
+            self.metrics.defer(event)
             return
 
+        # the container may have restarted, without the files written by the charm
+        self.context.unit_state.charm_metrics = ""
+
         if self.context.cluster.internal_user_credentials:
             self.auth_manager.update_admin_user()
         elif self.unit.is_leader():
             self.auth_manager.create_internal_user()
         else:
             # Unit is not leader and there are no internal credentials added yet
-            event.defer()
+            self.metrics.defer(event)
             return
 
     def _on_config_changed(self, event: ops.ConfigChangedEvent):
         """Handle config changed event."""
         self._set_status(self.context.ready_to_start)
         if not isinstance(self.unit.status, ops.ActiveStatus):
-            event.defer()
+            self.metrics.defer(event)
             return
 
         # Load current properties set in the charm workload
         rendered_file = self.config_manager.parsed_confile
-        config_changed = rendered_file != self.config_manager.config
+        config = self.config_manager.config
+        config_changed = rendered_file != config
         if config_changed:
             logger.info(
                 (
                     f'Server {self.unit.name.split("/")[1]} updating config - '
-                    f"OLD CONFIG = {set(rendered_file.items()) - set(self.config_manager.config.items())}, "
-                    f"NEW CONFIG = {set(self.config_manager.config.items()) - set(rendered_file.items())}"
+                    f"OLD CONFIG = {set(rendered_file.items()) - set(config.items())}, "
+                    f"NEW CONFIG = {set(config.items()) - set(rendered_file.items())}"
                 )
             )
 
@@ -122,12 +147,21 @@ class KarapaceCharm(TypedCharmBase[CharmConfig]):
             self.config_manager.set_environment()
             self.config_manager.write_config_file()
 
-        self.auth_manager.update_client_users()
+        if self.unit.is_leader():
+            self.context.cluster.migrate_client_passwords()
+            # applied once per change of the Service, not on every update-status
+            service_spec = self.k8s_manager.service_spec(self.config.expose_external)
+            if service_spec != self.context.unit_state.service_spec and (
+                self.k8s_manager.apply_service(self.config.expose_external)
+            ):
+                self.context.unit_state.service_spec = service_spec
+
+        self.auth_manager.sync_client_users()
         self.auth_manager.update_admin_user()
 
-        if config_changed:
-            # Restart so changes take effect
-            self.workload.restart()
+        if config_changed or self.workload.layer_changed():
+            # Restart so changes take effect, one unit at a time
+            self.restart.request_restart()
 
         self.provider.update_clients_data()
         self.unit.status = ops.ActiveStatus()
@@ -137,11 +171,27 @@ class KarapaceCharm(TypedCharmBase[CharmConfig]):
         if not self.healthy:
             return
 
-        if not self.kafka_manager.brokers_active():
+        # Kafka connectivity is reported by the Karapace consumer itself,
+        # the charm does not open its own connection to the brokers
+        active = self.health_manager.brokers_active()
+        health = self.health_manager.health
+        if active:
+            # no report while the last successful check is still cached
+            if health:
+                self.metrics.record_ready(health)
+            self.on.config_changed.emit()
+        elif not health:
+            self._set_status(Status.SERVICE_NOT_READY)
+        elif not health.kafka_connected:
             self._set_status(Status.KAFKA_NOT_CONNECTED)
-            return
+        else:
+            self.on.config_changed.emit()
+
+            if health.replaying and isinstance(self.unit.status, ops.ActiveStatus):
+                self._set_status(Status.SCHEMAS_REPLAYING)
 
-        self.on.config_changed.emit()
+        # after config-changed, which may have updated the authfile
+        self.metrics.update_charm_metrics()
 
     @property
     def healthy(self) -> bool:
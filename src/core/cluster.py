@@ -4,6 +4,10 @@
 
 """Objects representing the context and state of KarapaceCharm."""
 
+import json
+import time
+from typing import cast
+
 from charms.data_platform_libs.v0.data_interfaces import (
     DataPeerData,
     DataPeerOtherUnitData,
@@ -11,15 +15,25 @@ from charms.data_platform_libs.v0.data_interfaces import (
     KafkaRequirerData,
     KarapaceProviderData,
 )
-from ops import Framework, Object, Relation, Unit
-
-from core.models import Kafka, KarapaceClient, KarapaceCluster, KarapaceServer
+from ops import CharmBase, Framework, Object, Relation, RelationEvent, StoredState, Unit
+
+from core.models import (
+    ClientRoster,
+    Kafka,
+    KarapaceClient,
+    KarapaceCluster,
+    KarapaceServer,
+    RosterEntry,
+)
+from core.secrets import SecretStats, ShardedSecrets, install_secret_cache
 from literals import (
+    CLIENT_SECRET_SHARDS,
     INTERNAL_USERS,
     KAFKA_CONSUMER_GROUP,
     KAFKA_REL,
     KAFKA_TOPIC,
     KARAPACE_REL,
+    LOGGING_REL,
     PEER,
     PORT,
     SECRETS_UNIT,
@@ -31,6 +45,8 @@ from literals import (
 class ClusterContext(Object):
     """Properties and relations of the charm."""
 
+    unit_state = StoredState()
+
     def __init__(self, charm: Framework | Object, substrate: Substrate):
         super().__init__(parent=charm, key="charm_context")
         self.substrate: Substrate = substrate
@@ -52,7 +68,39 @@ class ClusterContext(Object):
             self.model, relation_name=KARAPACE_REL
         )
 
+        # secrets read during the dispatch are cached, and their lookups counted
+        self.secret_stats = SecretStats()
+        for data_interface in [
+            self.peer_app_interface,
+            self.peer_unit_interface,
+            self.kafka_requirer_interface,
+            self.client_provider_interface,
+        ]:
+            install_secret_cache(data_interface, self.secret_stats)
+
+        self.client_secrets = ShardedSecrets(
+            self.model,
+            label=f"{PEER}.{self.model.app.name}.clients",
+            shards=CLIENT_SECRET_SHARDS,
+            stats=self.secret_stats,
+        )
+
         self._servers_data = {}
+        self._roster: ClientRoster | None = None
+        self._roster_key: tuple = ()
+
+        # unit-local state, never shared with other units over the peer relation
+        self.unit_state.set_default(restarted_for="", client_requests={}, admin_digest="")
+        self.unit_state.set_default(kafka_probe={}, access_capture={}, service_spec="")
+        # exported as charm metrics, see `MetricsHandler`
+        self.unit_state.set_default(restarts=0, time_to_ready=None, kafka_probe_latency_ms=None)
+        self.unit_state.set_default(charm_metrics="", metrics_flushed=0.0)
+        self.unit_state.set_default(hook_stats={}, defers={}, deferred={}, pebble_calls={})
+
+        # observed before the handlers, so that they get the new requests of the client
+        on = cast(CharmBase, charm).on
+        self.framework.observe(on[KARAPACE_REL].relation_changed, self._on_client_changed)
+        self.framework.observe(on[KARAPACE_REL].relation_broken, self._on_client_changed)
 
     # --- RELATIONS ---
 
@@ -71,6 +119,26 @@ class ClusterContext(Object):
         """The relations of all client applications."""
         return set(self.model.relations[KARAPACE_REL])
 
+    @property
+    def loki_endpoints(self) -> dict[str, str]:
+        """The push endpoints of all related Loki units, by Pebble log target name."""
+        endpoints = {}
+        for relation in self.model.relations[LOGGING_REL]:
+            for unit in relation.units:
+                try:
+                    url = json.loads(relation.data[unit].get("endpoint", "{}")).get("url")
+                except json.JSONDecodeError:
+                    url = None
+                if url:
+                    endpoints[unit.name.replace("/", "-")] = url
+
+        return endpoints
+
+    @property
+    def capturing_access_log(self) -> bool:
+        """Whether a capture of the access log, started by `latency-report`, is running."""
+        return time.time() < self.unit_state.access_capture.get("until", 0.0)
+
     # --- CORE COMPONENTS ---
 
     @property
@@ -84,6 +152,7 @@ class ClusterContext(Object):
                 self._servers_data[unit] = DataPeerOtherUnitData(
                     model=self.model, unit=unit, relation_name=PEER
                 )
+                install_secret_cache(self._servers_data[unit], self.secret_stats)
         return self._servers_data
 
     @property
@@ -128,6 +197,7 @@ class ClusterContext(Object):
             data_interface=self.peer_app_interface,
             component=self.model.app,
             substrate=self.substrate,
+            client_secrets=self.client_secrets,
         )
 
     @property
@@ -161,6 +231,61 @@ class ClusterContext(Object):
 
     # --- ADDITIONAL METHODS ---
 
+    @property
+    def roster(self) -> ClientRoster:
+        """The client applications, with their usernames, roles, passwords and subjects.
+
+        Built once per dispatch, and again only if client relations or passwords changed.
+        The fields requested by the clients are kept in the unit state, and read again from
+        the databag of a client only after its relation changed.
+        """
+        key = (self.client_secrets.revision, tuple(sorted(self.client_relation_ids)))
+        if self._roster and self._roster_key == key:
+            return self._roster
+
+        passwords = self.cluster.client_passwords
+        cached = self.unit_state.client_requests
+        requests = {}
+        entries = []
+        for client in sorted(self.clients, key=lambda client: client.relation.id):
+            # the databag of the client is read again only once its relation changed
+            requested = requests[str(client.relation.id)] = dict(
+                cached.get(str(client.relation.id))
+                or {
+                    "subject": client.subject,
+                    "extra-user-roles": client.extra_user_roles,
+                    "endpoint-type": client.endpoint_type,
+                }
+            )
+            entries.append(
+                RosterEntry(
+                    username=client.username,
+                    role="admin" if "admin" in requested["extra-user-roles"] else "user",
+                    password=passwords.get(client.username, ""),
+                    subject=requested["subject"],
+                    endpoint_type=requested["endpoint-type"],
+                    relation=client.relation,
+                )
+            )
+
+        if requests != cached:
+            self.unit_state.client_requests = requests
+        self._roster = ClientRoster(entries)
+        self._roster_key = key
+        return self._roster
+
+    def _on_client_changed(self, event: RelationEvent) -> None:
+        """Handler for changes of client relations, dropping the requests kept for the client."""
+        requests = dict(self.unit_state.client_requests)
+        if requests.pop(str(event.relation.id), None) is not None:
+            self.unit_state.client_requests = requests
+        self._roster = None
+
+    @property
+    def client_relation_ids(self) -> list[int]:
+        """The ids of the relations of all client applications."""
+        return [relation.id for relation in self.karapace_relations if relation.app]
+
     @property
     def super_users(self) -> set[str]:
         """Generates all users with super/admin permissions for the cluster from relations.
@@ -168,18 +293,7 @@ class ClusterContext(Object):
         Returns:
             Set of current super users
         """
-        super_users = set(INTERNAL_USERS)
-        for relation in self.karapace_relations:
-            if not relation or not relation.app:
-                continue
-
-            extra_user_roles = relation.data[relation.app].get("extra-user-roles", "")
-            password = self.cluster.relation_data.get(f"relation-{relation.id}", None)
-            # if passwords are set for client admins, they're good to load
-            if "admin" in extra_user_roles and password:
-                super_users.add(f"relation-{relation.id}")
-
-        return super_users
+        return set(INTERNAL_USERS) | self.roster.super_users
 
     @property
     def endpoints(self) -> str:
@@ -193,6 +307,18 @@ class ClusterContext(Object):
 
         return ",".join(sorted([f"{server.host}:{PORT}" for server in self.servers]))
 
+    @property
+    def listener_protocol(self) -> str:
+        """The protocol of the unit's REST listener, as rendered in the Karapace config.
+
+        Karapace serves HTTPS once TLS is enabled and the unit certificate is available, and
+        the unit has restarted with it, see `WorkloadBase.listener_protocol`.
+        """
+        if self.cluster.tls_enabled and self.server.certificate:
+            return "https"
+
+        return "http"
+
     @property
     def ready_to_start(self) -> Status:
         """Check for active Kafka relation and adding of internal username.
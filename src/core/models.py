@@ -4,8 +4,10 @@
 
 """Collection of state objects for the Karapace relations, apps and units."""
 
+import json
 import logging
-from collections.abc import MutableMapping
+from collections.abc import Iterator, Mapping, MutableMapping
+from dataclasses import dataclass, field
 
 from charms.data_platform_libs.v0.data_interfaces import (
     Data,
@@ -16,7 +18,8 @@ from charms.data_platform_libs.v0.data_interfaces import (
 from ops.model import Application, Relation, Unit
 from typing_extensions import override
 
-from literals import INTERNAL_USERS, SECRETS_APP, Substrate
+from core.secrets import ShardedSecrets
+from literals import INTERNAL_USERS, SECRETS_APP, Role, Substrate
 
 logger = logging.getLogger(__name__)
 
@@ -57,13 +60,22 @@ class RelationState:
             )
             return
 
+        items = self._changed(self.relation_data, items)
         delete_fields = [key for key in items if not items[key]]
         update_content = {k: items[k] for k in items if k not in delete_fields}
 
         self.relation_data.update(update_content)
 
-        for field in delete_fields:
-            del self.relation_data[field]
+        for key in delete_fields:
+            del self.relation_data[key]
+
+    @staticmethod
+    def _changed(current: Mapping[str, str], items: dict[str, str]) -> dict[str, str]:
+        """The items differing from the current databag, empty values for missing keys.
+
+        Every write fires relation-changed on the other side, even when unchanged.
+        """
+        return {key: value for key, value in items.items() if current.get(key, "") != value}
 
 
 class KarapaceServer(RelationState):
@@ -118,6 +130,11 @@ class KarapaceServer(RelationState):
 
         return host  # pyright: ignore reportGeneralTypeIssues
 
+    @property
+    def restart_request(self) -> str:
+        """The time at which the unit requested a restart, empty if none is pending."""
+        return self.relation_data.get("restart-request", "")
+
     # -- TLS --
 
     @property
@@ -140,6 +157,16 @@ class KarapaceServer(RelationState):
         """The root CA contents for the unit to use for TLS."""
         return self.relation_data.get("ca-cert", "")
 
+    @property
+    def certificate_expiry(self) -> str:
+        """The expiry time of the unit certificate, in ISO format."""
+        return self.relation_data.get("certificate-expiry", "")
+
+    @property
+    def certificate_renewal(self) -> str:
+        """The scheduled renewal time of the unit certificate, in ISO format."""
+        return self.relation_data.get("certificate-renewal", "")
+
 
 class KarapaceCluster(RelationState):
     """State collection metadata for the peer relation."""
@@ -150,19 +177,38 @@ class KarapaceCluster(RelationState):
         data_interface: DataPeerData,
         component: Application,
         substrate: Substrate,
+        client_secrets: ShardedSecrets,
     ):
         super().__init__(relation, data_interface, component, substrate)
         self.data_interface = data_interface  # Allow linter to solve DataPeerData API
         self.app = component
+        self.client_secrets = client_secrets
 
     @override
     def update(self, items: dict[str, str]) -> None:
-        """Overridden update to allow for same interface, but writing to local app bag."""
+        """Overridden update to allow for same interface, but writing to local app bag.
+
+        Client passwords are written to the sharded client secrets, and removed from their
+        previous location in the peer app secret, if still there.
+        """
         if not self.relation:
             return
 
-        for key, value in items.items():
-            if key in SECRETS_APP or key.startswith("relation-"):
+        client_items = {key: value for key, value in items.items() if key.startswith("relation-")}
+        if client_items:
+            self.client_secrets.update(client_items)
+            if legacy := [key for key in client_items if key in self._legacy_client_passwords]:
+                self.data_interface.delete_relation_data(self.relation.id, legacy)
+
+            # owners do not get secret-changed, other units rely on relation-changed instead
+            client_users = sorted(self.client_secrets.items().keys())
+            items = items | {"client-users": json.dumps(client_users)}
+
+        for key, value in self._changed(self.relation_data, items).items():
+            if key in client_items:
+                continue
+
+            if key in SECRETS_APP:
                 if value:
                     self.data_interface.set_secret(self.relation.id, key, value)
                 else:
@@ -191,7 +237,30 @@ class KarapaceCluster(RelationState):
     @property
     def client_passwords(self) -> dict[str, str]:
         """Usernames and passwords of related client applications."""
-        return {key: value for key, value in self.relation_data.items() if "relation-" in key}
+        return self._legacy_client_passwords | self.client_secrets.items()
+
+    @property
+    def _legacy_client_passwords(self) -> dict[str, str]:
+        """Client passwords still stored in the peer app secret, before sharding."""
+        return {
+            key: value for key, value in self.relation_data.items() if key.startswith("relation-")
+        }
+
+    def migrate_client_passwords(self) -> None:
+        """Moves the client passwords from the peer app secret to the sharded client secrets."""
+        if not self.relation or not (legacy := self._legacy_client_passwords):
+            return
+
+        logger.info(f"Moving {len(legacy)} client passwords to sharded secrets")
+        self.client_secrets.update(
+            {key: value for key, value in legacy.items() if key not in self.client_secrets.items()}
+        )
+        self.data_interface.delete_relation_data(self.relation.id, list(legacy))
+
+    @property
+    def restart_granted(self) -> str:
+        """The name of the unit currently allowed to restart."""
+        return self.relation_data.get("restart-granted", "")
 
     # --- TLS ---
 
@@ -293,10 +362,22 @@ class KarapaceClient(RelationState):
         """The generated password for the client application."""
         return self.relation_data.get("password", "")
 
+    @property
+    def requested(self) -> MutableMapping:
+        """The plain fields set by the client application.
+
+        Read from the databag directly, as none of them is a secret field, to skip the secret
+        lookups and leadership checks made for every field by the data interface.
+        """
+        if not self.relation:
+            return {}
+
+        return self.relation.data[self.app]
+
     @property
     def subject(self) -> str:
         """The subject a client application is requesting access to."""
-        return self.relation_data.get("subject", "")
+        return self.requested.get("subject", "")
 
     @property
     def extra_user_roles(self) -> str:
@@ -304,4 +385,43 @@ class KarapaceClient(RelationState):
 
         Can be any comma-delimited selection of `user` or `admin`.
         """
-        return self.relation_data.get("extra-user-roles", "")
+        return self.requested.get("extra-user-roles", "")
+
+    @property
+    def endpoint_type(self) -> str:
+        """The endpoints requested by the client application.
+
+        Either `units` for the list of unit addresses, or `service` for the address of the
+        registry K8s Service. Defaults to `units`.
+        """
+        return self.requested.get("endpoint-type", "") or "units"
+
+
+@dataclass
+class RosterEntry:
+    """A client application, with its credentials and requested access."""
+
+    username: str
+    role: Role
+    password: str
+    subject: str
+    endpoint_type: str
+    relation: Relation
+
+
+@dataclass
+class ClientRoster:
+    """All client applications of the charm, built in a single pass over their relations."""
+
+    entries: list[RosterEntry] = field(default_factory=list)
+
+    def __iter__(self) -> Iterator[RosterEntry]:
+        """Iterates over the clients, ordered by relation id."""
+        return iter(self.entries)
+
+    @property
+    def super_users(self) -> set[str]:
+        """Clients with admin permissions, once their password is set."""
+        return {
+            entry.username for entry in self.entries if entry.role == "admin" and entry.password
+        }
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Per-dispatch caching and sharding of the Juju secrets of the charm."""
+
+import zlib
+from dataclasses import dataclass
+
+from charms.data_platform_libs.v0.data_interfaces import CachedSecret, Data, SecretCache
+from ops import Application, Model, Secret, SecretNotFoundError, Unit
+
+
+@dataclass
+class SecretStats:
+    """Counters of the `secret-get` calls made to Juju during the current dispatch."""
+
+    secret_gets: int = 0
+
+
+class _CountingModel:
+    """Model proxy counting the `secret-get` calls made through `get_secret`."""
+
+    def __init__(self, model: Model, stats: SecretStats):
+        self._model = model
+        self._stats = stats
+
+    def get_secret(self, *args, **kwargs):
+        """Fetches a secret, as `Model.get_secret`."""
+        self._stats.secret_gets += 1
+        return self._model.get_secret(*args, **kwargs)
+
+    def __getattr__(self, name: str):
+        return getattr(self._model, name)
+
+
+class _CountingCachedSecret(CachedSecret):
+    """`CachedSecret` counting the content fetches of its secret."""
+
+    def __init__(self, *args, stats: SecretStats, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats = stats
+
+    def get_content(self) -> dict[str, str]:
+        """Getting cached secret content."""
+        if not self._secret_content and self.meta:
+            self._stats.secret_gets += 1
+
+        return super().get_content()
+
+
+class DispatchSecretCache(SecretCache):
+    """`SecretCache` also remembering the secrets that do not exist.
+
+    `data_interfaces` caches the secrets it found, but looks up missing secrets, including
+    their legacy labels, again on every access. Within a single dispatch a secret only
+    appears once the charm creates it, which goes through `add`.
+    """
+
+    def __init__(self, model: Model, component: Application | Unit, stats: SecretStats):
+        super().__init__(model, component)
+        self._model = _CountingModel(model, stats)  # pyright: ignore[reportAttributeAccessIssue]
+        self._stats = stats
+        self._missing: set[tuple[str, str | None]] = set()
+
+    def get(
+        self, label: str, uri: str | None = None, legacy_labels: list[str] = []
+    ) -> CachedSecret | None:
+        """Getting a secret from the cache, or from Juju if not looked up yet."""
+        if secret := self._secrets.get(label):
+            return secret
+
+        if (label, uri) in self._missing:
+            return None
+
+        secret = _CountingCachedSecret(
+            self._model,  # pyright: ignore[reportArgumentType]
+            self.component,
+            label,
+            uri,
+            legacy_labels=legacy_labels,
+            stats=self._stats,
+        )
+        if not secret.meta:
+            self._missing.add((label, uri))
+            return None
+
+        self._secrets[label] = secret
+        return secret
+
+    def add(self, label: str, content: dict[str, str], relation) -> CachedSecret:
+        """Adding a secret to Juju Secret."""
+        self._missing = {(missing, uri) for missing, uri in self._missing if missing != label}
+        return super().add(label, content, relation)
+
+    def remove(self, label: str) -> None:
+        """Remove a secret from the cache."""
+        super().remove(label)
+        if label not in self._secrets:
+            self._missing.add((label, None))
+
+
+def install_secret_cache(data_interface: Data, stats: SecretStats) -> None:
+    """Replaces the secret cache of a `data_interfaces` object by a `DispatchSecretCache`."""
+    data_interface.secrets = DispatchSecretCache(
+        data_interface._model, data_interface.component, stats
+    )
+
+
+class ShardedSecrets:
+    """Key-value store spread over a fixed number of application secrets.
+
+    Each key always maps to the same shard, so updating a single key only rewrites the
+    content of one secret. Shards are created on first write, and removed once empty.
+    Contents are read at most once per dispatch.
+    """
+
+    def __init__(self, model: Model, label: str, shards: int, stats: SecretStats):
+        self.model = model
+        self.label = label
+        self.shards = shards
+        self._stats = stats
+        self._secrets: dict[int, Secret | None] = {}
+        self._contents: dict[int, dict[str, str]] = {}
+        # incremented on each change, for callers caching what they derive from the contents
+        self.revision = 0
+
+    def shard(self, key: str) -> int:
+        """The shard a key is stored in."""
+        return zlib.crc32(key.encode()) % self.shards
+
+    def items(self) -> dict[str, str]:
+        """The contents of all shards."""
+        items = {}
+        for shard in range(self.shards):
+            items |= self._content(shard)
+
+        return items
+
+    def update(self, items: dict[str, str]) -> None:
+        """Writes items to their shards, deleting the keys with empty values.
+
+        Only the leader unit can write application secrets.
+        """
+        changes: dict[int, dict[str, str]] = {}
+        for key, value in items.items():
+            changes.setdefault(self.shard(key), {})[key] = value
+
+        for shard, shard_changes in changes.items():
+            content = self._content(shard) | shard_changes
+            content = {key: value for key, value in content.items() if value}
+            if content == self._content(shard):
+                continue
+
+            secret = self._secret(shard)
+            if not content and secret:
+                secret.remove_all_revisions()
+                secret = None
+            elif content and secret:
+                secret.set_content(content)
+            elif content:
+                secret = self.model.app.add_secret(content, label=self._label(shard))
+
+            self._secrets[shard] = secret
+            self._contents[shard] = content
+            self.revision += 1
+
+    def _label(self, shard: int) -> str:
+        return f"{self.label}.{shard}"
+
+    def _secret(self, shard: int) -> Secret | None:
+        if shard not in self._secrets:
+            self._stats.secret_gets += 1
+            try:
+                self._secrets[shard] = self.model.get_secret(label=self._label(shard))
+            except SecretNotFoundError:
+                self._secrets[shard] = None
+
+        return self._secrets[shard]
+
+    def _content(self, shard: int) -> dict[str, str]:
+        if shard not in self._contents:
+            secret = self._secret(shard)
+            # the content was already fetched by `get_secret`
+            self._contents[shard] = secret.get_content() if secret else {}
+
+        return self._contents[shard]
@@ -7,6 +7,9 @@
 import logging
 
 from charms.data_platform_libs.v0.data_models import BaseConfigModel
+from pydantic import validator
+
+from literals import MAX_WORKERS, ExposeExternal, KeyType
 
 logger = logging.getLogger(__name__)
 
@@ -14,4 +17,25 @@ logger = logging.getLogger(__name__)
 class CharmConfig(BaseConfigModel):
     """Manager for the structured configuration."""
 
-    pass
+    tls_key_type: KeyType = "rsa"
+    expose_external: ExposeExternal = "false"
+    workers: int = 1
+    access_log_sampling: float = 0.0
+
+    @validator("workers")
+    @classmethod
+    def workers_validator(cls, value: int) -> int:
+        """Check the number of workers, 0 deriving it from the CPU allocation."""
+        if not 0 <= value <= MAX_WORKERS:
+            raise ValueError(f"Value not between 0 and {MAX_WORKERS}")
+
+        return value
+
+    @validator("access_log_sampling")
+    @classmethod
+    def access_log_sampling_validator(cls, value: float) -> float:
+        """Check the fraction of access log entries to keep."""
+        if not 0 <= value <= 1:
+            raise ValueError("Value not between 0 and 1")
+
+        return value
@@ -35,6 +35,46 @@ class KarapacePaths:
         """
         return f"{self.conf_path}/authfile.json"
 
+    @property
+    def reuseport(self):
+        """The launcher of the Karapace workers sharing the registry port of the unit."""
+        return f"{self.conf_path}/reuseport.py"
+
+    @property
+    def logsampler(self):
+        """The wrapper of Karapace keeping a fraction of its access log entries."""
+        return f"{self.conf_path}/logsampler.py"
+
+    @property
+    def accesslog(self):
+        """The script summarising the latency of a captured access log."""
+        return f"{self.conf_path}/accesslog.py"
+
+    @property
+    def access_capture(self):
+        """The deadline and size of the current access log capture, see `logsampler.py`."""
+        return f"{self.logs_path}/access-capture.json"
+
+    @property
+    def access_log(self):
+        """The access log entries captured."""
+        return f"{self.logs_path}/access.log"
+
+    @property
+    def exporter(self):
+        """The exporter serving the charm metrics file."""
+        return f"{self.conf_path}/exporter.py"
+
+    @property
+    def readynotify(self):
+        """The script notifying the charm once Karapace is ready after a restart."""
+        return f"{self.conf_path}/readynotify.py"
+
+    @property
+    def charm_metrics(self):
+        """The charm metrics, in the Prometheus text format."""
+        return f"{self.conf_path}/charm-metrics.prom"
+
     @property
     def ssl_cafile(self):
         """The CA file for Karapace - Kafka SSL."""
@@ -55,6 +95,9 @@ class WorkloadBase(ABC):
     """Base interface for common workload operations."""
 
     paths = KarapacePaths()
+    # fraction of the access log entries kept in the logs, and whether a capture is running
+    access_log_sampling: float = 0.0
+    access_log_capture: bool = False
 
     @abstractmethod
     def start(self) -> None:
@@ -106,6 +149,12 @@ class WorkloadBase(ABC):
         """Checks that the workload is active."""
         ...
 
+    @property
+    @abstractmethod
+    def listener_protocol(self) -> str:
+        """The protocol of the REST listener Karapace is currently running with."""
+        ...
+
     @abstractmethod
     def get_version(self) -> str:
         """Get the workload version.
@@ -120,6 +169,11 @@ class WorkloadBase(ABC):
         """Return password string using Karapace helper CLI."""
         ...
 
+    @property
+    def access_logs(self) -> bool:
+        """Whether Karapace writes its access log, sampled and captured by `logsampler.py`."""
+        return self.access_log_capture or self.access_log_sampling > 0
+
     @staticmethod
     def generate_password() -> str:
         """Creates randomized string for use as app passwords.
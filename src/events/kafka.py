@@ -12,9 +12,9 @@ from charms.data_platform_libs.v0.data_interfaces import (
     KafkaRequirerEventHandlers,
     TopicCreatedEvent,
 )
-from ops import Object, RelationBrokenEvent
+from ops import ActionEvent, Object, RelationBrokenEvent
 
-from literals import KAFKA_REL, Status
+from literals import KAFKA_REL, KAFKA_TOPIC, Status
 
 if TYPE_CHECKING:
     from charm import KarapaceCharm
@@ -41,6 +41,13 @@ class KafkaHandler(Object):
         self.framework.observe(
             getattr(self.kafka.on, "topic_created"), self._on_kafka_topic_created
         )
+        self.framework.observe(
+            getattr(self.charm.on, "probe_kafka_action"), self._probe_kafka_action
+        )
+        self.framework.observe(
+            getattr(self.charm.on, "describe_schemas_topic_action"),
+            self._describe_schemas_topic_action,
+        )
 
     def _on_kafka_bootstrap_server_changed(self, event: BootstrapServerChangedEvent) -> None:
         """Handle the bootstrap server changed."""
@@ -62,3 +69,55 @@ class KafkaHandler(Object):
         logger.info("Stopping karapace process")
         self.charm.workload.stop()
         self.charm._set_status(Status.KAFKA_NOT_RELATED)
+
+    def _probe_kafka_action(self, event: ActionEvent) -> None:
+        """Handler for `probe-kafka` action.
+
+        Probes every bootstrap server concurrently and reports the latency of each stage.
+        """
+        if not self.charm.context.kafka.kafka_ready:
+            msg = "Kafka relation data not available yet"
+            logger.error(msg)
+            event.fail(msg)
+            return
+
+        probes = self.charm.kafka_manager.probe_brokers()
+        summary = self.charm.kafka_manager.summary(probes)
+        event.log(summary)
+
+        results: dict = {"summary": summary}
+        for i, probe in enumerate(probes):
+            results[f"broker-{i}"] = probe.as_dict()
+
+        event.set_results(results)
+
+    def _describe_schemas_topic_action(self, event: ActionEvent) -> None:
+        """Handler for `describe-schemas-topic` action.
+
+        Reports the state of the `_schemas` topic replayed by Karapace on startup.
+        """
+        if not self.charm.context.kafka.kafka_ready:
+            msg = "Kafka relation data not available yet"
+            logger.error(msg)
+            event.fail(msg)
+            return
+
+        try:
+            report = self.charm.kafka_manager.schemas_topic_report(
+                max_records=event.params["max-records"]
+            )
+        except Exception as e:
+            msg = f"Could not describe {KAFKA_TOPIC} topic: {e}"
+            logger.error(msg)
+            event.fail(msg)
+            return
+
+        results = report.as_dict()
+        if health := self.charm.health_manager.get_health():
+            results["karapace-reader"] = {
+                "ready": str(health.ready).lower(),
+                "current-offset": str(health.current_offset),
+                "highest-offset": str(health.highest_offset),
+            }
+
+        event.set_results(results)
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Handler for the logs of the workload, forwarded to Loki and summarised on demand."""
+
+import logging
+import time
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING
+
+from ops import ActionEvent, Object, RelationEvent
+from ops.pebble import ExecError
+
+from literals import LOGGING_REL
+
+if TYPE_CHECKING:
+    from charm import KarapaceCharm
+
+logger = logging.getLogger(__name__)
+
+
+class LoggingHandler(Object):
+    """Forwards the logs of the workload to the Loki units of the `logging` relation.
+
+    Logs are pushed by Pebble itself, through the log targets of the Karapace layer, so
+    there is no log shipping process to run in the pod. Log targets follow the Loki units
+    joining and departing, without restarting Karapace. Also reports the latency of the
+    registry from captures of its access log, on demand.
+    """
+
+    def __init__(self, charm) -> None:
+        super().__init__(charm, "logging")
+        self.charm: "KarapaceCharm" = charm
+
+        for event in [
+            self.charm.on[LOGGING_REL].relation_changed,
+            self.charm.on[LOGGING_REL].relation_departed,
+            self.charm.on[LOGGING_REL].relation_broken,
+        ]:
+            self.framework.observe(event, self._on_logging_changed)
+
+        self.framework.observe(
+            getattr(self.charm.on, "latency_report_action"), self._latency_report_action
+        )
+
+    def _on_logging_changed(self, _: RelationEvent) -> None:
+        """Handler for changes of the Loki push endpoints."""
+        # log targets are part of the layer, added once the container is up
+        if not self.charm.workload.container_can_connect():
+            return
+
+        logger.info(f"Forwarding logs to {sorted(self.charm.workload.log_endpoints)}")
+        self.charm.workload.update_log_targets()
+
+    def _latency_report_action(self, event: ActionEvent) -> None:
+        """Handler for `latency-report` action.
+
+        Starts capturing the access log of the unit, or reports the latency of each route of
+        the registry once the capture has ended. The action returns straight away, without
+        waiting for the capture.
+        """
+        if not self.charm.workload.container_can_connect() or not self.charm.workload.active():
+            msg = "Karapace is not running on the unit"
+            logger.error(msg)
+            event.fail(msg)
+            return
+
+        manager = self.charm.access_log_manager
+        if not (capture := manager.capture):
+            until = manager.start_capture(
+                duration=event.params["duration"], max_entries=event.params["max-entries"]
+            )
+            # Karapace logs access only while sampling, the layer turns it on for the window,
+            # and back off on the first config-changed after it
+            if self.charm.workload.layer_changed():
+                self.charm.restart.request_restart()
+
+            event.set_results(
+                {
+                    "status": "capturing",
+                    "until": datetime.fromtimestamp(until, tz=timezone.utc).isoformat(),
+                }
+            )
+            return
+
+        if (remaining := capture["until"] - time.time()) > 0:
+            event.set_results({"status": "capturing", "remaining-seconds": f"{remaining:.0f}"})
+            return
+
+        try:
+            report = manager.latency_report()
+        except (ExecError, ValueError, KeyError) as e:
+            msg = f"Could not summarise the access log: {e}"
+            logger.error(msg)
+            event.fail(msg)
+            return
+
+        event.set_results({"status": "done"} | report.as_dict())
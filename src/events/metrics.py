@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Handler for the metrics exported by Karapace and by the charm."""
+
+import base64
+import json
+import logging
+import lzma
+import os
+import time
+from collections import Counter
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from cosl import AlertRules, JujuTopology
+from ops import EventBase, Object, RelationChangedEvent, RelationDataContent
+
+from core.models import RelationState
+from literals import (
+    CHARM_METRICS_FLUSH_INTERVAL,
+    DASHBOARD_REL,
+    GRAFANA_DASHBOARDS_DIR,
+    METRICS_REL,
+    METRICS_RULES_DIR,
+)
+from managers.health import KarapaceHealth
+
+if TYPE_CHECKING:
+    from charm import KarapaceCharm
+
+logger = logging.getLogger(__name__)
+
+
+class MetricsHandler(Object):
+    """Publishes the scrape jobs of the units, and keeps the charm metrics file up to date.
+
+    Charm metrics include the execution metrics of every dispatch, i.e its duration, the
+    events left deferred and the Pebble API calls made. Handlers defer their events through
+    `defer`, so that they are counted.
+
+    Scrape jobs follow the `prometheus_scrape` interface: the leader sets the jobs, alert
+    rules and the Juju topology on the app databag, and each unit sets the address Prometheus
+    replaces the `*` targets with on its own unit databag. Prometheus reports the alert rules
+    and scrape jobs it rejects on its app databag, which the leader logs, as the
+    `MetricsEndpointProvider` of the `prometheus_scrape` library does. The bundled dashboards
+    are sent by the leader over the `grafana_dashboard` interface as soon as the relation is
+    created, and the dashboards Grafana rejects are logged likewise.
+    """
+
+    def __init__(self, charm) -> None:
+        super().__init__(charm, "metrics")
+        self.charm: "KarapaceCharm" = charm
+        # the dispatch is timed from the setup of the charm to the commit of its state
+        self.started = time.perf_counter()
+        # events deferred during the dispatch, by event kind
+        self.deferred: Counter = Counter()
+
+        self.framework.observe(self.charm.on[METRICS_REL].relation_joined, self._on_metrics)
+        self.framework.observe(self.charm.on.leader_elected, self._on_metrics)
+        self.framework.observe(self.charm.on.upgrade_charm, self._on_metrics)
+        # the number of workers, and so of targets, is part of the config
+        self.framework.observe(self.charm.on.config_changed, self._on_metrics)
+        self.framework.observe(
+            self.charm.on[METRICS_REL].relation_changed, self._on_metrics_changed
+        )
+
+        self.framework.observe(self.charm.on[DASHBOARD_REL].relation_created, self._on_dashboards)
+        self.framework.observe(
+            self.charm.on[DASHBOARD_REL].relation_changed, self._on_dashboards_changed
+        )
+        self.framework.observe(self.charm.on.leader_elected, self._on_dashboards)
+        self.framework.observe(self.charm.on.upgrade_charm, self._on_dashboards)
+
+        # after all events of the dispatch, and before the unit state is saved
+        self.framework.observe(self.charm.framework.on.pre_commit, self._on_pre_commit)
+
+    def _on_metrics(self, _: EventBase) -> None:
+        """Handler for events changing the scrape jobs or the unit address."""
+        self.publish_scrape_jobs()
+
+    def _on_metrics_changed(self, event: RelationChangedEvent) -> None:
+        """Handler for `metrics-endpoint-relation-changed` events, logging what was rejected."""
+        report = self._remote_report(event)
+        if errors := report.get("errors"):
+            logger.error(f"Prometheus rejected the alert rules: {errors}")
+        if errors := report.get("scrape_job_errors"):
+            logger.error(f"Prometheus rejected the scrape jobs: {errors}")
+
+    def _on_dashboards(self, _: EventBase) -> None:
+        """Handler for events changing the dashboards, i.e new relations and charm upgrades."""
+        self.publish_dashboards()
+
+    def _on_dashboards_changed(self, event: RelationChangedEvent) -> None:
+        """Handler for `grafana-dashboard-relation-changed` events, logging what was rejected."""
+        if errors := self._remote_report(event).get("errors"):
+            logger.error(f"Grafana rejected the dashboards: {errors}")
+
+    def _on_pre_commit(self, _: EventBase) -> None:
+        """Records the execution metrics of the dispatch.
+
+        They are flushed to the metrics file at most once per `CHARM_METRICS_FLUSH_INTERVAL`,
+        so that most hooks do not write it.
+        """
+        event = os.environ.get("JUJU_DISPATCH_PATH", "").rsplit("/", maxsplit=1)[-1]
+        self.charm.metrics_manager.record_hook(
+            event=event or "unknown",
+            seconds=time.perf_counter() - self.started,
+            deferred=self.deferred,
+            pebble_calls=self.charm.workload.pebble_calls,
+        )
+
+        unit_state = self.charm.context.unit_state
+        # the file is first written on `update-status`, once the workload is set up
+        if not unit_state.charm_metrics:
+            return
+
+        if time.time() - unit_state.metrics_flushed < CHARM_METRICS_FLUSH_INTERVAL:
+            return
+
+        if self.charm.workload.container_can_connect():
+            self.update_charm_metrics()
+
+    def defer(self, event: EventBase) -> None:
+        """Defers an event, counted in the events left deferred by the dispatch.
+
+        Deferred events are all re-emitted on the next dispatch, so the events deferred during
+        a dispatch are the ones left deferred at its end.
+        """
+        event.defer()
+        self.deferred[event.handle.kind] += 1
+
+    def publish_scrape_jobs(self) -> None:
+        """Writes the scrape jobs and unit address to all `metrics-endpoint` relations."""
+        relations = self.charm.model.relations[METRICS_REL]
+        if not relations:
+            return
+
+        app_data = {}
+        if self.charm.unit.is_leader():
+            topology = JujuTopology.from_charm(self.charm)
+            alert_rules = AlertRules(query_type="promql", topology=topology)
+            alert_rules.add_path(METRICS_RULES_DIR, recursive=True)
+            app_data = {
+                "scrape_metadata": json.dumps(topology.as_dict(excluded_keys=["unit"])),
+                "scrape_jobs": json.dumps(
+                    self.charm.metrics_manager.scrape_jobs(self.charm.workload.workers)
+                ),
+                "alert_rules": json.dumps(alert_rules.as_dict()),
+            }
+
+        unit_data = {
+            "prometheus_scrape_unit_address": self.charm.context.server.host,
+            "prometheus_scrape_unit_name": self.charm.unit.name,
+        }
+        for relation in relations:
+            if app_data:
+                self._update(relation.data[self.charm.app], app_data)
+            self._update(relation.data[self.charm.unit], unit_data)
+
+    def publish_dashboards(self) -> None:
+        """Sends the bundled dashboards to all `grafana-dashboard` relations, from the leader.
+
+        Dashboards are sent LZMA-compressed and base64-encoded, as expected by the interface,
+        and get the Juju topology dropdowns injected by Grafana.
+        """
+        relations = self.charm.model.relations[DASHBOARD_REL]
+        if not relations or not self.charm.unit.is_leader():
+            return
+
+        topology = JujuTopology.from_charm(self.charm).as_dict(excluded_keys=["unit"])
+        templates = {
+            f"file:{path.stem}": {
+                "charm": self.charm.meta.name,
+                "content": base64.b64encode(lzma.compress(path.read_bytes())).decode(),
+                "juju_topology": topology,
+                "inject_dropdowns": True,
+            }
+            for path in sorted(Path(GRAFANA_DASHBOARDS_DIR).glob("*.json"))
+        }
+        for relation in relations:
+            self._update(
+                relation.data[self.charm.app],
+                {"dashboards": json.dumps({"templates": templates}, sort_keys=True)},
+            )
+
+    def record_restart(self) -> None:
+        """Records a restart of the workload, for the restart metric."""
+        self.charm.context.unit_state.restarts += 1
+
+    def record_ready(self, health: KarapaceHealth) -> None:
+        """Records the time-to-ready of the running Karapace process, once it reports ready.
+
+        The time is measured by Karapace, from the start of its process to its schema reader
+        being ready, so it does not depend on when the charm checks for readiness.
+        """
+        if health.startup_seconds is None:
+            return
+
+        self.charm.context.unit_state.time_to_ready = round(health.startup_seconds, 1)
+
+    def update_charm_metrics(self) -> None:
+        """Writes the current charm metrics to the file served by the exporter."""
+        self.charm.metrics_manager.write_charm_metrics(
+            self.charm.metrics_manager.charm_metrics(
+                authfile_users=len(self.charm.auth_manager.auth_dict)
+            )
+        )
+
+    def _remote_report(self, event: RelationChangedEvent) -> dict:
+        """The validation report set by the remote app on the relation, read by the leader.
+
+        Only the leader publishes, so it is the only unit acting on the report.
+        """
+        if not self.charm.unit.is_leader() or not event.app:
+            return {}
+
+        try:
+            return json.loads(event.relation.data[event.app].get("event", "{}"))
+        except json.JSONDecodeError:
+            return {}
+
+    @staticmethod
+    def _update(databag: RelationDataContent, items: dict[str, str]) -> None:
+        """Writes items to a databag, skipping unchanged values."""
+        if changed := RelationState._changed(databag, items):
+            databag.update(changed)
@@ -4,14 +4,15 @@
 
 """KarapaceProvider class and methods."""
 
+import json
 import logging
 from typing import TYPE_CHECKING
 
 from charms.data_platform_libs.v0.data_interfaces import KarapaceProvides, SubjectRequestedEvent
-from ops.charm import RelationBrokenEvent
+from ops.charm import RelationBrokenEvent, RelationChangedEvent
 from ops.framework import Object
 
-from literals import KARAPACE_REL
+from literals import KARAPACE_REL, PEER
 
 if TYPE_CHECKING:
     from charm import KarapaceCharm
@@ -34,11 +35,12 @@ class KarapaceHandler(Object):
         self.framework.observe(
             getattr(self.karapace_provider.on, "subject_requested"), self.on_subject_requested
         )
+        self.framework.observe(self.charm.on[PEER].relation_changed, self._on_credentials_changed)
 
     def on_subject_requested(self, event: SubjectRequestedEvent):
         """Handle a subject requested event."""
         if not self.charm.healthy:
-            event.defer()
+            self.charm.metrics.defer(event)
             return
 
         relation = event.relation
@@ -50,13 +52,22 @@ class KarapaceHandler(Object):
         if not password and self.charm.unit.is_leader():
             password = self.charm.workload.generate_password()
         elif not password:
-            event.defer()
+            self.charm.metrics.defer(event)
             return
 
         extra_user_roles = event.extra_user_roles or ""
         subject = event.subject or ""
-        endpoints = self.charm.context.endpoints
+        endpoint_type = next(
+            (
+                client.endpoint_type
+                for client in self.charm.context.roster
+                if client.relation.id == relation.id
+            ),
+            "units",
+        )
+        endpoints = self._endpoints(endpoint_type)
         tls = "enabled" if self.charm.context.cluster.tls_enabled else "disabled"
+        tls_ca = self.charm.context.server.ca if self.charm.context.cluster.tls_enabled else ""
 
         self.charm.auth_manager.add_user(username=username, password=password)
         self.charm.auth_manager.add_acl(username=username, subject=subject, role=extra_user_roles)
@@ -65,14 +76,31 @@ class KarapaceHandler(Object):
         # non-leader units need cluster_config_changed event to update their authfiles
         if self.charm.unit.is_leader():
             self.charm.context.cluster.update(
-                {username: password, "super-users": str(self.charm.context.super_users)}
+                {
+                    username: password,
+                    "super-users": json.dumps(sorted(self.charm.context.super_users)),
+                }
             )
 
             self.karapace_provider.set_endpoint(relation.id, endpoints)
             self.karapace_provider.set_credentials(relation.id, username, password)
             self.karapace_provider.set_tls(relation.id, tls)
+            self.karapace_provider.set_tls_ca(relation.id, tls_ca)
             self.karapace_provider.set_subject(relation.id, subject)
 
+    def _on_credentials_changed(self, event: RelationChangedEvent) -> None:
+        """Syncs the client users written by the leader into the unit's authfile.
+
+        Without it, other units only pick up new clients on the next update-status. Units of the
+        app owning the client secrets don't get secret-changed, the leader publishes the client
+        usernames in the peer relation instead.
+        """
+        if not self.charm.context.peer_relation or not self.charm.workload.container_can_connect():
+            return
+
+        if changed := self.charm.auth_manager.sync_client_users():
+            logger.info(f"Synced client users {', '.join(changed)}")
+
     def _on_relation_broken(self, event: RelationBrokenEvent):
         """Handle relation broken event."""
         # don't remove anything if app is going down
@@ -80,7 +108,7 @@ class KarapaceHandler(Object):
             return
 
         if not self.charm.healthy:
-            event.defer()
+            self.charm.metrics.defer(event)
             return
 
         if event.relation.app != self.charm.app or not self.charm.app.planned_units() == 0:
@@ -95,31 +123,63 @@ class KarapaceHandler(Object):
 
     def update_clients_data(self) -> None:
         """Update clients relation data."""
-        for client in self.charm.context.clients:
+        # non-leader units need cluster_config_changed event to update their authfiles
+        if not self.charm.unit.is_leader():
+            return
 
-            if not all([client.username, client.password, client.subject]):
-                continue
+        clients = [
+            client for client in self.charm.context.roster if client.password and client.subject
+        ]
+        if not clients:
+            return
 
-            subject = client.subject
-            endpoints = self.charm.context.endpoints
-            tls = "enabled" if self.charm.context.cluster.tls_enabled else "disabled"
-            relation = client.relation
+        endpoints = {
+            endpoint_type: self._endpoints(endpoint_type)
+            for endpoint_type in {client.endpoint_type for client in clients}
+        }
+        tls = "enabled" if self.charm.context.cluster.tls_enabled else "disabled"
+        tls_ca = self.charm.context.server.ca if self.charm.context.cluster.tls_enabled else ""
 
-            if not relation:
-                continue
+        # sorted, as the order of a set differs between hook processes
+        self.charm.context.cluster.update(
+            {"super-users": json.dumps(sorted(self.charm.context.super_users))}
+        )
 
-            # non-leader units need cluster_config_changed event to update their authfiles
-            if self.charm.unit.is_leader():
-                self.charm.context.cluster.update(
-                    {
-                        client.username: client.password,
-                        "super-users": str(self.charm.context.super_users),
-                    }
-                )
-
-                self.karapace_provider.set_endpoint(relation.id, endpoints)
-                self.karapace_provider.set_credentials(
-                    relation.id, client.username, client.password
-                )
-                self.karapace_provider.set_tls(relation.id, tls)
-                self.karapace_provider.set_subject(relation.id, subject)
+        client_data = {
+            client.relation.id: {
+                "endpoints": endpoints[client.endpoint_type],
+                "username": client.username,
+                "password": client.password,
+                "tls": tls,
+                "tls-ca": tls_ca,
+                "subject": client.subject,
+            }
+            for client in clients
+        }
+
+        # every write fires relation-changed on the client, so only changed fields are written
+        fields = ["endpoints", "username", "password", "tls", "tls-ca", "subject"]
+        published = self.karapace_provider.fetch_my_relation_data(list(client_data), fields) or {}
+        for relation_id, data in client_data.items():
+            current = published.get(relation_id, {})
+            if changed := {
+                field: value for field, value in data.items() if current.get(field, "") != value
+            }:
+                self.karapace_provider.update_relation_data(relation_id, changed)
+
+    def _endpoints(self, endpoint_type: str) -> str:
+        """The endpoints published to clients requesting the given type of endpoints.
+
+        Clients requesting the `service` endpoint get the address of the registry K8s Service,
+        which does not change when units are added or removed. Endpoints are prefixed with
+        `https://` once the unit runs with its HTTPS listener.
+        """
+        scheme = "https://" if self.charm.workload.listener_protocol == "https" else ""
+        if endpoint_type != "service":
+            endpoints = self.charm.context.endpoints
+        else:
+            endpoints = self.charm.k8s_manager.get_service_endpoint(
+                self.charm.config.expose_external
+            )
+
+        return ",".join(f"{scheme}{endpoint}" for endpoint in endpoints.split(",") if endpoint)
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Handler for staged restarts across the units of the application."""
+
+import logging
+import time
+from typing import TYPE_CHECKING
+
+from ops import EventBase, Object, PebbleCustomNoticeEvent
+
+from literals import CONTAINER, PEER, READY_NOTICE
+
+if TYPE_CHECKING:
+    from charm import KarapaceCharm
+
+logger = logging.getLogger(__name__)
+
+
+class RestartHandler(Object):
+    """Restarts units one at a time, coordinated by the leader over the peer relation.
+
+    Units needing a restart set `restart-request` on their unit databag. The leader grants
+    the restart to a single unit at a time through `restart-granted` on the app databag.
+    Once restarted, the unit keeps its request until Karapace reports ready on `/_health`,
+    i.e has replayed `_schemas`, then clears it, which lets the leader grant the next one.
+    Readiness is checked again once the workload notifies that Karapace is ready, and on
+    `update-status` and peer relation changes.
+    """
+
+    def __init__(self, charm) -> None:
+        super().__init__(charm, "restart")
+        self.charm: "KarapaceCharm" = charm
+
+        self.framework.observe(self.charm.on[PEER].relation_changed, self._on_peer_changed)
+        self.framework.observe(self.charm.on[PEER].relation_departed, self._on_peer_changed)
+        self.framework.observe(self.charm.on.leader_elected, self._on_peer_changed)
+        self.framework.observe(self.charm.on.update_status, self._on_peer_changed)
+        self.framework.observe(
+            self.charm.on[CONTAINER].pebble_custom_notice, self._on_custom_notice
+        )
+
+    def request_restart(self) -> None:
+        """Queues a restart of the unit's workload."""
+        request = self.charm.context.server.restart_request
+        # a restart already run for the pending request would not apply the new changes
+        if not request or request == self.charm.context.unit_state.restarted_for:
+            self.charm.context.server.update({"restart-request": str(time.time())})
+
+        self._process()
+
+    def _on_peer_changed(self, _: EventBase) -> None:
+        """Handler for peer relation changes, granting and running queued restarts."""
+        if not self.charm.context.peer_relation:
+            return
+
+        self._process()
+
+    def _on_custom_notice(self, event: PebbleCustomNoticeEvent) -> None:
+        """Handler for the notice raised by the workload once Karapace is ready."""
+        if event.notice.key != READY_NOTICE or not self.charm.context.peer_relation:
+            return
+
+        self._process()
+
+    def _process(self) -> None:
+        """Grants the next restart if leader, and runs the unit's restart if granted."""
+        if self.charm.unit.is_leader():
+            self._grant()
+
+        server = self.charm.context.server
+        if not server.restart_request:
+            return
+
+        if self.charm.context.cluster.restart_granted != self.charm.unit.name:
+            logger.info("Restart queued, waiting for other units to restart first")
+            return
+
+        unit_state = self.charm.context.unit_state
+        if unit_state.restarted_for != server.restart_request:
+            logger.info(f"Restarting {self.charm.unit.name}")
+            self.charm.workload.restart()
+            self.charm.metrics.record_restart()
+            unit_state.restarted_for = server.restart_request
+            # replays `_schemas` again, readiness is checked anew
+            unit_state.kafka_probe = {}
+
+        # other units restart only once this one serves again, never on failures
+        health = self.charm.health_manager.get_health()
+        if not health or not health.ready:
+            logger.info("Restarted, holding the restart until Karapace reports ready")
+            return
+
+        server.update({"restart-request": ""})
+
+        # the leader does not get relation-changed for its own writes
+        if self.charm.unit.is_leader():
+            self._grant()
+
+    def _grant(self) -> None:
+        """Grants the restart to the next unit in the queue, if no restart is in progress."""
+        pending = sorted(
+            (server for server in self.charm.context.servers if server.restart_request),
+            key=lambda server: server.unit_id,
+        )
+
+        granted = self.charm.context.cluster.restart_granted
+        if granted in [server.unit.name for server in pending]:
+            return
+
+        next_unit = pending[0].unit.name if pending else ""
+        if next_unit != granted:
+            self.charm.context.cluster.update({"restart-granted": next_unit})
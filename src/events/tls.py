@@ -8,19 +8,29 @@ import base64
 import logging
 import re
 import socket
+import zlib
+from collections.abc import Callable
 from typing import TYPE_CHECKING
 
-from charms.tls_certificates_interface.v4.tls_certificates import (
+from charmlibs.interfaces.tls_certificates import (
     CertificateAvailableEvent,
     CertificateRequestAttributes,
     PrivateKey,
     TLSCertificatesRequiresV4,
-    generate_private_key,
+    calculate_relative_datetime,
 )
+from cryptography.exceptions import UnsupportedAlgorithm
 from ops.charm import ActionEvent
 from ops.framework import EventBase, EventSource, Object
+from typing_extensions import override
 
-from literals import TLS_RELATION
+from literals import (
+    REGISTRY_SERVICE,
+    TLS_RELATION,
+    TLS_RENEWAL_EARLIEST,
+    TLS_RENEWAL_LATEST,
+    Status,
+)
 
 if TYPE_CHECKING:
     from charm import KarapaceCharm
@@ -32,6 +42,31 @@ class RefreshTLSCertificatesEvent(EventBase):
     """Event for refreshing TLS certificates."""
 
 
+class StaggeredTLSCertificatesRequires(TLSCertificatesRequiresV4):
+    """TLS certificates requirer with a renewal time computed only when the lib uses it.
+
+    The renewal time of the unit depends on the planned units and on the peer data, which
+    would otherwise be read on every hook, while the lib only needs it when storing a
+    certificate.
+    """
+
+    def __init__(self, *args, renewal_relative_time: Callable[[], float], **kwargs) -> None:
+        self._renewal_relative_time = renewal_relative_time
+        super().__init__(*args, **kwargs)
+
+    @property
+    @override
+    def renewal_relative_time(
+        self,
+    ) -> float:  # pyright: ignore[reportIncompatibleVariableOverride]
+        return self._renewal_relative_time()
+
+    @renewal_relative_time.setter
+    def renewal_relative_time(self, _: float) -> None:
+        # the lib sets its default on init, superseded by the callable
+        pass
+
+
 class TLSHandler(Object):
     """Handler for managing the client and unit TLS keys/certs."""
 
@@ -51,7 +86,7 @@ class TLSHandler(Object):
         sans_ip = self._sans["sans_ip"] or []
         sans_dns = self._sans["sans_dns"] or []
 
-        self.certificates = TLSCertificatesRequiresV4(
+        self.certificates = StaggeredTLSCertificatesRequires(
             self.charm,
             TLS_RELATION,
             certificate_requests=[
@@ -63,6 +98,7 @@ class TLSHandler(Object):
             ],
             refresh_events=[self.refresh_tls_certificates],
             private_key=private_key,
+            renewal_relative_time=lambda: self.renewal_relative_time,
         )
 
         # Own certificates handlers
@@ -81,6 +117,10 @@ class TLSHandler(Object):
         self.framework.observe(
             getattr(self.charm.on, "set_tls_private_key_action"), self._set_tls_private_key
         )
+        self.framework.observe(
+            getattr(self.charm.on, "get_tls_renewal_schedule_action"),
+            self._get_tls_renewal_schedule,
+        )
 
     def _tls_relation_created(self, _) -> None:
         """Handler for `certificates_relation_created` event."""
@@ -93,7 +133,11 @@ class TLSHandler(Object):
         """Handler for `certificates_relation_joined` event."""
         # generate unit private key if not already created by action
         if not self.charm.context.server.private_key:
-            self.charm.context.server.update({"private-key": generate_private_key().raw})
+            private_key = self.charm.tls_manager.generate_private_key(
+                self.charm.config.tls_key_type
+            )
+            self.charm.context.server.update({"private-key": private_key})
+            self.certificates._private_key = PrivateKey.from_string(private_key)
 
     def _tls_relation_broken(self, _) -> None:
         """Handler for `certificates_relation_broken` event."""
@@ -113,33 +157,102 @@ class TLSHandler(Object):
         """Handler for `certificates_available` event after provider updates signed certs."""
         if not self.charm.context.peer_relation:
             logger.warning("No peer relation on certificate available")
-            event.defer()
+            self.charm.metrics.defer(event)
+            return
+
+        if not self.charm.workload.container_can_connect():
+            self.charm.metrics.defer(event)
             return
 
-        self.charm.context.server.update({"certificate": event.certificate.raw})
-        self.charm.context.server.update({"ca-cert": event.ca.raw})
+        bundle = {
+            "certificate": event.certificate.raw,
+            "ca-cert": event.ca.raw,
+            "certificate-expiry": event.certificate.expiry_time.isoformat(),
+            # same renewal time as the one set by the lib on the certificate secret
+            "certificate-renewal": calculate_relative_datetime(
+                target_time=event.certificate.expiry_time,
+                fraction=self.certificates.renewal_relative_time,
+            ).isoformat(),
+        }
         # Update private key if required.
         private_key = self.certificates.private_key
         if private_key and private_key.raw != self.charm.context.server.private_key:
-            self.charm.context.server.update({"private-key": private_key.raw})
+            bundle["private-key"] = private_key.raw
+
+        self.charm.context.server.update(bundle)
+        restart = self.charm.tls_manager.install_bundle()
+
+        # the first certificate switches the REST listener to HTTPS, rendered here so that
+        # the unit restarts once, with both the bundle and the config in place
+        if self.charm.context.ready_to_start == Status.ACTIVE:
+            restart |= self.charm.config_manager.update_config()
+
+        if restart:
+            # Renewed on all units at once by the provider, restarts still go one unit at a time
+            self.charm.restart.request_restart()
 
-        self.charm.tls_manager.set_server_key()
-        self.charm.tls_manager.set_ca()
-        self.charm.tls_manager.set_certificate()
+        # clients get the CA of the unit
+        self.charm.on.config_changed.emit()
 
     def _set_tls_private_key(self, event: ActionEvent) -> None:
         """Handler for `set_tls_private_key` action."""
-        key = event.params.get("internal-key") or generate_private_key().raw
+        key_type = event.params.get("key-type") or self.charm.config.tls_key_type
+        key = event.params.get("internal-key") or self.charm.tls_manager.generate_private_key(
+            key_type
+        )
         private_key = (
             key
             if re.match(r"(-+(BEGIN|END) [A-Z ]+-+)", key)
             else base64.b64decode(key).decode("utf-8")
         )
 
-        self.charm.context.server.update({"private-key": private_key})
-        self.certificates._private_key = PrivateKey.from_string(private_key)
+        try:
+            unit_key = PrivateKey.from_string(private_key)
+        except (ValueError, TypeError, UnsupportedAlgorithm) as e:
+            logger.error(f"Can't load private key: {e}")
+            unit_key = None
+
+        if not unit_key or not unit_key.is_valid():
+            event.fail("Private key must be RSA of at least 2048 bits, or ECDSA P-256/P-384")
+            return
+
+        self.charm.context.server.update({"private-key": unit_key.raw})
+        self.certificates._private_key = unit_key
         self.refresh_tls_certificates.emit()
 
+    def _get_tls_renewal_schedule(self, event: ActionEvent) -> None:
+        """Handler for `get-tls-renewal-schedule` action."""
+        if not self.charm.context.peer_relation:
+            event.fail("The action can be run only after the peer relation is created")
+            return
+
+        schedule = {}
+        for server in sorted(self.charm.context.servers, key=lambda server: server.unit_id):
+            schedule[f"unit-{server.unit_id}"] = {
+                "expiry": server.certificate_expiry or "none",
+                "renewal": server.certificate_renewal or "none",
+            }
+
+        event.set_results(schedule)
+
+    @property
+    def renewal_relative_time(self) -> float:
+        """The time to renew the unit certificate, relative to its remaining validity.
+
+        The renewal range is split into one window per planned unit, so units renew one after
+        the other instead of all at once. Units take the windows in the order of their unit ids,
+        which don't need to be contiguous after scaling. Within its window, each unit gets a
+        stable jitter from its name, so units of different applications don't line up either.
+        """
+        unit_id = self.charm.context.server.unit_id
+        unit_ids = sorted({server.unit_id for server in self.charm.context.servers} | {unit_id})
+        windows = max(self.charm.app.planned_units(), len(unit_ids))
+        window = (TLS_RENEWAL_LATEST - TLS_RENEWAL_EARLIEST) / windows
+        slot = unit_ids.index(unit_id)
+        jitter = zlib.crc32(self.common_name.encode()) % 1000 / 1000 * window / 2
+
+        return TLS_RENEWAL_LATEST - slot * window - jitter
+
     @property
     def _sans(self) -> dict[str, list[str] | None]:
         """Builds a SAN dict of DNS names and IPs for the unit."""
@@ -149,6 +262,7 @@ class TLSHandler(Object):
                 "sans_dns": [self.model.unit.name, socket.getfqdn()],
             }
         else:
+            service = f"{self.charm.app.name}-{REGISTRY_SERVICE}"
             bind_address = ""
             if self.charm.context.peer_relation:
                 if binding := self.charm.model.get_binding(self.charm.context.peer_relation):
@@ -159,5 +273,8 @@ class TLSHandler(Object):
                     self.charm.context.server.host.split(".")[0],
                     self.charm.context.server.host,
                     socket.getfqdn(),
+                    # clients connecting through the registry Service
+                    service,
+                    f"{service}.{self.model.name}.svc.cluster.local",
                 ],
             }
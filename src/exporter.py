@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""HTTP exporter serving the charm metrics file to Prometheus.
+
+Runs inside the workload container, with the standard library only. The file is written by
+the charm in the Prometheus text format, and read again on each scrape.
+
+Usage:
+    python3 exporter.py <host> <port> <metrics file>
+"""
+
+import sys
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+
+def handler(metrics_file: Path) -> type[BaseHTTPRequestHandler]:
+    """Request handler serving `metrics_file` on `/metrics`."""
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:  # noqa: N802
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+
+            try:
+                body = metrics_file.read_bytes()
+            except FileNotFoundError:
+                body = b""
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args) -> None:
+            # scrapes are not worth a log line
+            pass
+
+    return MetricsHandler
+
+
+def main(host: str, port: int, metrics_file: Path) -> None:
+    """Serves the metrics file until interrupted."""
+    with ThreadingHTTPServer((host, port), handler(metrics_file)) as server:
+        server.serve_forever()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1], int(sys.argv[2]), Path(sys.argv[3]))
@@ -13,23 +13,43 @@ from ops.model import ActiveStatus, BlockedStatus, MaintenanceStatus, StatusBase
 CHARM_KEY = "karapace"
 CONTAINER = "karapace"
 PORT = 8081
+REGISTRY_SERVICE = "registry"  # suffix of the K8s Service exposing the registry port
+MAX_WORKERS = 8  # registry processes per unit
+METRICS_PORT = 8005  # Karapace Prometheus exporter, one port per worker from there
+CHARM_METRICS_PORT = 8090  # exporter of the charm metrics file
+CHARM_METRICS_FLUSH_INTERVAL = 60  # seconds between writes of the charm metrics file
 
 PEER = "cluster"
 KARAPACE_REL = "karapace"
+METRICS_REL = "metrics-endpoint"
+DASHBOARD_REL = "grafana-dashboard"
+LOGGING_REL = "logging"
 KAFKA_REL = "kafka"
 KAFKA_TOPIC = "_schemas"
 KAFKA_CONSUMER_GROUP = "schema-registry"
+KAFKA_PROBE_TIMEOUT = 5  # seconds
+KAFKA_PROBE_TTL = 600  # seconds
+HEALTH_CHECK_TIMEOUT = 5  # seconds
+# Pebble custom notice raised from the workload once Karapace is ready after a restart
+READY_NOTICE = "canonical.com/karapace/ready"
+READY_NOTICE_TIMEOUT = 3600  # seconds, update-status checks readiness afterwards
 
 ADMIN_USER = "operator"
 INTERNAL_USERS = [ADMIN_USER]
 SALT = "placeholder"
 
 SECRETS_APP = ["operator-password"]
+# Client passwords are spread over a fixed number of app secrets
+CLIENT_SECRET_SHARDS = 8
 SECRETS_UNIT = ["ca-cert", "csr", "certificate", "private-key"]
 
 TLS_RELATION = "certificates"
+# Renewal time of unit certificates, as a fraction of the remaining validity
+TLS_RENEWAL_EARLIEST = 0.6
+TLS_RENEWAL_LATEST = 0.9
 
-# METRICS_RULES_DIR = "./src/alert_rules/prometheus"
+METRICS_RULES_DIR = "./src/alert_rules/prometheus"
+GRAFANA_DASHBOARDS_DIR = "./src/grafana_dashboards"
 # LOGS_RULES_DIR = "./src/alert_rules/loki"
 
 SUBSTRATE = "k8s"
@@ -46,6 +66,9 @@ AuthMechanism = Literal["SASL_PLAINTEXT", "SASL_SSL", "SSL"]
 DebugLevel = Literal["DEBUG", "INFO", "WARNING", "ERROR"]
 Substrate = Literal["vm", "k8s"]
 DatabagScope = Literal["unit", "app"]
+KeyType = Literal["rsa", "ecdsa"]
+Role = Literal["admin", "user"]
+ExposeExternal = Literal["false", "nodeport", "loadbalancer"]
 
 
 @dataclass
@@ -65,6 +88,10 @@ class Status(Enum):
         MaintenanceStatus("karapace container not ready"), "DEBUG"
     )
     SERVICE_NOT_RUNNING = StatusLevel(BlockedStatus("karapace service not running"), "ERROR")
+    SERVICE_NOT_READY = StatusLevel(
+        WaitingStatus("karapace not answering health checks"), "WARNING"
+    )
+    SCHEMAS_REPLAYING = StatusLevel(WaitingStatus("replaying _schemas topic"), "INFO")
     KAFKA_NOT_RELATED = StatusLevel(BlockedStatus("missing required kafka relation"), "DEBUG")
     KAFKA_NOT_CONNECTED = StatusLevel(BlockedStatus("unit not connected to kafka"), "ERROR")
     KAFKA_TLS_MISMATCH = StatusLevel(
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Runs Karapace, keeping only a fraction of the access log entries of its output.
+
+Runs inside the workload container, with the standard library only. Karapace logs to stdout,
+which Pebble keeps and forwards to Loki, so every other log line is passed through as-is.
+Access log entries are kept evenly, e.g every fourth one for a fraction of 0.25.
+
+While the capture file of the logs directory holds a deadline in the future, all access log
+entries are also appended to the access log file of that directory, up to a maximum count.
+
+Usage:
+    python3 logsampler.py <fraction> <logs dir> <command> [<arg> ...]
+"""
+
+import json
+import signal
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import BinaryIO, Iterable
+
+# logger of the access log entries, first in the log format of Karapace
+ACCESS_LOGGER = b"aiohttp.access"
+CAPTURE_FILE = "access-capture.json"
+ACCESS_LOG_FILE = "access.log"
+
+
+class Capture:
+    """Appends access log entries to a file, while the capture file asks for it.
+
+    The capture file is checked at most once per second, so busy units do not pay for a
+    file lookup on each entry.
+    """
+
+    def __init__(self, logs_dir: Path):
+        self.control = logs_dir / CAPTURE_FILE
+        self.path = logs_dir / ACCESS_LOG_FILE
+        self.until = 0.0
+        self.remaining = 0
+        self.checked = 0.0
+        self.file: BinaryIO | None = None
+
+    def check(self) -> None:
+        """Reloads the capture file, if not done in the last second."""
+        now = time.monotonic()
+        if now - self.checked < 1:
+            return
+        self.checked = now
+
+        try:
+            capture = json.loads(self.control.read_text())
+            until, max_entries = float(capture["until"]), int(capture["max-entries"])
+        except (OSError, ValueError, KeyError, TypeError):
+            until, max_entries = 0.0, 0
+
+        if until != self.until:
+            # a new capture, counted from scratch
+            self.until, self.remaining = until, max_entries
+
+        if not self.active and self.file:
+            self.file.close()
+            self.file = None
+
+    @property
+    def active(self) -> bool:
+        """Whether entries are to be captured."""
+        return time.time() < self.until and self.remaining > 0
+
+    def write(self, line: bytes) -> None:
+        """Captures an access log entry, if a capture is active."""
+        self.check()
+        if not self.active:
+            return
+
+        if not self.file:
+            self.file = open(self.path, "ab", buffering=0)
+        self.file.write(line)
+        self.remaining -= 1
+
+
+def sample(
+    lines: Iterable[bytes], out: BinaryIO, fraction: float, capture: Capture | None = None
+) -> None:
+    """Writes all lines to `out`, except for the access log entries not sampled."""
+    credit = 0.0
+    for line in lines:
+        if line.startswith(ACCESS_LOGGER):
+            if capture:
+                capture.write(line)
+
+            credit += fraction
+            if credit < 1:
+                continue
+            credit -= 1
+
+        out.write(line)
+
+
+def main(fraction: float, logs_dir: Path, command: list[str]) -> int:
+    """Runs the command until it exits, and returns its exit code."""
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    for signum in [signal.SIGTERM, signal.SIGINT, signal.SIGHUP]:
+        signal.signal(signum, lambda signum, _: process.send_signal(signum))
+
+    # unbuffered, so that Pebble gets each line as soon as Karapace logs it
+    with open(sys.stdout.fileno(), "wb", buffering=0, closefd=False) as out:
+        if process.stdout:
+            sample(process.stdout, out, fraction, Capture(logs_dir))
+
+    return process.wait()
+
+
+if __name__ == "__main__":
+    sys.exit(main(float(sys.argv[1]), Path(sys.argv[2]), sys.argv[3:]))
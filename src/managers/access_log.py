@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Supporting objects for capturing and summarising the Karapace access log."""
+
+import json
+import logging
+import time
+from dataclasses import dataclass
+
+from core.cluster import ClusterContext
+from core.workload import WorkloadBase
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RouteLatency:
+    """Request count and latency percentiles of a single route, e.g `GET /subjects`."""
+
+    route: str
+    count: int
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+
+    def as_dict(self) -> dict[str, str]:
+        """Formats the route latency for action results."""
+        return {
+            "route": self.route,
+            "count": str(self.count),
+            "p50-ms": f"{self.p50_ms:.1f}",
+            "p95-ms": f"{self.p95_ms:.1f}",
+            "p99-ms": f"{self.p99_ms:.1f}",
+        }
+
+
+@dataclass
+class LatencyReport:
+    """Latency of the routes of the registry, over a capture of the access log."""
+
+    entries: int
+    truncated: bool
+    routes: list[RouteLatency]
+
+    @classmethod
+    def from_dict(cls, report: dict) -> "LatencyReport":
+        """Builds the report from the output of `accesslog.py`, busiest routes first."""
+        routes = [
+            RouteLatency(
+                route=route,
+                count=int(latency["count"]),
+                p50_ms=float(latency["p50-ms"]),
+                p95_ms=float(latency["p95-ms"]),
+                p99_ms=float(latency["p99-ms"]),
+            )
+            for route, latency in report["routes"].items()
+        ]
+        return cls(
+            entries=int(report["entries"]),
+            truncated=bool(report["truncated"]),
+            routes=sorted(routes, key=lambda route: (-route.count, route.route)),
+        )
+
+    def as_dict(self) -> dict:
+        """Formats the report for action results."""
+        results: dict = {"entries": str(self.entries), "truncated": str(self.truncated).lower()}
+        for i, route in enumerate(self.routes):
+            results[f"route-{i}"] = route.as_dict()
+
+        return results
+
+
+class AccessLogManager:
+    """Object for capturing the access log of the unit's Karapace processes.
+
+    A capture runs for a bounded window, during which the wrapper of the Karapace services
+    appends the access log entries to a file of the logs directory. The window is kept in the
+    unit state, so that the entries can be summarised once it has ended.
+    """
+
+    def __init__(self, context: ClusterContext, workload: WorkloadBase) -> None:
+        self.context = context
+        self.workload = workload
+
+    @property
+    def capture(self) -> dict:
+        """The deadline and size of the last capture started on the unit, if any."""
+        return dict(self.context.unit_state.access_capture)
+
+    def start_capture(self, duration: int, max_entries: int) -> float:
+        """Starts capturing the access log entries for `duration` seconds.
+
+        Access logging is turned on for the window by the workload layer, unless already on
+        for the sampled entries kept in the logs.
+
+        Args:
+            duration: the number of seconds to capture entries for
+            max_entries: the maximum number of entries to capture and parse
+
+        Returns:
+            The time the capture ends at
+        """
+        until = time.time() + duration
+        self.workload.exec(command=f"rm -f {self.workload.paths.access_log}")
+        self.workload.write(
+            content=json.dumps({"until": until, "max-entries": max_entries}),
+            path=self.workload.paths.access_capture,
+        )
+        self.context.unit_state.access_capture = {"until": until, "max-entries": max_entries}
+        self.workload.access_log_capture = True
+
+        logger.info(f"Capturing access log entries for {duration}s")
+        return until
+
+    def latency_report(self) -> LatencyReport:
+        """Summarises the entries of the last capture, once ended, and cleans it up.
+
+        Returns:
+            The latency report over the captured entries
+        """
+        max_entries = int(self.capture["max-entries"])
+        try:
+            output = self.workload.exec(
+                command=(
+                    f"python3 {self.workload.paths.accesslog} "
+                    f"{self.workload.paths.access_log} {max_entries}"
+                )
+            )
+        finally:
+            self.workload.exec(
+                command=(
+                    f"rm -f {self.workload.paths.access_capture} "
+                    f"{self.workload.paths.access_log}"
+                )
+            )
+            self.context.unit_state.access_capture = {}
+
+        return LatencyReport.from_dict(json.loads(output))
@@ -4,6 +4,7 @@
 
 """Supporting objects for Karapace user and ACL management."""
 
+import hashlib
 import json
 import logging
 from dataclasses import asdict, dataclass, field
@@ -11,14 +12,13 @@ from typing import Literal
 
 from core.cluster import ClusterContext
 from core.workload import WorkloadBase
-from literals import ADMIN_USER
+from literals import ADMIN_USER, Role
 
 logger = logging.getLogger(__name__)
 
 Algorithm = Literal["sha512"]
 ResourceType = Literal["Subject", "Config"]  # Represents types of resources on Karapace.
 Operation = Literal["Read", "Write"]
-Role = Literal["admin", "user"]
 
 
 @dataclass
@@ -189,29 +189,55 @@ class KarapaceAuth:
         self.context.cluster.update({f"{ADMIN_USER}-password": admin_password})
 
     def update_admin_user(self) -> None:
-        """Updates admin credentials based on current charm information."""
-        for user, password in self.context.cluster.internal_user_credentials.items():
+        """Updates admin credentials based on current charm information.
+
+        Passwords are hashed again, and the authfile written, only if they changed since they
+        were last written on the unit, or if the internal users are missing from the authfile.
+        """
+        credentials = self.context.cluster.internal_user_credentials
+        digest = hashlib.sha256(json.dumps(credentials, sort_keys=True).encode()).hexdigest()
+        if digest == self.context.unit_state.admin_digest and set(credentials) <= set(
+            self.auth_dict
+        ):
+            return
+
+        for user, password in credentials.items():
             self.add_user(username=user, password=password, replace=True)
             self.add_acl(username=user, subject=".*", role="admin")
 
         self.write_authfile()
+        self.context.unit_state.admin_digest = digest
 
-    def update_client_users(self) -> None:
-        """Updates credentials based on current charm information."""
-        super_users = self.context.super_users
-
-        for client in self.context.clients:
-            role = "admin" if client.username in super_users else "user"
-            password = self.context.cluster.client_passwords.get(client.username)
-            # NOTE: password might not be set yet when calling this method
-            if not password:
-                continue
-
-            self.add_user(
-                username=client.username,
-                password=password,
-                replace=True,
-            )
-            self.add_acl(username=client.username, subject=client.subject, role=role)
+    def sync_client_users(self) -> list[str]:
+        """Adds, updates and removes client users to match the roster, writing on changes only.
 
-        self.write_authfile()
+        Users already in the authfile are not hashed again, as client passwords are generated
+        once and never change.
+
+        Returns:
+            The usernames that were added, updated or removed
+        """
+        clients = {client.username: client for client in self.context.roster if client.password}
+
+        changed = [
+            username
+            for username in self.auth_dict
+            if username.startswith("relation-") and username not in clients
+        ]
+        for username in changed:
+            self.remove_user(username)
+
+        for client in clients.values():
+            entry = self.auth_dict.get(client.username)
+            acls = entry.acls if entry else None
+            if not entry:
+                self.add_user(username=client.username, password=client.password)
+
+            self.add_acl(username=client.username, subject=client.subject, role=client.role)
+            if self.auth_dict[client.username].acls != acls:
+                changed.append(client.username)
+
+        if changed:
+            self.write_authfile()
+
+        return changed
@@ -5,10 +5,11 @@
 """Supporting objects for Karapace config file management."""
 
 import json
+from functools import cached_property
 
 from core.cluster import ClusterContext
 from core.workload import WorkloadBase
-from literals import KAFKA_CONSUMER_GROUP, KAFKA_TOPIC, PORT
+from literals import KAFKA_CONSUMER_GROUP, KAFKA_TOPIC, METRICS_PORT, PORT
 
 
 class ConfigManager:
@@ -18,15 +19,37 @@ class ConfigManager:
         self.context = context
         self.workload = workload
 
-    @property
+    @cached_property
     def parsed_confile(self) -> dict:
-        """Return config file parsed as a dict."""
+        """Return config file parsed as a dict.
+
+        Read once per dispatch, and kept up to date by `write_config_file`.
+        """
         raw_file = self.workload.read(self.workload.paths.karapace_config)
         if not raw_file:
             return {}
 
         return json.loads("\n".join(raw_file))
 
+    @property
+    def bootstrap_servers(self) -> str:
+        """The Kafka bootstrap servers to render in the config file.
+
+        Servers are sorted, so a reordered list is not a config change. If the rendered servers
+        are all still present, they are kept as-is, as Karapace discovers any added broker
+        from the cluster metadata without needing a restart.
+        """
+        servers = {server for server in self.context.kafka.bootstrap_servers.split(",") if server}
+        rendered = {
+            server
+            for server in (self.parsed_confile.get("bootstrap_uri") or "").split(",")
+            if server
+        }
+        if rendered and rendered <= servers:
+            servers = rendered
+
+        return ",".join(sorted(servers))
+
     @property
     def config(self) -> dict:
         """Return the Karapace config options."""
@@ -34,27 +57,35 @@ class ConfigManager:
             return {}
 
         replication_factor = min([3, len(self.context.kafka.relation.units)])
+        # running the server in HTTPS mode
+        https = self.context.listener_protocol == "https"
         return {
             # Active services
             "karapace_rest": False,
             "karapace_registry": True,
             # Replication properties
             "advertised_hostname": self.context.server.host,
-            "advertised_protocol": "http",
+            "advertised_protocol": self.context.listener_protocol,
             "advertised_port": None,
             "client_id": f"sr-{self.context.server.unit_id}",
             "master_eligibility": True,
             # REST server options
             "host": self.context.server.host,
             "port": PORT,
-            "server_tls_certfile": None,  # running the server in HTTPS mode.
-            "server_tls_keyfile": None,
-            "access_logs_debug": False,
+            "server_tls_certfile": self.workload.paths.ssl_certfile if https else None,
+            "server_tls_keyfile": self.workload.paths.ssl_keyfile if https else None,
+            # off unless kept in the logs, turned on by the workload layer while capturing
+            "access_logs_debug": self.workload.access_log_sampling > 0,
             "rest_authorization": False,
             "compatibility": "FULL",
             "log_level": "INFO",
             "protobuf_runtime_directory": "runtime",
             "session_timeout_ms": 10000,
+            # Metrics, served in the Prometheus format
+            "stats_service": "prometheus",
+            "prometheus_host": self.context.server.host,
+            "prometheus_port": METRICS_PORT,
+            "metrics_extended": True,
             # Kafka connection settings
             "topic_name": KAFKA_TOPIC,
             "group_id": KAFKA_CONSUMER_GROUP,
@@ -69,8 +100,8 @@ class ConfigManager:
             "ssl_keyfile": self.workload.paths.ssl_keyfile
             if self.context.cluster.tls_enabled
             else None,
-            "bootstrap_uri": self.context.kafka.bootstrap_servers,
-            "sasl_bootstrap_uri": self.context.kafka.bootstrap_servers,
+            "bootstrap_uri": self.bootstrap_servers,
+            "sasl_bootstrap_uri": self.bootstrap_servers,
             "sasl_mechanism": "SCRAM-SHA-512",
             "sasl_plain_username": self.context.kafka.username,
             "sasl_plain_password": self.context.kafka.password,
@@ -79,10 +110,26 @@ class ConfigManager:
             "registry_ca": None,
         }
 
+    def update_config(self) -> bool:
+        """Writes the config file and the environment of Karapace, if the config changed.
+
+        Returns:
+            True if the config changed, and the workload needs a restart
+        """
+        if self.parsed_confile == self.config:
+            return False
+
+        self.set_environment()
+        self.write_config_file()
+        return True
+
     def write_config_file(self) -> None:
         """Create the config file."""
-        json_str = json.dumps(self.config, indent=2)
-        self.workload.write(content=json_str, path=self.workload.paths.karapace_config)
+        config = self.config
+        self.workload.write(
+            content=json.dumps(config, indent=2), path=self.workload.paths.karapace_config
+        )
+        self.parsed_confile = config
 
     def set_environment(self) -> None:
         """Sets the env-vars for Karapace."""
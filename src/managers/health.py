@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Supporting objects for Karapace health checks."""
+
+import json
+import logging
+import ssl
+import time
+import urllib.error
+import urllib.request
+from dataclasses import dataclass
+
+from core.cluster import ClusterContext
+from core.workload import WorkloadBase
+from literals import HEALTH_CHECK_TIMEOUT, KAFKA_PROBE_TTL, PORT
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class KarapaceHealth:
+    """Health report of the running Karapace process, as served on `/_health`.
+
+    The schema reader is `ready` once it has replayed the `_schemas` topic up to the highest
+    offset, and the coordinator is running while the process is a member of the
+    `schema-registry` consumer group. Once ready, Karapace also reports the time it took from
+    the start of its process.
+    """
+
+    ready: bool
+    coordinator_running: bool
+    current_offset: int
+    highest_offset: int
+    startup_seconds: float | None = None
+
+    @classmethod
+    def from_dict(cls, health: dict) -> "KarapaceHealth":
+        """Builds the health report from the `/_health` response body."""
+        return cls(
+            ready=bool(health.get("schema_registry_ready", False)),
+            coordinator_running=bool(health.get("schema_registry_coordinator_running", False)),
+            current_offset=int(health.get("schema_registry_reader_current_offset", -1)),
+            highest_offset=int(health.get("schema_registry_reader_highest_offset", -1)),
+            startup_seconds=(
+                float(health["schema_registry_startup_time_sec"])
+                if health.get("schema_registry_startup_time_sec") is not None
+                else None
+            ),
+        )
+
+    @property
+    def kafka_connected(self) -> bool:
+        """Whether Karapace holds a live connection to Kafka through its own consumer."""
+        return self.coordinator_running
+
+    @property
+    def replaying(self) -> bool:
+        """Whether Karapace is connected, but still replaying the `_schemas` topic."""
+        return self.coordinator_running and not self.ready
+
+
+class HealthManager:
+    """Object for querying the health of the running Karapace process."""
+
+    def __init__(self, context: ClusterContext, workload: WorkloadBase) -> None:
+        self.context = context
+        self.workload = workload
+        # last report queried during the dispatch, if any
+        self.health: KarapaceHealth | None = None
+
+    @property
+    def url(self) -> str:
+        """The health endpoint of the unit's Karapace process."""
+        return f"{self.workload.listener_protocol}://{self.context.server.host}:{PORT}/_health"
+
+    @property
+    def ssl_context(self) -> ssl.SSLContext | None:
+        """SSL context trusting the unit CA, if Karapace serves HTTPS."""
+        if self.workload.listener_protocol != "https":
+            return None
+
+        return ssl.create_default_context(cadata=self.context.server.ca or None)
+
+    def brokers_active(self) -> bool:
+        """Check that Karapace is connected to Kafka, and done replaying `_schemas`.
+
+        A successful check is cached in the unit state for `KAFKA_PROBE_TTL` seconds, as long
+        as the bootstrap servers and security protocol do not change, so that Karapace is not
+        queried on every `update-status`. Otherwise, the report queried is kept in `health`.
+        """
+        servers = sorted(
+            {server for server in self.context.kafka.bootstrap_servers.split(",") if server}
+        )
+        key = f"{self.context.kafka.security_protocol}://{','.join(servers)}"
+        probe = self.context.unit_state.kafka_probe
+        if probe.get("key") == key and time.time() - probe.get("timestamp", 0) < KAFKA_PROBE_TTL:
+            return True
+
+        self.health = self.get_health()
+        if not self.health or not self.health.ready or not self.health.kafka_connected:
+            self.context.unit_state.kafka_probe = {}
+            return False
+
+        self.context.unit_state.kafka_probe = {"key": key, "timestamp": time.time()}
+        return True
+
+    def get_health(self) -> KarapaceHealth | None:
+        """Queries the Karapace health endpoint.
+
+        Returns:
+            The health report, or None if Karapace could not be reached
+        """
+        try:
+            with urllib.request.urlopen(
+                self.url, timeout=HEALTH_CHECK_TIMEOUT, context=self.ssl_context
+            ) as response:
+                body = response.read()
+        except urllib.error.HTTPError as e:
+            # Karapace answers with an error status while the schema reader is not ready,
+            # the body still holds the report
+            body = e.read()
+        except (urllib.error.URLError, OSError) as e:
+            logger.warning(f"Karapace health check failed: {e}")
+            return None
+
+        try:
+            return KarapaceHealth.from_dict(json.loads(body))
+        except (ValueError, TypeError) as e:
+            logger.warning(f"Could not parse Karapace health report: {e}")
+            return None
@@ -4,16 +4,26 @@
 
 """Manager for handling K8s patches."""
 
+import json
 import logging
+from functools import cached_property
 
 from lightkube.core.client import Client
 from lightkube.core.exceptions import ApiError
 from lightkube.models.apps_v1 import StatefulSetSpec
-from lightkube.models.core_v1 import Container, PodSpec, PodTemplateSpec
+from lightkube.models.core_v1 import (
+    Container,
+    PodSpec,
+    PodTemplateSpec,
+    ServicePort,
+    ServiceSpec,
+)
+from lightkube.models.meta_v1 import ObjectMeta, OwnerReference
 from lightkube.resources.apps_v1 import StatefulSet
+from lightkube.resources.core_v1 import Node, Service
 from lightkube.types import PatchType
 
-from literals import CONTAINER, SUBSTRATE
+from literals import CONTAINER, PORT, REGISTRY_SERVICE, SUBSTRATE, ExposeExternal
 
 # default logging from lightkube httpx requests is very noisy
 logging.getLogger("lightkube").setLevel(logging.CRITICAL)
@@ -22,6 +32,12 @@ logging.getLogger("httpcore").setLevel(logging.CRITICAL)
 
 logger = logging.getLogger(__name__)
 
+SERVICE_TYPES: dict[ExposeExternal, str] = {
+    "false": "ClusterIP",
+    "nodeport": "NodePort",
+    "loadbalancer": "LoadBalancer",
+}
+
 
 class K8sManager:
     """Object for handling K8s patches."""
@@ -38,9 +54,13 @@ class K8sManager:
         self.container = container
         self.substrate = SUBSTRATE
 
-    @property
+    @cached_property
     def client(self) -> Client:
-        """The Lightkube client."""
+        """The Lightkube client.
+
+        Built once per dispatch, loading the service account config and reusing its HTTP
+        connection for all requests.
+        """
         return Client(  # pyright: ignore[reportArgumentType]
             field_manager=self.pod_name,
             namespace=self.namespace,
@@ -57,6 +77,11 @@ class K8sManager:
         if not (sts.spec and sts.spec.selector and sts.spec.serviceName):
             raise Exception("Could not find StatefulSet spec parameters.")
 
+        # patching the Pod template again would roll all units out
+        if sts.spec.template.spec and sts.spec.template.spec.enableServiceLinks is False:
+            logger.debug("Service links already disabled")
+            return
+
         delta = StatefulSet(
             spec=StatefulSetSpec(
                 selector=sts.spec.selector,
@@ -78,6 +103,137 @@ class K8sManager:
             else:
                 raise e
 
+    @property
+    def service_name(self) -> str:
+        """The name of the K8s Service exposing the registry port."""
+        return f"{self.app_name}-{REGISTRY_SERVICE}"
+
+    def service_spec(self, expose_external: ExposeExternal) -> str:
+        """The fields set by `apply_service`, serialized to tell when the Service changes."""
+        return json.dumps(self._service(expose_external, owner_uid="").to_dict(), sort_keys=True)
+
+    def apply_service(self, expose_external: ExposeExternal) -> bool:
+        """Creates or updates the K8s Service exposing the registry port.
+
+        The Service selects the application Pods, and only routes to ready ones. It is owned
+        by the application StatefulSet, so it is removed along with the application.
+
+        Args:
+            expose_external: `false` for a ClusterIP Service, `nodeport` or `loadbalancer`
+
+        Returns:
+            True if the Service is up to date, False if it could not be applied
+        """
+        try:
+            if self._service_matches(expose_external):
+                logger.debug(f"Service {self.service_name} already up to date")
+                return True
+
+            sts = self._get_statefulset(sts_name=self.app_name)
+            if not (sts.metadata and sts.metadata.uid):
+                raise Exception("Could not find StatefulSet metadata.")
+
+            self.client.apply(self._service(expose_external, owner_uid=sts.metadata.uid))
+        except ApiError as e:
+            if e.status.code == 403:
+                logger.error("Could not apply registry Service, application needs `juju trust`")
+                return False
+            else:
+                raise e
+
+        return True
+
+    def get_service_endpoint(self, expose_external: ExposeExternal) -> str:
+        """The address of the registry Service, as comma-separated `host:port`.
+
+        ClusterIP Services are addressed by their DNS name. NodePort Services by the address of
+        every node, as the node port is open on all of them, and LoadBalancer Services by their
+        ingress, falling back to the DNS name until the load balancer is provisioned.
+        """
+        endpoint = f"{self.service_name}.{self.namespace}.svc.cluster.local:{PORT}"
+        if expose_external == "false":
+            return endpoint
+
+        try:
+            service = self.client.get(Service, name=self.service_name)
+            if expose_external == "nodeport":
+                ports = service.spec.ports if service.spec else None
+                node_port = ports[0].nodePort if ports else None
+                if node_port and (addresses := self._node_addresses()):
+                    return ",".join(f"{address}:{node_port}" for address in addresses)
+
+            if expose_external == "loadbalancer":
+                status = service.status.loadBalancer if service.status else None
+                if status and status.ingress:
+                    return f"{status.ingress[0].ip or status.ingress[0].hostname}:{PORT}"
+        except ApiError as e:
+            logger.warning(f"Could not get registry Service address: {e}")
+
+        return endpoint
+
+    def _node_addresses(self) -> list[str]:
+        """The external address of each node, or its internal address if it has none."""
+        addresses = set()
+        for node in self.client.list(Node):
+            by_type = {
+                address.type: address.address
+                for address in (node.status.addresses or [] if node.status else [])
+            }
+            if address := by_type.get("ExternalIP") or by_type.get("InternalIP"):
+                addresses.add(address)
+
+        return sorted(addresses)
+
+    def _service(self, expose_external: ExposeExternal, owner_uid: str) -> Service:
+        """The registry Service, owned by the application StatefulSet of the given uid."""
+        return Service(
+            metadata=ObjectMeta(
+                name=self.service_name,
+                namespace=self.namespace,
+                ownerReferences=[
+                    OwnerReference(
+                        apiVersion="apps/v1",
+                        kind="StatefulSet",
+                        name=self.app_name,
+                        uid=owner_uid,
+                    )
+                ],
+            ),
+            spec=ServiceSpec(
+                type=SERVICE_TYPES[expose_external],
+                selector={"app.kubernetes.io/name": self.app_name},
+                ports=[ServicePort(name=REGISTRY_SERVICE, port=PORT, targetPort=PORT)],
+                publishNotReadyAddresses=False,
+            ),
+        )
+
+    def _service_matches(self, expose_external: ExposeExternal) -> bool:
+        """Whether the live Service already has the fields set by `apply_service`.
+
+        The owner is matched by name, so that the StatefulSet is only fetched to apply changes.
+        """
+        try:
+            live = self.client.get(Service, name=self.service_name)
+        except ApiError as e:
+            if e.status.code == 404:
+                return False
+            raise e
+
+        service = self._service(expose_external, owner_uid="")
+        if not (live.metadata and live.spec and service.metadata and service.spec):
+            return False
+
+        return (
+            live.spec.type == service.spec.type
+            and live.spec.selector == service.spec.selector
+            and bool(live.spec.publishNotReadyAddresses)
+            == bool(service.spec.publishNotReadyAddresses)
+            and [(port.name, port.port, port.targetPort) for port in live.spec.ports or []]
+            == [(port.name, port.port, port.targetPort) for port in service.spec.ports or []]
+            and [(ref.kind, ref.name) for ref in live.metadata.ownerReferences or []]
+            == [(ref.kind, ref.name) for ref in service.metadata.ownerReferences or []]
+        )
+
     def _get_statefulset(self, sts_name: str) -> StatefulSet:
         """Gets the StatefulSet of a given name via the K8s API."""
         return self.client.get(StatefulSet, name=sts_name)
@@ -4,17 +4,124 @@
 
 """Supporting objects for Kafka utils and management."""
 
+import asyncio
 import logging
+import ssl
 import tempfile
-
-from charms.kafka.v0.client import KafkaClient
+import time
+from collections.abc import Awaitable, Callable, Generator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
 
 from core.cluster import ClusterContext
 from core.workload import WorkloadBase
-from literals import KAFKA_TOPIC
+from literals import KAFKA_CONSUMER_GROUP, KAFKA_PROBE_TIMEOUT, KAFKA_TOPIC
+
+if TYPE_CHECKING:
+    from charms.kafka.v0.client import KafkaClient
 
 logger = logging.getLogger(__name__)
 
+# reported for the fields that could not be described
+UNAVAILABLE = "unavailable"
+
+
+@dataclass
+class BrokerProbe:
+    """Latencies of the different connection stages against a single bootstrap server.
+
+    Stages that were not reached, or do not apply (e.g `tls` on plaintext listeners),
+    are left as None.
+    """
+
+    server: str
+    connect_ms: float | None = None
+    tls_ms: float | None = None
+    auth_ms: float | None = None
+    metadata_ms: float | None = None
+    error: str = ""
+
+    @property
+    def reachable(self) -> bool:
+        """Whether all stages of the probe succeeded."""
+        return not self.error
+
+    @property
+    def total_ms(self) -> float:
+        """The summed latency of all reached stages."""
+        return sum(
+            latency
+            for latency in [self.connect_ms, self.tls_ms, self.auth_ms, self.metadata_ms]
+            if latency is not None
+        )
+
+    def as_dict(self) -> dict[str, str]:
+        """Formats the probe for action results."""
+        results = {"server": self.server, "total-ms": f"{self.total_ms:.1f}"}
+        for stage, latency in [
+            ("connect-ms", self.connect_ms),
+            ("tls-ms", self.tls_ms),
+            ("auth-ms", self.auth_ms),
+            ("metadata-ms", self.metadata_ms),
+        ]:
+            if latency is not None:
+                results[stage] = f"{latency:.1f}"
+
+        if self.error:
+            results["error"] = self.error
+
+        return results
+
+
+@dataclass
+class SchemasTopicReport:
+    """State of the `_schemas` topic, and of the consumer group of Karapace.
+
+    Replica sizes and the consumer group need more permissions than reading the topic, e.g
+    `Cluster:Describe`, and are left as None when they could not be described.
+    """
+
+    start_offset: int
+    end_offset: int
+    replica_sizes: dict[int, int] | None
+    records: int
+    live_keys: int
+    truncated: bool
+    group_state: str | None
+    group_members: int | None
+    committed_offset: int | None
+
+    def as_dict(self) -> dict:
+        """Formats the report for action results."""
+        results: dict = {
+            "start-offset": str(self.start_offset),
+            "end-offset": str(self.end_offset),
+            "size-bytes": UNAVAILABLE,
+            "records": str(self.records),
+            "live-keys": str(self.live_keys),
+            "truncated": str(self.truncated).lower(),
+            "consumer-group": {"name": KAFKA_CONSUMER_GROUP, "state": UNAVAILABLE},
+        }
+        if self.replica_sizes is not None:
+            # the largest replica, the others may lag behind
+            results["size-bytes"] = str(max(self.replica_sizes.values(), default=0))
+            results["replica-size-bytes"] = {
+                f"broker-{broker}": str(size) for broker, size in self.replica_sizes.items()
+            }
+
+        if self.group_state is not None:
+            results["consumer-group"] |= {
+                "state": self.group_state,
+                "members": str(self.group_members),
+                "committed-offset": (
+                    str(self.committed_offset) if self.committed_offset is not None else "none"
+                ),
+            }
+
+        return results
+
 
 class KafkaManager:
     """Object for handling Kafka."""
@@ -23,34 +130,263 @@ class KafkaManager:
         self.context = context
         self.workload = workload
 
-    def brokers_active(self) -> bool:
-        """Check that Kafka is active."""
-        # Make a local copy for the tls related files.
-        with tempfile.TemporaryDirectory() as tmp_dir:
-            ca_file = open(mode="w", file=f"{tmp_dir}/ca")
-            cert_file = open(mode="w", file=f"{tmp_dir}/cert")
-            key_file = open(mode="w", file=f"{tmp_dir}/key")
+    @property
+    def servers(self) -> list[str]:
+        """The normalised list of Kafka bootstrap servers."""
+        return sorted(
+            {server for server in self.context.kafka.bootstrap_servers.split(",") if server}
+        )
+
+    def probe_brokers(self) -> list[BrokerProbe]:
+        """Probes all bootstrap servers concurrently, each bounded by `KAFKA_PROBE_TIMEOUT`.
+
+        The latency of the slowest reachable broker is kept in the unit state, for the charm
+        metrics.
+
+        Returns:
+            List of probe results, in the same order as `servers`
+        """
+        probes = asyncio.run(self._probe_all())
+        self.context.unit_state.kafka_probe_latency_ms = max(
+            (probe.total_ms for probe in probes if probe.reachable), default=None
+        )
+        return probes
+
+    def schemas_topic_report(self, max_records: int) -> SchemasTopicReport:
+        """Reports offsets, size and compaction state of the `_schemas` topic.
+
+        Records are read from the beginning of the topic to count the keys that are still
+        live, i.e not deleted by a later tombstone. Reading stops after `max_records`, the
+        report is truncated if records were left before the end offsets.
+
+        Args:
+            max_records: the maximum number of records to read
+
+        Returns:
+            The report for the `_schemas` topic and the Karapace consumer group
+        """
+        # Imported here, as hooks only need kafka-python when explicitly querying the brokers
+        from kafka.errors import KafkaError
+        from kafka.structs import TopicPartition
+
+        with self._client() as client:
+            start_offsets, end_offsets = client.topic_offsets(KAFKA_TOPIC)
+
+            records = 0
+            keys: dict[bytes, bool] = {}
+            # next offset to read by partition, compacted offsets don't hold any record
+            positions = dict(start_offsets)
+            for record in client.read_topic(KAFKA_TOPIC, max_records=max_records):
+                records += 1
+                keys[record.key] = record.value is not None
+                positions[TopicPartition(record.topic, record.partition)] = record.offset + 1
+
+            report = SchemasTopicReport(
+                start_offset=sum(start_offsets.values()),
+                end_offset=sum(end_offsets.values()),
+                replica_sizes=None,
+                records=records,
+                live_keys=sum(keys.values()),
+                truncated=records >= max_records
+                and any(positions.get(tp, 0) < end for tp, end in end_offsets.items()),
+                group_state=None,
+                group_members=None,
+                committed_offset=None,
+            )
+
+            try:
+                report.replica_sizes = client.topic_size(KAFKA_TOPIC)
+            except KafkaError as e:
+                logger.warning(f"Could not describe the replicas of {KAFKA_TOPIC}: {e}")
 
-            ca_file.write(self.context.server.ca)
-            cert_file.write(self.context.server.certificate)
-            key_file.write(self.context.server.private_key)
+            try:
+                group = client.describe_consumer_group(KAFKA_CONSUMER_GROUP)
+                offsets = client.list_consumer_group_offsets(KAFKA_CONSUMER_GROUP)
+            except KafkaError as e:
+                logger.warning(f"Could not describe {KAFKA_CONSUMER_GROUP} consumer group: {e}")
+            else:
+                committed = [
+                    offset.offset for tp, offset in offsets.items() if tp.topic == KAFKA_TOPIC
+                ]
+                report.group_state = group.state or "unknown"
+                report.group_members = len(group.members)
+                report.committed_offset = sum(committed) if committed else None
+
+        return report
+
+    @staticmethod
+    def summary(probes: list[BrokerProbe]) -> str:
+        """Short, human-readable summary of a set of broker probes."""
+        if not probes:
+            return "no bootstrap servers to probe"
+
+        reachable = [probe for probe in probes if probe.reachable]
+        summary = f"{len(reachable)}/{len(probes)} brokers reachable"
+        if reachable:
+            slowest = max(reachable, key=lambda probe: probe.total_ms)
+            summary += f", slowest {slowest.server} in {slowest.total_ms:.0f}ms"
+        if failed := [probe.server for probe in probes if not probe.reachable]:
+            summary += f", failed: {', '.join(failed)}"
+
+        return summary
 
-            ca_file.close()
-            cert_file.close()
-            key_file.close()
+    @contextmanager
+    def _client(self) -> Generator["KafkaClient", None, None]:
+        """A `KafkaClient` bounded by `KAFKA_PROBE_TIMEOUT`, closed and cleaned up on exit."""
+        # Imported here, as hooks only need kafka-python when explicitly querying the brokers
+        from charms.kafka.v0.client import KafkaClient
 
-            client = KafkaClient(
-                servers=self.context.kafka.bootstrap_servers.split(","),
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cafile = None
+            if "SSL" in self.context.kafka.security_protocol:
+                cafile = Path(tmp_dir) / "ca"
+                cafile.write_text(self._broker_ca)
+
+            with KafkaClient(
+                servers=self.servers,
                 username=self.context.kafka.username,
                 password=self.context.kafka.password,
                 security_protocol=self.context.kafka.security_protocol,
-                cafile_path=ca_file.name,
-                certfile_path=cert_file.name,
-                keyfile_path=key_file.name,
+                cafile_path=str(cafile) if cafile else None,
+                request_timeout_ms=KAFKA_PROBE_TIMEOUT * 1000,
+                connection_timeout_ms=KAFKA_PROBE_TIMEOUT * 1000,
+            ) as client:
+                yield client
+
+    @property
+    def _broker_ca(self) -> str:
+        """The CA of the brokers."""
+        # Same fallback as `TLSManager.broker_ca` for brokers sending `enabled` as CA
+        broker_ca = self.context.kafka.broker_ca
+        if not broker_ca or broker_ca == "enabled":
+            broker_ca = self.context.server.ca
+
+        return broker_ca
+
+    @property
+    def _ssl_context(self) -> ssl.SSLContext | None:
+        """SSL context built from the in-memory broker CA, if the brokers use TLS."""
+        if "SSL" not in self.context.kafka.security_protocol:
+            return None
+
+        context = ssl.create_default_context(cadata=self._broker_ca or None)
+        context.check_hostname = False
+        return context
+
+    async def _probe_all(self) -> list[BrokerProbe]:
+        """Runs the probes of all bootstrap servers concurrently."""
+        ssl_context = self._ssl_context
+        return list(
+            await asyncio.gather(
+                *[self._probe_broker(server, ssl_context) for server in self.servers]
             )
-            try:
-                client.describe_topics([KAFKA_TOPIC])
-            except Exception as e:
-                logger.warning(e)
-                return False
-            return True
+        )
+
+    async def _probe_broker(self, server: str, ssl_context: ssl.SSLContext | None) -> BrokerProbe:
+        """Probes a single bootstrap server, bounded by `KAFKA_PROBE_TIMEOUT`."""
+        probe = BrokerProbe(server=server)
+        try:
+            await asyncio.wait_for(
+                self._run_stages(probe, ssl_context), timeout=KAFKA_PROBE_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            probe.error = f"timed out after {KAFKA_PROBE_TIMEOUT}s"
+        except Exception as e:
+            probe.error = str(e) or type(e).__name__
+
+        if probe.error:
+            logger.warning(f"Kafka probe against {server} failed: {probe.error}")
+
+        return probe
+
+    async def _run_stages(self, probe: BrokerProbe, ssl_context: ssl.SSLContext | None) -> None:
+        """Connects, authenticates and requests metadata, recording the latency of each stage.
+
+        The connection is always closed afterwards, also on failures and timeouts.
+        """
+        # Imported here, as hooks only need kafka-python's protocol when probing the brokers
+        from kafka.protocol.parser import KafkaProtocol
+
+        host, port = probe.server.rsplit(":", maxsplit=1)
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader()
+        protocol = asyncio.StreamReaderProtocol(reader)
+        kafka_protocol = KafkaProtocol(client_id=self.context.kafka.username)
+
+        start = time.perf_counter()
+        transport, _ = await loop.create_connection(lambda: protocol, host, int(port))
+        probe.connect_ms = (time.perf_counter() - start) * 1000
+
+        async def request(kafka_request: Any) -> Any:
+            kafka_protocol.send_request(kafka_request)
+            transport.write(kafka_protocol.send_bytes())
+            while True:
+                if not (data := await reader.read(65536)):
+                    raise ConnectionError("connection closed by broker")
+                if responses := kafka_protocol.receive_bytes(data):
+                    return responses[0][1]
+
+        try:
+            if ssl_context:
+                start = time.perf_counter()
+                transport = await self._start_tls(transport, protocol, ssl_context, host)
+                probe.tls_ms = (time.perf_counter() - start) * 1000
+
+            if "SASL" in self.context.kafka.security_protocol:
+                start = time.perf_counter()
+                await self._authenticate(request)
+                probe.auth_ms = (time.perf_counter() - start) * 1000
+
+            start = time.perf_counter()
+            await self._request_metadata(request)
+            probe.metadata_ms = (time.perf_counter() - start) * 1000
+        finally:
+            transport.close()
+
+    @staticmethod
+    async def _start_tls(
+        transport: asyncio.Transport,
+        protocol: asyncio.BaseProtocol,
+        ssl_context: ssl.SSLContext,
+        host: str,
+    ) -> asyncio.Transport:
+        """Upgrades the connection to TLS, returning the transport to use from then on."""
+        tls_transport = await asyncio.get_running_loop().start_tls(
+            transport, protocol, ssl_context, server_hostname=host
+        )
+        if not tls_transport:
+            raise ConnectionError("TLS handshake failed")
+
+        return tls_transport
+
+    async def _authenticate(self, request: Callable[[Any], Awaitable[Any]]) -> None:
+        """Runs the SASL handshake and the SCRAM-SHA-512 exchange with the broker."""
+        from kafka.protocol.admin import SaslAuthenticateRequest, SaslHandShakeRequest
+        from kafka.scram import ScramClient
+
+        response = await request(SaslHandShakeRequest[1](mechanism="SCRAM-SHA-512"))
+        if response.error_code:
+            raise ConnectionError(f"SASL handshake error code {response.error_code}")
+
+        scram = ScramClient(
+            self.context.kafka.username, self.context.kafka.password, "SCRAM-SHA-512"
+        )
+        for message, process in [
+            (scram.first_message, scram.process_server_first_message),
+            (scram.final_message, scram.process_server_final_message),
+        ]:
+            response = await request(
+                SaslAuthenticateRequest[0](sasl_auth_bytes=message().encode())
+            )
+            if response.error_code:
+                raise ConnectionError(f"SASL authentication failed: {response.error_message}")
+            process(response.sasl_auth_bytes.decode())
+
+    @staticmethod
+    async def _request_metadata(request: Callable[[Any], Awaitable[Any]]) -> None:
+        """Requests the metadata of the Karapace topic from the broker."""
+        from kafka.protocol.metadata import MetadataRequest
+
+        response = await request(MetadataRequest[1](topics=[KAFKA_TOPIC]))
+        if not response.brokers:
+            raise ConnectionError("metadata response without brokers")
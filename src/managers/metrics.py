@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Supporting objects for the metrics of the charm and of Karapace."""
+
+import logging
+import time
+from dataclasses import dataclass
+from typing import Literal
+
+from core.cluster import ClusterContext
+from core.workload import WorkloadBase
+from literals import CHARM_METRICS_PORT, METRICS_PORT
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CharmMetric:
+    """A single sample exported in the charm metrics file.
+
+    Samples without a value, e.g a latency not measured yet, are left out of the file.
+    """
+
+    name: str
+    help: str
+    value: float | None
+    type: Literal["gauge", "counter"] = "gauge"
+    labels: dict[str, str] | None = None
+
+    def render(self) -> list[str]:
+        """The sample in the Prometheus text format, without its HELP and TYPE lines."""
+        if self.value is None:
+            return []
+
+        labels = ""
+        if self.labels:
+            labels = "{" + ",".join(f'{k}="{v}"' for k, v in sorted(self.labels.items())) + "}"
+
+        return [f"{self.name}{labels} {self.value:g}"]
+
+
+class MetricsManager:
+    """Object for handling the metrics exported by the unit."""
+
+    def __init__(self, context: ClusterContext, workload: WorkloadBase) -> None:
+        self.context = context
+        self.workload = workload
+
+    @staticmethod
+    def scrape_jobs(workers: int) -> list[dict]:
+        """The Prometheus scrape jobs of the unit, with `*` standing for the unit address.
+
+        Each Karapace worker exports its own metrics, so every worker port is a target. The
+        charm metrics are scraped by the same job, from the exporter next to the workers, as
+        the Karapace endpoint is served by Karapace itself.
+        """
+        return [
+            {
+                "job_name": "karapace",
+                "metrics_path": "/metrics",
+                "static_configs": [
+                    {
+                        "targets": [f"*:{METRICS_PORT + worker}" for worker in range(workers)]
+                        + [f"*:{CHARM_METRICS_PORT}"]
+                    }
+                ],
+            },
+        ]
+
+    def charm_metrics(self, authfile_users: int) -> list[CharmMetric]:
+        """The metrics of the charm, mostly kept in the unit state across hooks."""
+        unit_state = self.context.unit_state
+        probe_latency_ms = unit_state.kafka_probe_latency_ms
+        return [
+            CharmMetric(
+                name="karapace_charm_authfile_users",
+                help="Users in the Karapace authfile of the unit.",
+                value=authfile_users,
+            ),
+            CharmMetric(
+                name="karapace_charm_restarts_total",
+                help="Restarts of the workload run by the charm.",
+                value=unit_state.restarts,
+                type="counter",
+            ),
+            CharmMetric(
+                name="karapace_charm_time_to_ready_seconds",
+                help="Time from the Karapace process start to its schema reader being ready.",
+                value=unit_state.time_to_ready,
+            ),
+            CharmMetric(
+                name="karapace_charm_kafka_probe_latency_seconds",
+                help="Latency of the slowest reachable broker in the last `probe-kafka` run.",
+                value=probe_latency_ms / 1000 if probe_latency_ms is not None else None,
+            ),
+        ] + self.hook_metrics()
+
+    def record_hook(
+        self, event: str, seconds: float, deferred: dict[str, int], pebble_calls: dict[str, int]
+    ) -> None:
+        """Adds a dispatch of the charm to the hook metrics kept in the unit state.
+
+        Args:
+            event: the hook or action dispatched, e.g `update-status`
+            seconds: the time spent handling the dispatch
+            deferred: the events left deferred at the end of the dispatch, by event kind
+            pebble_calls: the Pebble API calls made during the dispatch, by method
+        """
+        unit_state = self.context.unit_state
+        hooks = {name: dict(stats) for name, stats in unit_state.hook_stats.items()}
+        stats = hooks.setdefault(event, {"count": 0, "seconds": 0.0, "last": 0.0})
+        stats["count"] += 1
+        stats["seconds"] = round(stats["seconds"] + seconds, 6)
+        stats["last"] = round(seconds, 6)
+        unit_state.hook_stats = hooks
+
+        # deferred events are re-emitted on each dispatch, so still deferred means deferred again
+        defers = dict(unit_state.defers)
+        for kind, count in deferred.items():
+            defers[kind] = defers.get(kind, 0) + count
+        unit_state.defers = defers
+        unit_state.deferred = dict(deferred)
+
+        calls = dict(unit_state.pebble_calls)
+        for method, count in pebble_calls.items():
+            calls[method] = calls.get(method, 0) + count
+        unit_state.pebble_calls = calls
+
+    def hook_metrics(self) -> list[CharmMetric]:
+        """The execution metrics of the charm dispatches, by event."""
+        unit_state = self.context.unit_state
+        hooks = sorted(unit_state.hook_stats.items())
+        metrics = []
+        for name, help, key in [
+            ("karapace_charm_hooks_total", "Dispatches of the charm.", "count"),
+            ("karapace_charm_hook_seconds_total", "Time spent handling dispatches.", "seconds"),
+        ]:
+            metrics += [
+                CharmMetric(name, help, stats[key], type="counter", labels={"event": event})
+                for event, stats in hooks
+            ]
+
+        metrics += [
+            CharmMetric(
+                "karapace_charm_hook_last_duration_seconds",
+                "Duration of the last dispatch.",
+                stats["last"],
+                labels={"event": event},
+            )
+            for event, stats in hooks
+        ]
+        metrics += [
+            CharmMetric(
+                "karapace_charm_defers_total",
+                "Events deferred by the charm.",
+                count,
+                type="counter",
+                labels={"event": kind},
+            )
+            for kind, count in sorted(unit_state.defers.items())
+        ]
+        metrics += [
+            CharmMetric(
+                "karapace_charm_deferred_events",
+                "Events currently deferred.",
+                count,
+                labels={"event": kind},
+            )
+            for kind, count in sorted(unit_state.deferred.items())
+        ]
+        metrics += [
+            CharmMetric(
+                "karapace_charm_pebble_calls_total",
+                "Pebble API calls of the charm, including exec.",
+                count,
+                type="counter",
+                labels={"call": method},
+            )
+            for method, count in sorted(unit_state.pebble_calls.items())
+        ]
+        return metrics
+
+    @staticmethod
+    def render(metrics: list[CharmMetric]) -> str:
+        """Renders metrics in the Prometheus text format, grouping samples by name."""
+        lines = []
+        rendered: set[str] = set()
+        for metric in metrics:
+            if metric.name not in rendered:
+                rendered.add(metric.name)
+                lines += [
+                    f"# HELP {metric.name} {metric.help}",
+                    f"# TYPE {metric.name} {metric.type}",
+                ]
+            lines += metric.render()
+
+        return "\n".join(lines) + "\n"
+
+    def write_charm_metrics(self, metrics: list[CharmMetric]) -> None:
+        """Writes the charm metrics file served by the exporter, if its content changed.
+
+        The last written content is kept in the unit state rather than read back from the
+        container, and cleared when the container restarts with an empty filesystem.
+        """
+        content = self.render(metrics)
+        self.context.unit_state.metrics_flushed = time.time()
+        if self.context.unit_state.charm_metrics == content:
+            return
+
+        self.workload.write(content=content, path=self.workload.paths.charm_metrics)
+        self.context.unit_state.charm_metrics = content
@@ -7,10 +7,12 @@
 import logging
 import subprocess
 
+from charmlibs.interfaces.tls_certificates import Certificate, PrivateKey
 from ops.pebble import ExecError
 
 from core.cluster import ClusterContext
 from core.workload import WorkloadBase
+from literals import KeyType
 
 logger = logging.getLogger(__name__)
 
@@ -26,18 +28,21 @@ class TLSManager:
         """Generate an alias from a relation. Used to identify ca certs."""
         return f"{app_name}-{relation_id}"
 
-    def set_server_key(self) -> None:
-        """Sets the unit private-key."""
-        if not self.context.server.private_key:
-            logger.error("Can't set private-key to unit, missing private-key in relation data")
-            return
+    @staticmethod
+    def generate_private_key(key_type: KeyType) -> str:
+        """Generates a new PEM-encoded private key.
 
-        self.workload.write(
-            content=self.context.server.private_key, path=self.workload.paths.ssl_keyfile
-        )
+        Args:
+            key_type: `rsa` for an RSA 2048 key, or `ecdsa` for an ECDSA P-256 key
+
+        Returns:
+            The private key contents
+        """
+        return PrivateKey.generate(key_algorithm=key_type).raw
 
-    def set_ca(self) -> None:
-        """Set the Apache Kafka broker CA."""
+    @property
+    def broker_ca(self) -> str:
+        """The CA of the Apache Kafka brokers."""
         broker_ca = self.context.kafka.broker_ca
 
         # Compatibility: Kafka 3 charm sends `enabled` on `tls-ca` field.
@@ -46,20 +51,53 @@ class TLSManager:
         if not broker_ca or broker_ca == "enabled":
             broker_ca = self.context.server.ca
 
-        if not broker_ca:
-            logger.error("Can't set CA to unit, missing CA in relation data")
-            return
-
-        self.workload.write(content=broker_ca, path=self.workload.paths.ssl_cafile)
-
-    def set_certificate(self) -> None:
-        """Sets the unit certificate."""
-        if not self.context.server.certificate:
-            logger.error("Can't set certificate to unit, missing certificate in relation data")
-            return
-
-        self.workload.write(
-            content=self.context.server.certificate, path=self.workload.paths.ssl_certfile
+        return broker_ca
+
+    @property
+    def bundle(self) -> dict[str, str]:
+        """The private-key, certificate and CA files to install, mapped by filepath."""
+        return {
+            self.workload.paths.ssl_keyfile: self.context.server.private_key,
+            self.workload.paths.ssl_certfile: self.context.server.certificate,
+            self.workload.paths.ssl_cafile: self.broker_ca,
+        }
+
+    def install_bundle(self) -> bool:
+        """Installs the private-key, certificate and CA of the unit as a single bundle.
+
+        Nothing is written unless all three files are available and the certificate matches
+        the private-key, so Karapace never starts with a half-renewed bundle. Files whose
+        contents did not change are not rewritten, the others are written next to their path
+        and renamed over it, so that no file is ever read half-written.
+
+        Returns:
+            True if any file of the bundle changed, and the workload needs a restart
+        """
+        bundle = self.bundle
+        if missing := [path for path, content in bundle.items() if not content]:
+            logger.error(f"Can't install TLS bundle, missing {', '.join(missing)}")
+            return False
+
+        if not self._certificate_matches_key():
+            logger.error("Can't install TLS bundle, certificate does not match private-key")
+            return False
+
+        changed = {
+            path: content
+            for path, content in bundle.items()
+            if "\n".join(self.workload.read(path)) != content
+        }
+        for path, content in changed.items():
+            self.workload.write(content=content, path=f"{path}.tmp")
+        for path in changed:
+            self.workload.exec(f"mv -f {path}.tmp {path}")
+
+        return bool(changed)
+
+    def _certificate_matches_key(self) -> bool:
+        """Checks that the unit certificate was issued for the unit private-key."""
+        return Certificate.from_string(self.context.server.certificate).matches_private_key(
+            PrivateKey.from_string(self.context.server.private_key)
         )
 
     # FIXME: This method does not work since * is a bash thing.
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Waits for Karapace to report ready, then notifies the charm with a Pebble custom notice.
+
+Runs inside the workload container after each restart, with the standard library only, so
+that the charm checks readiness as soon as the schema reader is ready instead of on the next
+`update-status`. Gives up after the timeout, leaving the check to `update-status`.
+
+Usage:
+    python3 readynotify.py <health url> <notice key> <timeout seconds>
+"""
+
+import json
+import ssl
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+# mounted by Juju in the workload containers of sidecar charms
+PEBBLE = "/charm/bin/pebble"
+POLL_INTERVAL = 2  # seconds
+
+
+def ready(url: str) -> bool:
+    """Whether Karapace reports its schema reader ready on its health endpoint."""
+    # only the readiness is read, the certificate is checked by the clients
+    context = ssl.create_default_context()
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    try:
+        with urllib.request.urlopen(url, timeout=POLL_INTERVAL, context=context) as response:
+            return bool(json.load(response).get("schema_registry_ready", False))
+    except (urllib.error.URLError, OSError, ValueError):
+        return False
+
+
+def main(url: str, key: str, timeout: float) -> int:
+    """Polls the health endpoint until ready, then adds the notice."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if ready(url):
+            return subprocess.run([PEBBLE, "notify", key]).returncode
+        time.sleep(POLL_INTERVAL)
+
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1], sys.argv[2], float(sys.argv[3])))
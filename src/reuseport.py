@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Runs a Karapace worker sharing the registry port with the other workers of the unit.
+
+Runs inside the workload container, with the Python environment of Karapace. Karapace serves
+its REST API through `aiohttp.web.run_app`, which is given sockets bound with `SO_REUSEPORT`
+instead, so that the kernel spreads new connections over all the workers listening on the
+registry port, with no process in between. Each worker also listens on its own port, which it
+advertises, so that requests forwarded to the primary reach that very worker.
+
+Usage:
+    python3 reuseport.py <own port> <module>
+"""
+
+import runpy
+import socket
+import sys
+
+
+def listeners(host: str, port: int, own_port: int) -> list[socket.socket]:
+    """The sockets of the registry port shared by the workers, and of the worker's own port."""
+    return [
+        socket.create_server((host, port), reuse_port=True),
+        socket.create_server((host, own_port)),
+    ]
+
+
+def main(own_port: int, module: str) -> None:
+    """Runs the module as `__main__`, with aiohttp serving on the listeners of the worker."""
+    # Karapace's own dependency, not available to the charm
+    import aiohttp.web  # pyright: ignore[reportMissingImports]
+
+    run_app = aiohttp.web.run_app
+
+    def shared_run_app(app, *args, host: str, port: int, **kwargs):
+        return run_app(app, *args, sock=listeners(host, port, own_port), **kwargs)
+
+    aiohttp.web.run_app = shared_run_app
+    sys.argv = [module]
+    runpy.run_module(module, run_name="__main__", alter_sys=True)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]), sys.argv[2])
@@ -5,7 +5,12 @@
 """Karapace workload class and methods."""
 
 import logging
+import math
 import re
+from collections import Counter
+from functools import cached_property
+from pathlib import Path
+from typing import Callable, cast
 
 from ops import Container
 from ops.pebble import ExecError, Layer, LayerDict
@@ -13,31 +18,178 @@ from tenacity import retry, retry_if_result, stop_after_attempt, wait_fixed
 from typing_extensions import override
 
 from core.workload import WorkloadBase
-from literals import CONTAINER, GROUP, SALT, USER
+from literals import (
+    CHARM_METRICS_PORT,
+    CONTAINER,
+    GROUP,
+    MAX_WORKERS,
+    METRICS_PORT,
+    PORT,
+    READY_NOTICE,
+    READY_NOTICE_TIMEOUT,
+    SALT,
+    USER,
+)
 
 logger = logging.getLogger(__name__)
 
 
+class _CountingContainer:
+    """Container proxy counting the Pebble API calls made through it, by method."""
+
+    def __init__(self, container: Container, calls: Counter):
+        self._container = container
+        self._calls = calls
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._container, name)
+        if name.startswith("_") or not callable(attr):
+            return attr
+
+        def counted(*args, **kwargs):
+            self._calls[name] += 1
+            return attr(*args, **kwargs)
+
+        return counted
+
+
 class KarapaceWorkload(WorkloadBase):
     """Wrapper for performing common operations specific to the Karapace Snap."""
 
     CONTAINER_SERVICE = "karapace"
+    EXPORTER_SERVICE = "karapace-exporter"
+    READY_NOTIFIER_SERVICE = "karapace-ready-notifier"
+
+    def __init__(
+        self,
+        container: Container,
+        workers: int = 1,
+        access_log_sampling: float = 0.0,
+        access_log_capture: bool = False,
+        log_endpoints: Callable[[], dict[str, str]] = dict,
+        log_labels: dict[str, str] | None = None,
+    ) -> None:
+        # Pebble API calls of the current dispatch, exported with the hook metrics
+        self.pebble_calls: Counter = Counter()
+        self.container = cast(Container, _CountingContainer(container, self.pebble_calls))
+        # 0 derives the number of workers from the CPU allocation
+        self.requested_workers = workers
+        self.access_log_sampling = access_log_sampling
+        self.access_log_capture = access_log_capture
+        self._log_endpoints = log_endpoints
+        self.log_labels = log_labels or {}
 
-    def __init__(self, container: Container) -> None:
-        self.container = container
+    @cached_property
+    def log_endpoints(self) -> dict[str, str]:
+        """Loki push endpoints the logs of all services are forwarded to, by target name.
+
+        Looked up only once log targets are planned, as it reads the databags of all Loki units.
+        """
+        return self._log_endpoints()
+
+    @cached_property
+    def workers(self) -> int:
+        """The number of Karapace registry processes to run."""
+        workers = self.requested_workers or self.cpu_allocation()
+        return max(1, min(workers, MAX_WORKERS))
+
+    @property
+    def services(self) -> list[str]:
+        """The Pebble services run for the current number of workers."""
+        return [self._worker_service(worker) for worker in range(self.workers)]
 
     @override
     def start(self) -> None:
-        self.container.add_layer(self.CONTAINER_SERVICE, self._karapace_layer, combine=True)
-        self.container.replan()
+        self._push_scripts()
+        self._replan(self._karapace_layer)
 
     @override
     def stop(self) -> None:
-        self.container.stop(self.CONTAINER_SERVICE)
+        self.container.stop(*self.services)
 
     @override
     def restart(self) -> None:
-        self.container.restart(self.CONTAINER_SERVICE)
+        # the layer holds the environment, which may have changed since the last start
+        layer = self._karapace_layer
+        changed = self._changed_services(layer)
+        if changed:
+            # new services, or a plan reset along with the container and its files
+            self._push_scripts()
+
+        # replan restarts the changed services, the others are restarted once here, along with
+        # the notifier telling the charm once Karapace is ready again, see `RestartHandler`
+        self._replan(layer)
+        unchanged = [service for service in self.services if service not in changed]
+        self.container.restart(*unchanged, self.READY_NOTIFIER_SERVICE)
+
+    def _push_scripts(self) -> None:
+        """Pushes the scripts run by the services into the container."""
+        scripts = {
+            "exporter.py": self.paths.exporter,
+            "accesslog.py": self.paths.accesslog,
+            "readynotify.py": self.paths.readynotify,
+        }
+        if self.access_logs:
+            scripts["logsampler.py"] = self.paths.logsampler
+        if self.workers > 1:
+            scripts["reuseport.py"] = self.paths.reuseport
+        for script, path in scripts.items():
+            self.write(content=(Path(__file__).parent / script).read_text(), path=path)
+
+    def _replan(self, layer: Layer) -> None:
+        """Plans the services of the layer, starting or restarting the ones that changed."""
+        # access logs are captured there by the services
+        self.container.make_dir(self.paths.logs_path, make_parents=True, user=USER, group=GROUP)
+
+        self.container.add_layer(self.CONTAINER_SERVICE, layer, combine=True)
+        self._disable_stale_services(layer)
+        self._disable_stale_log_targets()
+        self.container.replan()
+
+        # services of removed workers are disabled, but replan leaves them running
+        if stale := [
+            name
+            for name, service in self.container.get_services().items()
+            if name != self.READY_NOTIFIER_SERVICE
+            and (name not in layer.services or layer.services[name].startup == "disabled")
+            and service.is_running()
+        ]:
+            self.container.stop(*stale)
+
+    def update_log_targets(self) -> None:
+        """Updates where logs are forwarded to, without restarting any service."""
+        layer = Layer({"log-targets": self._log_targets})
+        self.container.add_layer(self.CONTAINER_SERVICE, layer, combine=True)
+        self._disable_stale_log_targets()
+
+    def layer_changed(self) -> bool:
+        """Whether the planned services differ from the current layer, e.g more workers."""
+        return bool(self._changed_services(self._karapace_layer))
+
+    def _changed_services(self, layer: Layer) -> list[str]:
+        """The services of the layer that are not planned, or planned differently."""
+        planned = self.container.get_plan().services
+        return [
+            name
+            for name, service in layer.services.items()
+            if name not in planned or planned[name].to_dict() != service.to_dict()
+        ]
+
+    def cpu_allocation(self) -> int:
+        """The number of CPUs the workload container can use, rounded up.
+
+        Read from the cgroup CPU quota of the container, or the number of CPUs of the node
+        if unlimited.
+        """
+        cpu_max = " ".join(self.read("/sys/fs/cgroup/cpu.max")).split()
+        if len(cpu_max) == 2 and cpu_max[0] != "max":
+            quota, period = int(cpu_max[0]), int(cpu_max[1])
+            return max(1, math.ceil(quota / period))
+
+        try:
+            return int(self.exec(command="nproc").strip())
+        except (ExecError, ValueError):
+            return 1
 
     @override
     def read(self, path: str) -> list[str]:
@@ -81,7 +233,23 @@ class KarapaceWorkload(WorkloadBase):
         if not self.container.can_connect():
             return False
 
-        return self.container.get_service(self.CONTAINER_SERVICE).is_running()
+        services = self.container.get_services(*self.services)
+        return len(services) == len(self.services) and all(
+            service.is_running() for service in services.values()
+        )
+
+    @property
+    @override
+    def listener_protocol(self) -> str:
+        # the environment of the running service, as the rendered config may await a restart
+        if not self.container.can_connect():
+            return "http"
+
+        service = self.container.get_plan().services.get(self.CONTAINER_SERVICE)
+        if service and service.environment.get("KARAPACE_SERVER_TLS_CERTFILE"):
+            return "https"
+
+        return "http"
 
     @override
     def get_version(self) -> str:
@@ -101,24 +269,149 @@ class KarapaceWorkload(WorkloadBase):
         """Check if karapace container is available."""
         return self.container.can_connect()
 
+    @property
+    def _log_targets(self) -> dict:
+        """The Pebble log targets forwarding the logs of all services to Loki."""
+        return {
+            name: {
+                "override": "replace",
+                "type": "loki",
+                "location": endpoint,
+                "services": ["all"],
+                "labels": self.log_labels,
+            }
+            for name, endpoint in self.log_endpoints.items()
+        }
+
+    def _disable_stale_services(self, layer: Layer) -> None:
+        """Disables planned services no longer in the layer, e.g the former balancer.
+
+        Services are never removed from the plan, only disabled.
+        """
+        stale: LayerDict = {
+            "services": {
+                name: {"override": "merge", "startup": "disabled"}
+                for name, service in self.container.get_plan().services.items()
+                if name not in layer.services and service.startup != "disabled"
+            }
+        }
+        if stale["services"]:
+            self.container.add_layer(self.CONTAINER_SERVICE, Layer(stale), combine=True)
+
+    def _disable_stale_log_targets(self) -> None:
+        """Stops forwarding logs to removed Loki units.
+
+        Log targets are never removed from the plan, only emptied of services.
+        """
+        stale: LayerDict = {
+            "log-targets": {
+                name: {"override": "merge", "services": ["-all"]}
+                for name, target in self.container.get_plan().log_targets.items()
+                if name not in self.log_endpoints and "-all" not in target.services
+            }
+        }
+        if stale["log-targets"]:
+            self.container.add_layer(self.CONTAINER_SERVICE, Layer(stale), combine=True)
+
+    def _worker_service(self, worker: int) -> str:
+        """The Pebble service of a worker, the first one being the main `karapace` service."""
+        return self.CONTAINER_SERVICE if worker == 0 else f"{self.CONTAINER_SERVICE}-{worker}"
+
+    def _worker_port(self, worker: int) -> int:
+        """The own port of a worker, next to the shared registry port if there is more than one."""
+        return PORT if self.workers == 1 else PORT + 1 + worker
+
     @property
     def _karapace_layer(self) -> Layer:
-        """Returns a Pebble configuration layer for Karapace."""
+        """Returns a Pebble configuration layer for Karapace.
+
+        With more than one worker, all workers share the registry port through `SO_REUSEPORT`,
+        and also listen on their own registry and metrics ports. Only the first worker is
+        eligible as primary, and advertises its own port so that requests forwarded by the
+        replicas of all units reach it directly.
+        Services of workers above the current count are kept in the layer, disabled. The
+        exporter serving the charm metrics runs alongside, whatever the number of workers, and
+        the ready notifier is only started by restarts.
+        Logs of all services are forwarded to the related Loki units by Pebble itself.
+        """
         environment = self.map_env(self.read("/etc/environment"))
-        command = "python3 -m karapace"
+        if self.access_log_capture:
+            # for the duration of the capture only, whatever the config file
+            environment = environment | {"KARAPACE_ACCESS_LOGS_DEBUG": "True"}
+
+        services: dict = {}
+        for worker in range(MAX_WORKERS):
+            port = self._worker_port(worker)
+            command = "python3 -m karapace"
+            worker_environment = environment
+            if self.workers > 1:
+                command = f"python3 {self.paths.reuseport} {port} karapace"
+                client_id = environment.get("KARAPACE_CLIENT_ID", "sr")
+                worker_environment = environment | {
+                    "KARAPACE_PORT": str(PORT),
+                    "KARAPACE_ADVERTISED_PORT": str(port),
+                    "KARAPACE_CLIENT_ID": f"{client_id}-{worker}",
+                    "KARAPACE_MASTER_ELIGIBILITY": str(worker == 0),
+                    "KARAPACE_PROMETHEUS_PORT": str(METRICS_PORT + worker),
+                }
+
+            if self.access_logs:
+                # the access log is sampled and captured by the wrapper
+                command = (
+                    f"python3 {self.paths.logsampler} {self.access_log_sampling} "
+                    f"{self.paths.logs_path} {command}"
+                )
+
+            services[self._worker_service(worker)] = {
+                "override": "replace",
+                "summary": "karapace" if worker == 0 else f"karapace worker {worker}",
+                "command": command,
+                "startup": "enabled" if worker < self.workers else "disabled",
+                "user": USER,
+                "group": GROUP,
+                "environment": worker_environment,
+            }
+
+        host = environment.get("KARAPACE_HOST", "0.0.0.0")
+        services[self.EXPORTER_SERVICE] = {
+            "override": "replace",
+            "summary": "karapace charm metrics exporter",
+            "command": (
+                f"python3 {self.paths.exporter} {host} {CHARM_METRICS_PORT} "
+                f"{self.paths.charm_metrics}"
+            ),
+            "startup": "enabled",
+            "user": USER,
+            "group": GROUP,
+        }
+        protocol = "https" if environment.get("KARAPACE_SERVER_TLS_CERTFILE") else "http"
+        services[self.READY_NOTIFIER_SERVICE] = {
+            "override": "replace",
+            "summary": "karapace ready notifier",
+            "command": (
+                f"python3 {self.paths.readynotify} {protocol}://{host}:{PORT}/_health "
+                f"{READY_NOTICE} {READY_NOTICE_TIMEOUT}"
+            ),
+            # started after each restart, exits once Karapace is ready
+            "startup": "disabled",
+            "on-success": "ignore",
+            "on-failure": "ignore",
+            "user": USER,
+            "group": GROUP,
+        }
 
         layer_config: LayerDict = {
             "summary": "karapace layer",
             "description": "Pebble config layer for karapace",
-            "services": {
-                CONTAINER: {
+            "services": services,
+            "log-targets": self._log_targets,
+            # K8s readiness follows Pebble `ready` checks, keeping units out of the Service
+            # until the registry listens
+            "checks": {
+                f"{CONTAINER}-ready": {
                     "override": "replace",
-                    "summary": "karapace",
-                    "command": command,
-                    "startup": "enabled",
-                    "user": USER,
-                    "group": GROUP,
-                    "environment": environment,
+                    "level": "ready",
+                    "tcp": {"port": self._worker_port(0)},
                 }
             },
         }
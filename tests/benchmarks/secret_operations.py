@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Counts the secret operations of a hook reading all client passwords and updating one.
+
+Compares client passwords stored in the peer app secret, as before sharding, with the
+sharded client secrets. The app secret layout runs with the peer state of that time, so that
+it is measured without the migration to the sharded secrets. Secret hook tools are counted on
+the Scenario backend, along with the size of the content written.
+
+Usage:
+    PYTHONPATH=lib:src python tests/benchmarks/secret_operations.py [--clients 1000 5000]
+"""
+
+import argparse
+import json
+import sys
+import time
+import zlib
+from collections import Counter
+from contextlib import ExitStack
+from pathlib import Path
+from typing import cast
+from unittest.mock import patch
+
+from ops.testing import Container, Context, PeerRelation, Secret, State
+from scenario.mocking import _MockModelBackend
+
+sys.path.append(str(Path(__file__).parents[2]))
+
+from src.charm import KarapaceCharm  # noqa: E402
+from src.literals import CLIENT_SECRET_SHARDS, SECRETS_APP  # noqa: E402
+
+
+def app_secret_update(self, items: dict[str, str]) -> None:
+    """`KarapaceCluster.update` before sharding, client passwords in the peer app secret."""
+    if not self.relation:
+        return
+
+    for key, value in items.items():
+        if key in SECRETS_APP or key.startswith("relation-"):
+            if value:
+                self.data_interface.set_secret(self.relation.id, key, value)
+            else:
+                self.data_interface.delete_secret(self.relation.id, key)
+        else:
+            self.data_interface.update_relation_data(self.relation.id, {key: value})
+
+
+# the peer state before sharding, for the app secret layout
+APP_SECRET_CLUSTER = {
+    "update": app_secret_update,
+    "client_passwords": property(lambda self: self._legacy_client_passwords),
+    "migrate_client_passwords": lambda self: None,
+}
+
+
+def secrets(clients: int, sharded: bool) -> list[Secret]:
+    """The peer app secret first and, if sharded, the client secrets holding the passwords."""
+    passwords = {f"relation-{i}": f"password-{i:032}" for i in range(clients)}
+    if not sharded:
+        return [
+            Secret(
+                tracked_content={"operator-password": "password"} | passwords,
+                label="cluster.karapace-k8s.app",
+                owner="app",
+            )
+        ]
+
+    shards: list[dict[str, str]] = [{} for _ in range(CLIENT_SECRET_SHARDS)]
+    for username, password in passwords.items():
+        shards[zlib.crc32(username.encode()) % CLIENT_SECRET_SHARDS][username] = password
+
+    return [
+        Secret(
+            tracked_content={"operator-password": "password"},
+            label="cluster.karapace-k8s.app",
+            owner="app",
+        )
+    ] + [
+        Secret(tracked_content=shard, label=f"cluster.karapace-k8s.clients.{i}", owner="app")
+        for i, shard in enumerate(shards)
+    ]
+
+
+def run(clients: int, sharded: bool) -> dict[str, int | float]:
+    """Reads all client passwords and updates a single one, in a single hook."""
+    counts: Counter = Counter()
+
+    def counted(name):
+        original = getattr(_MockModelBackend, name)
+
+        def wrapper(self, *args, **kwargs):
+            counts[name] += 1
+            if content := kwargs.get("content") or (args[0] if name == "secret_add" else None):
+                counts["bytes-written"] += len(json.dumps(content))
+            return original(self, *args, **kwargs)
+
+        return wrapper
+
+    ctx = Context(KarapaceCharm)
+    state_secrets = secrets(clients, sharded)
+    peer_relation = PeerRelation(
+        endpoint="cluster",
+        interface="cluster",
+        local_app_data={"internal-secret": state_secrets[0].id},
+    )
+    state = State(
+        containers=[Container(name="karapace", can_connect=True)],
+        relations=[peer_relation],
+        secrets=state_secrets,
+        leader=True,
+    )
+
+    names = ["secret_get", "secret_set", "secret_add", "secret_remove"]
+    with ExitStack() as stack:
+        stack.enter_context(
+            patch.multiple(_MockModelBackend, **{name: counted(name) for name in names})
+        )
+        if not sharded:
+            # as imported by the charm
+            stack.enter_context(
+                patch.multiple("core.models.KarapaceCluster", **APP_SECRET_CLUSTER)
+            )
+
+        with ctx(ctx.on.start(), state) as manager:
+            charm = cast(KarapaceCharm, manager.charm)
+            start = time.perf_counter()
+            assert len(charm.context.cluster.client_passwords) == clients
+            charm.context.cluster.update({"relation-0": "new-password"})
+            elapsed_ms = (time.perf_counter() - start) * 1000
+
+    return {name.replace("_", "-"): counts[name] for name in names} | {
+        "bytes-written": counts["bytes-written"],
+        "ms": round(elapsed_ms, 1),
+    }
+
+
+def main() -> None:
+    """Prints the secret operations for each layout and number of clients."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, nargs="+", default=[1000, 5000])
+    args = parser.parse_args()
+
+    for clients in args.clients:
+        for sharded in [False, True]:
+            layout = "sharded" if sharded else "app secret"
+            print(f"{clients:>6} clients, {layout:>10}: {run(clients, sharded)}")
+
+
+if __name__ == "__main__":
+    main()
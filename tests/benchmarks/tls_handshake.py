@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Compares the cost of full TLS handshakes for RSA and ECDSA unit keys.
+
+Handshakes run in-memory, without sockets, so the timings only hold the cryptographic cost
+paid by Karapace for each new client or Kafka connection.
+
+Usage:
+    PYTHONPATH=lib:src python tests/benchmarks/tls_handshake.py [--handshakes 200]
+"""
+
+import argparse
+import ssl
+import tempfile
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from charmlibs.interfaces.tls_certificates import (
+    Certificate,
+    CertificateRequestAttributes,
+    CertificateSigningRequest,
+    PrivateKey,
+)
+
+from literals import KeyType
+from managers.tls import TLSManager
+
+
+def contexts(key_type: KeyType, tmp_dir: Path) -> tuple[ssl.SSLContext, ssl.SSLContext]:
+    """Builds server and client SSL contexts for a unit key of the given type."""
+    ca_key = PrivateKey.generate()
+    ca = Certificate.generate_self_signed_ca(
+        CertificateRequestAttributes(common_name="ca", is_ca=True),
+        ca_key,
+        validity=timedelta(days=1),
+    )
+    key = PrivateKey.from_string(TLSManager.generate_private_key(key_type))
+    csr = CertificateSigningRequest.generate(
+        CertificateRequestAttributes(common_name="karapace", sans_dns=frozenset({"karapace"})), key
+    )
+    certificate = Certificate.generate(csr, ca, ca_key, validity=timedelta(days=1))
+
+    (tmp_dir / f"{key_type}.key").write_text(key.raw)
+    (tmp_dir / f"{key_type}.pem").write_text(certificate.raw)
+
+    server = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    server.load_cert_chain(tmp_dir / f"{key_type}.pem", tmp_dir / f"{key_type}.key")
+    client = ssl.create_default_context(cadata=ca.raw)
+    return server, client
+
+
+def handshake(server_context: ssl.SSLContext, client_context: ssl.SSLContext) -> None:
+    """Runs a single full handshake between in-memory server and client."""
+    bios = [ssl.MemoryBIO() for _ in range(4)]
+    server = server_context.wrap_bio(bios[0], bios[1], server_side=True)
+    client = client_context.wrap_bio(bios[2], bios[3], server_hostname="karapace")
+
+    done = {server: False, client: False}
+    while not all(done.values()):
+        for conn in done:
+            if done[conn]:
+                continue
+            try:
+                conn.do_handshake()
+                done[conn] = True
+            except ssl.SSLWantReadError:
+                pass
+
+        # client -> server, server -> client
+        if pending := bios[3].read():
+            bios[0].write(pending)
+        if pending := bios[1].read():
+            bios[2].write(pending)
+
+
+def main() -> None:
+    """Prints the mean handshake time for each key type."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--handshakes", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        results: dict[str, float] = {}
+        for key_type in ["rsa", "ecdsa"]:
+            server, client = contexts(key_type, Path(tmp_dir))
+            handshake(server, client)  # warm-up
+
+            start = time.perf_counter()
+            for _ in range(args.handshakes):
+                handshake(server, client)
+            results[key_type] = (time.perf_counter() - start) * 1000 / args.handshakes
+
+    for key_type, mean_ms in results.items():
+        print(f"{key_type:>6}: {mean_ms:.2f}ms per handshake")
+    print(f"ecdsa handshakes are {results['rsa'] / results['ecdsa']:.1f}x cheaper than rsa")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,25 @@
 #!/usr/bin/env python3
 # Copyright 2024 Canonical Ltd.
 # See LICENSE file for licensing details.
+import inspect
+from collections import Counter
 from unittest.mock import patch
 
 import pytest
 from ops import pebble
 from ops.testing import Container, Context, PeerRelation, Relation
+from scenario.mocking import _MockModelBackend, _MockPebbleClient
 from src.charm import KarapaceCharm
 
+# Hook tools counted by `hook_tool_calls`, with their model backend methods
+COUNTED_HOOK_TOOLS = {
+    "relation-get": "relation_get",
+    "relation-set": "relation_set",
+    "secret-get": "secret_get",
+    "secret-set": "secret_set",
+    "is-leader": "is_leader",
+}
+
 
 @pytest.fixture()
 def ctx():
@@ -165,6 +177,50 @@ def karapace_container():
     )
 
 
+@pytest.fixture()
+def hook_tool_calls():
+    """Counts the hook tool calls, and Pebble API calls, made by the charm.
+
+    Calls are counted for all dispatches run while the fixture is active, clear the counter
+    between dispatches to count a single one. Pebble calls are counted together as `pebble`,
+    and commands run in the workload container as `exec` too. Every leadership check made by
+    the charm is counted as `is-leader`, even though ops caches it for the duration of the lease.
+    """
+    calls: Counter = Counter()
+
+    def counted(cls, method, name):
+        original = getattr(cls, method)
+
+        def wrapper(self, *args, **kwargs):
+            calls[name] += 1
+            if method == "exec":
+                calls["exec"] += 1
+
+            return original(self, *args, **kwargs)
+
+        return wrapper
+
+    pebble_methods = [
+        name
+        for name, _ in inspect.getmembers(_MockPebbleClient, inspect.isfunction)
+        if not name.startswith("_")
+    ]
+    with (
+        patch.multiple(
+            _MockModelBackend,
+            **{
+                method: counted(_MockModelBackend, method, tool)
+                for tool, method in COUNTED_HOOK_TOOLS.items()
+            },
+        ),
+        patch.multiple(
+            _MockPebbleClient,
+            **{method: counted(_MockPebbleClient, method, "pebble") for method in pebble_methods},
+        ),
+    ):
+        yield calls
+
+
 @pytest.fixture()
 def patched_restart():
     with patch("workload.KarapaceWorkload.restart") as restart:
@@ -198,3 +254,15 @@ def patched_disable_service_links(request):
             "managers.k8s.K8sManager.disable_service_links"
         ) as patched_disable_service_links:
             yield patched_disable_service_links
+
+
+@pytest.fixture(autouse=True)
+def patched_k8s_service():
+    with (
+        patch("managers.k8s.K8sManager.apply_service") as apply_service,
+        patch(
+            "managers.k8s.K8sManager.get_service_endpoint",
+            return_value="karapace-k8s-registry.test.svc.cluster.local:8081",
+        ),
+    ):
+        yield apply_service
@@ -2,18 +2,81 @@
 # Copyright 2024 Canonical Ltd.
 # See LICENSE file for licensing details.
 
+import base64
+import dataclasses
+import io
+import itertools
 import json
+import lzma
+import os
+import socket
+import sys
+import time
+import urllib.error
+import urllib.request
+import zlib
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from threading import Thread
+from types import ModuleType, SimpleNamespace
 from typing import cast
-from unittest.mock import patch
+from unittest.mock import MagicMock, PropertyMock, patch
 
+import httpx
 import pytest
-from ops.testing import Context, State
+from charms.data_platform_libs.v0.data_interfaces import KarapaceProviderData
+from kafka import TopicPartition
+from kafka.errors import ClusterAuthorizationFailedError, GroupAuthorizationFailedError
+from lightkube.core.exceptions import ApiError
+from lightkube.models.apps_v1 import StatefulSetSpec
+from lightkube.models.core_v1 import (
+    NodeAddress,
+    NodeStatus,
+    PodSpec,
+    PodTemplateSpec,
+    ServicePort,
+    ServiceSpec,
+)
+from lightkube.models.meta_v1 import LabelSelector, ObjectMeta
+from lightkube.resources.apps_v1 import StatefulSet
+from lightkube.resources.core_v1 import Node, Service
+from ops import pebble
+from ops.model import RelationDataContent
+from ops.testing import (
+    Context,
+    Exec,
+    Mount,
+    Notice,
+    PeerRelation,
+    Relation,
+    Secret,
+    State,
+    StoredState,
+)
+from src import accesslog, exporter, logsampler, readynotify, reuseport
 from src.charm import KarapaceCharm
-from src.literals import Status
+from src.literals import CLIENT_SECRET_SHARDS, PATHS, Status
+from src.managers.health import KarapaceHealth
+from src.managers.k8s import K8sManager
+from src.workload import KarapaceWorkload
 
 CHARM_KEY = "karapace"
 KAFKA = "kafka"
 
+HEALTHY = KarapaceHealth(ready=True, coordinator_running=True, current_offset=5, highest_offset=5)
+REPLAYING_HEALTH = KarapaceHealth(
+    ready=False, coordinator_running=True, current_offset=1, highest_offset=5
+)
+KAFKA_DOWN_HEALTH = KarapaceHealth(
+    ready=False, coordinator_running=False, current_offset=-1, highest_offset=-1
+)
+
+
+def _client_shards(passwords: dict[str, str]) -> list[dict[str, str]]:
+    shards = [{} for _ in range(CLIENT_SECRET_SHARDS)]
+    for username, password in passwords.items():
+        shards[zlib.crc32(username.encode()) % CLIENT_SECRET_SHARDS][username] = password
+    return shards
+
 
 def patched_exec_side_effects(*args, **kwargs):
     if "mkpasswd -u operator" in kwargs.get("command", ""):
@@ -181,7 +244,7 @@ def test_update_status_blocks_if_kafka_not_connected(
         containers=[karapace_container], relations=[peer_relation, kafka_relation], leader=True
     )
     with (
-        patch("managers.kafka.KafkaManager.brokers_active", return_value=False),
+        patch("managers.health.HealthManager.get_health", return_value=KAFKA_DOWN_HEALTH),
         patch("workload.KarapaceWorkload.active", return_value=True),
     ):
         state_out = ctx.run(ctx.on.update_status(), state_in)
@@ -189,6 +252,245 @@ def test_update_status_blocks_if_kafka_not_connected(
     assert state_out.unit_status == Status.KAFKA_NOT_CONNECTED.value.status
 
 
+def test_update_status_waits_if_health_unavailable(
+    ctx: Context, karapace_container, peer_relation, kafka_relation
+):
+    state_in = State(
+        containers=[karapace_container], relations=[peer_relation, kafka_relation], leader=True
+    )
+    with (
+        patch("managers.health.HealthManager.get_health", return_value=None),
+        patch("workload.KarapaceWorkload.active", return_value=True),
+    ):
+        state_out = ctx.run(ctx.on.update_status(), state_in)
+
+    assert state_out.unit_status == Status.SERVICE_NOT_READY.value.status
+
+
+def test_update_status_does_not_probe_kafka(
+    ctx: Context,
+    karapace_container,
+    peer_relation,
+    kafka_relation,
+    patched_workload_write,
+    patched_restart,
+    patched_exec,
+):
+    patched_exec.side_effect = patched_exec_side_effects
+    state_in = State(
+        containers=[karapace_container], relations=[peer_relation, kafka_relation], leader=True
+    )
+    with (
+        patch("managers.kafka.KafkaManager.probe_brokers") as patched_probe,
+        patch("managers.health.HealthManager.get_health", return_value=REPLAYING_HEALTH),
+        patch("workload.KarapaceWorkload.active", return_value=True),
+    ):
+        state_out = ctx.run(ctx.on.update_status(), state_in)
+
+    patched_probe.assert_not_called()
+    assert state_out.unit_status == Status.SCHEMAS_REPLAYING.value.status
+
+
+def test_health_report_parsed_from_karapace(ctx: Context, karapace_container, peer_relation):
+    body = json.dumps(
+        {
+            "schema_registry_ready": False,
+            "schema_registry_coordinator_running": True,
+            "schema_registry_reader_current_offset": 10,
+            "schema_registry_reader_highest_offset": 42,
+        }
+    ).encode()
+
+    class HealthHandler(BaseHTTPRequestHandler):
+        def do_GET(self):  # noqa: N802
+            self.send_response(503)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    state_in = State(containers=[karapace_container], relations=[peer_relation])
+    with (
+        HTTPServer(("127.0.0.1", 0), HealthHandler) as server,
+        ctx(ctx.on.update_status(), state_in) as manager,
+    ):
+        Thread(target=server.handle_request, daemon=True).start()
+        charm: KarapaceCharm = cast(KarapaceCharm, manager.charm)
+        url = f"http://127.0.0.1:{server.server_port}/_health"
+        with patch("managers.health.HealthManager.url", url):
+            health = charm.health_manager.get_health()
+
+    assert health
+    assert (health.current_offset, health.highest_offset) == (10, 42)
+    assert health.kafka_connected
+    assert health.replaying
+    # only reported once ready
+    assert health.startup_seconds is None
+
+
+def test_kafka_probe_is_cached(ctx: Context, karapace_container, kafka_relation, patched_exec):
+    patched_exec.return_value = json.dumps(_hashed("operator"))
+    state_in = _idle_state(karapace_container, kafka_relation, clients=0, leader=False)
+    with (
+        patch("managers.health.HealthManager.get_health", return_value=HEALTHY) as patched_health,
+        patch("workload.KarapaceWorkload.active", return_value=True),
+    ):
+        for _ in range(2):
+            state_in = ctx.run(ctx.on.update_status(), state_in)
+            assert state_in.unit_status == Status.ACTIVE.value.status
+
+    # the second update-status is served from the unit state
+    patched_health.assert_called_once()
+
+
+def test_update_status_does_not_leak_fds(
+    ctx: Context, karapace_container, kafka_relation, patched_exec
+):
+    patched_exec.return_value = json.dumps(_hashed("operator"))
+    state_in = _idle_state(karapace_container, kafka_relation, clients=0, leader=False)
+    with socket.create_server(("127.0.0.1", 0)) as karapace:
+        # Karapace accepts the connection but never answers
+        url = f"http://127.0.0.1:{karapace.getsockname()[1]}/_health"
+
+        open_fds = 0
+        with (
+            patch("managers.health.HEALTH_CHECK_TIMEOUT", 0.5),
+            patch("managers.health.HealthManager.url", url),
+            patch("workload.KarapaceWorkload.active", return_value=True),
+        ):
+            for i in range(6):
+                state_out = ctx.run(ctx.on.update_status(), state_in)
+                assert state_out.unit_status == Status.SERVICE_NOT_READY.value.status
+
+                # first run is a warm-up, so one-off imports and loggers don't count as leaks
+                if not i:
+                    open_fds = len(os.listdir("/proc/self/fd"))
+
+        assert len(os.listdir("/proc/self/fd")) == open_fds
+
+
+def test_probe_kafka_action_reports_each_broker(
+    ctx: Context, karapace_container, peer_relation, kafka_relation
+):
+    with (
+        socket.create_server(("127.0.0.1", 0)) as slow_broker,
+        socket.create_server(("127.0.0.1", 0)) as dead_broker,
+    ):
+        # slow broker accepts the connection but never answers, dead broker refuses it
+        dead_port = dead_broker.getsockname()[1]
+        dead_broker.close()
+        endpoints = f"127.0.0.1:{slow_broker.getsockname()[1]},127.0.0.1:{dead_port}"
+        kafka_relation = dataclasses.replace(
+            kafka_relation,
+            remote_app_data=kafka_relation.remote_app_data | {"endpoints": endpoints},
+        )
+        state_in = State(
+            containers=[karapace_container], relations=[peer_relation, kafka_relation]
+        )
+
+        with patch("managers.kafka.KAFKA_PROBE_TIMEOUT", 0.5):
+            ctx.run(ctx.on.action("probe-kafka"), state_in)
+
+    assert ctx.action_results
+    slow, dead = [ctx.action_results[key] for key in ("broker-0", "broker-1")]
+    if slow["server"].endswith(str(dead_port)):
+        slow, dead = dead, slow
+
+    assert "connect-ms" in slow and "timed out" in slow["error"]
+    assert "connect-ms" not in dead and dead["error"]
+    assert ctx.action_results["summary"].startswith("0/2 brokers reachable")
+
+
+def _record(offset: int, key: bytes, value: bytes | None) -> SimpleNamespace:
+    """A record of the `_schemas` topic, as read by the Kafka client."""
+    return SimpleNamespace(topic="_schemas", partition=0, offset=offset, key=key, value=value)
+
+
+def test_describe_schemas_topic_action(
+    ctx: Context, karapace_container, peer_relation, kafka_relation
+):
+    schemas = TopicPartition("_schemas", 0)
+    client = MagicMock()
+    client.topic_offsets.return_value = ({schemas: 0}, {schemas: 3})
+    client.topic_size.return_value = {0: 1000, 1: 1024}
+    client.read_topic.return_value = [
+        _record(0, b"schema-1", b"{}"),
+        _record(1, b"schema-2", b"{}"),
+        _record(2, b"schema-1", None),
+    ]
+    client.describe_consumer_group.return_value = SimpleNamespace(state="Stable", members=[1])
+    client.list_consumer_group_offsets.return_value = {}
+
+    state_in = State(containers=[karapace_container], relations=[peer_relation, kafka_relation])
+    with (
+        patch("managers.kafka.KafkaManager._client") as patched_client,
+        patch("managers.health.HealthManager.get_health", return_value=REPLAYING_HEALTH),
+    ):
+        patched_client.return_value.__enter__.return_value = client
+        ctx.run(ctx.on.action("describe-schemas-topic", params={"max-records": 10}), state_in)
+
+    assert ctx.action_results
+    assert ctx.action_results["records"] == "3"
+    assert ctx.action_results["live-keys"] == "1"
+    assert ctx.action_results["truncated"] == "false"
+    assert ctx.action_results["consumer-group"]["state"] == "Stable"
+    assert ctx.action_results["consumer-group"]["committed-offset"] == "none"
+    assert ctx.action_results["karapace-reader"]["highest-offset"] == "5"
+    assert ctx.action_results["size-bytes"] == "1024"
+    assert ctx.action_results["replica-size-bytes"] == {"broker-0": "1000", "broker-1": "1024"}
+
+
+@pytest.mark.parametrize("end_offset,truncated", [(3, "false"), (4, "true")])
+def test_describe_schemas_topic_truncated_before_end_offset(
+    ctx: Context, karapace_container, peer_relation, kafka_relation, end_offset, truncated
+):
+    schemas = TopicPartition("_schemas", 0)
+    client = MagicMock()
+    client.topic_offsets.return_value = ({schemas: 0}, {schemas: end_offset})
+    # exactly `max-records` read, the topic only ends there if the end offset was reached
+    client.read_topic.return_value = [_record(offset, b"schema-1", b"{}") for offset in range(3)]
+
+    state_in = State(containers=[karapace_container], relations=[peer_relation, kafka_relation])
+    with (
+        patch("managers.kafka.KafkaManager._client") as patched_client,
+        patch("managers.health.HealthManager.get_health", return_value=None),
+    ):
+        patched_client.return_value.__enter__.return_value = client
+        ctx.run(ctx.on.action("describe-schemas-topic", params={"max-records": 3}), state_in)
+
+    assert ctx.action_results
+    assert ctx.action_results["records"] == "3"
+    assert ctx.action_results["truncated"] == truncated
+
+
+def test_describe_schemas_topic_action_without_describe_acls(
+    ctx: Context, karapace_container, peer_relation, kafka_relation
+):
+    schemas = TopicPartition("_schemas", 0)
+    client = MagicMock()
+    client.topic_offsets.return_value = ({schemas: 0}, {schemas: 1})
+    client.read_topic.return_value = [_record(0, b"schema-1", b"{}")]
+    client.topic_size.side_effect = ClusterAuthorizationFailedError()
+    client.describe_consumer_group.side_effect = GroupAuthorizationFailedError()
+
+    state_in = State(containers=[karapace_container], relations=[peer_relation, kafka_relation])
+    with (
+        patch("managers.kafka.KafkaManager._client") as patched_client,
+        patch("managers.health.HealthManager.get_health", return_value=None),
+    ):
+        patched_client.return_value.__enter__.return_value = client
+        ctx.run(ctx.on.action("describe-schemas-topic", params={"max-records": 10}), state_in)
+
+    assert ctx.action_results
+    assert ctx.action_results["live-keys"] == "1"
+    assert ctx.action_results["size-bytes"] == "unavailable"
+    assert ctx.action_results["consumer-group"] == {
+        "name": "schema-registry",
+        "state": "unavailable",
+    }
+
+
 def test_update_status_succeeds(
     ctx: Context,
     karapace_container,
@@ -203,7 +505,7 @@ def test_update_status_succeeds(
         containers=[karapace_container], relations=[peer_relation, kafka_relation], leader=True
     )
     with (
-        patch("managers.kafka.KafkaManager.brokers_active", return_value=True),
+        patch("managers.health.HealthManager.get_health", return_value=HEALTHY),
         patch("workload.KarapaceWorkload.active", return_value=True),
     ):
         state_out = ctx.run(ctx.on.update_status(), state_in)
@@ -211,6 +513,119 @@ def test_update_status_succeeds(
     assert state_out.unit_status == Status.ACTIVE.value.status
 
 
+def test_bootstrap_servers_ignore_reordering_and_additions(
+    ctx: Context, karapace_container, peer_relation, kafka_relation
+):
+    kafka_relation = dataclasses.replace(
+        kafka_relation,
+        remote_app_data=kafka_relation.remote_app_data
+        | {"endpoints": "kafka-2:9092,kafka-0:9092,kafka-1:9092"},
+    )
+    state_in = State(containers=[karapace_container], relations=[peer_relation, kafka_relation])
+
+    with ctx(ctx.on.update_status(), state_in) as manager:
+        charm: KarapaceCharm = cast(KarapaceCharm, manager.charm)
+        for rendered, expected in [
+            ("", "kafka-0:9092,kafka-1:9092,kafka-2:9092"),
+            ("kafka-1:9092,kafka-0:9092,kafka-2:9092", "kafka-0:9092,kafka-1:9092,kafka-2:9092"),
+            ("kafka-1:9092,kafka-0:9092", "kafka-0:9092,kafka-1:9092"),
+            ("kafka-0:9092,kafka-3:9092", "kafka-0:9092,kafka-1:9092,kafka-2:9092"),
+        ]:
+            with patch(
+                "managers.config.ConfigManager.parsed_confile", {"bootstrap_uri": rendered}
+            ):
+                assert charm.config_manager.bootstrap_servers == expected
+
+
+def test_config_changed_queues_restart_on_non_leader(
+    ctx: Context,
+    karapace_container,
+    peer_relation,
+    kafka_relation,
+    patched_workload_write,
+    patched_restart,
+    patched_exec,
+):
+    patched_exec.side_effect = patched_exec_side_effects
+    state_in = State(containers=[karapace_container], relations=[peer_relation, kafka_relation])
+    state_out = ctx.run(ctx.on.config_changed(), state_in)
+
+    patched_restart.assert_not_called()
+    assert state_out.get_relations("cluster")[0].local_unit_data.get("restart-request")
+
+
+def test_leader_grants_restart_one_unit_at_a_time(
+    ctx: Context, karapace_container, peer_relation, patched_restart
+):
+    peer_relation = dataclasses.replace(
+        peer_relation,
+        peers_data={1: {"restart-request": "1.0"}, 2: {"restart-request": "2.0"}},
+    )
+    state_in = State(containers=[karapace_container], relations=[peer_relation], leader=True)
+    state_out = ctx.run(ctx.on.relation_changed(peer_relation, remote_unit=1), state_in)
+
+    patched_restart.assert_not_called()
+    app_data = state_out.get_relations("cluster")[0].local_app_data
+    assert app_data["restart-granted"] == "karapace-k8s/1"
+
+    # unit 1 still restarting, grant is not moved to unit 2
+    peer_relation = state_out.get_relations("cluster")[0]
+    state_out = ctx.run(ctx.on.relation_changed(peer_relation, remote_unit=2), state_out)
+    assert state_out.get_relations("cluster")[0].local_app_data["restart-granted"] == (
+        "karapace-k8s/1"
+    )
+
+
+def test_restart_held_until_karapace_ready(
+    ctx: Context, karapace_container, peer_relation, patched_restart
+):
+    peer_relation = dataclasses.replace(
+        peer_relation,
+        local_app_data=peer_relation.local_app_data | {"restart-granted": "karapace-k8s/0"},
+        local_unit_data=peer_relation.local_unit_data | {"restart-request": "1.0"},
+    )
+    state_in = State(containers=[karapace_container], relations=[peer_relation])
+
+    # restarted, but still replaying `_schemas`, or not answering at all
+    for health in [REPLAYING_HEALTH, None]:
+        with patch("managers.health.HealthManager.get_health", return_value=health):
+            state_in = ctx.run(ctx.on.update_status(), state_in)
+
+        assert state_in.get_relations("cluster")[0].local_unit_data["restart-request"] == "1.0"
+
+    patched_restart.assert_called_once()
+
+    with patch("managers.health.HealthManager.get_health", return_value=HEALTHY):
+        state_out = ctx.run(ctx.on.update_status(), state_in)
+
+    patched_restart.assert_called_once()
+    assert "restart-request" not in state_out.get_relations("cluster")[0].local_unit_data
+
+
+def test_restart_released_on_ready_notice(
+    ctx: Context, karapace_container, peer_relation, patched_restart
+):
+    peer_relation = dataclasses.replace(
+        peer_relation,
+        local_app_data=peer_relation.local_app_data | {"restart-granted": "karapace-k8s/0"},
+        local_unit_data=peer_relation.local_unit_data | {"restart-request": "1.0"},
+    )
+    state_in = State(containers=[karapace_container], relations=[peer_relation])
+    with patch("managers.health.HealthManager.get_health", return_value=REPLAYING_HEALTH):
+        state_in = ctx.run(ctx.on.update_status(), state_in)
+
+    # raised by the workload once Karapace is ready, before the next update-status
+    container = dataclasses.replace(
+        karapace_container, notices=[Notice(key="canonical.com/karapace/ready")]
+    )
+    state_in = dataclasses.replace(state_in, containers=[container])
+    with patch("managers.health.HealthManager.get_health", return_value=HEALTHY):
+        state_out = ctx.run(ctx.on.pebble_custom_notice(container, container.notices[0]), state_in)
+
+    patched_restart.assert_called_once()
+    assert "restart-request" not in state_out.get_relations("cluster")[0].local_unit_data
+
+
 @pytest.mark.nopatched_disable_service_links
 def test_install_disables_service_links(
     ctx: Context, karapace_container, peer_relation, kafka_relation
@@ -222,3 +637,1113 @@ def test_install_disables_service_links(
         _ = ctx.run(ctx.on.install(), state_in)
 
     assert patched_disable_service_links.call_count
+
+
+def test_secrets_fetched_once_per_dispatch(
+    ctx: Context,
+    karapace_container,
+    kafka_relation,
+    patched_workload_write,
+    patched_restart,
+    patched_exec,
+):
+    client_ids = range(100, 150)
+    secret = Secret(
+        tracked_content={"operator-password": "password"},
+        label="cluster.karapace-k8s.app",
+        owner="app",
+    )
+    passwords = {f"relation-{i}": "password" for i in client_ids}
+    client_secrets = [
+        Secret(tracked_content=shard, label=f"cluster.karapace-k8s.clients.{i}", owner="app")
+        for i, shard in enumerate(_client_shards(passwords))
+        if shard
+    ]
+    peer_relation = PeerRelation(
+        endpoint="cluster",
+        interface="cluster",
+        local_app_data={"internal-secret": secret.id},
+        local_unit_data={"private-address": "treebeard"},
+    )
+    clients = [
+        Relation(
+            endpoint="karapace",
+            interface="karapace_client",
+            remote_app_name=f"app-{i}",
+            id=i,
+            remote_app_data={"subject": f"subject-{i}", "extra-user-roles": "user"},
+        )
+        for i in client_ids
+    ]
+    patched_exec.return_value = json.dumps(
+        {"username": "user", "algorithm": "sha512", "salt": "test", "password_hash": "test"}
+    )
+    state_in = State(
+        containers=[karapace_container],
+        relations=[peer_relation, kafka_relation, *clients],
+        secrets=[secret, *client_secrets],
+        leader=True,
+    )
+
+    with ctx(ctx.on.config_changed(), state_in) as manager:
+        charm: KarapaceCharm = cast(KarapaceCharm, manager.charm)
+        manager.run()
+
+        # one lookup per secret, whatever the number of clients
+        secret_gets = charm.context.secret_stats.secret_gets
+        assert secret_gets <= 6 + CLIENT_SECRET_SHARDS
+        assert len(charm.context.cluster.client_passwords) == len(client_ids)
+        assert not charm.context.server.private_key
+        assert charm.context.secret_stats.secret_gets == secret_gets
+
+        # writes go through the cache
+        charm.context.cluster.update({"relation-200": "new-password"})
+        assert charm.context.cluster.client_passwords["relation-200"] == "new-password"
+        charm.context.cluster.update({"relation-200": ""})
+        assert "relation-200" not in charm.context.cluster.client_passwords
+
+
+def test_client_passwords_migrated_to_sharded_secrets(
+    ctx: Context,
+    karapace_container,
+    kafka_relation,
+    patched_workload_write,
+    patched_restart,
+    patched_exec,
+):
+    passwords = {f"relation-{i}": f"password-{i}" for i in range(100, 120)}
+    secret = Secret(
+        tracked_content={"operator-password": "password"} | passwords,
+        label="cluster.karapace-k8s.app",
+        owner="app",
+    )
+    peer_relation = PeerRelation(
+        endpoint="cluster",
+        interface="cluster",
+        local_app_data={"internal-secret": secret.id},
+        local_unit_data={"private-address": "treebeard"},
+    )
+    patched_exec.side_effect = patched_exec_side_effects
+    state_in = State(
+        containers=[karapace_container],
+        relations=[peer_relation, kafka_relation],
+        secrets=[secret],
+        leader=True,
+    )
+
+    state_out = ctx.run(ctx.on.config_changed(), state_in)
+
+    shards = {
+        secret.label: secret.latest_content
+        for secret in state_out.secrets
+        if secret.label and secret.label.startswith("cluster.karapace-k8s.clients.")
+    }
+    assert shards == {
+        f"cluster.karapace-k8s.clients.{i}": shard
+        for i, shard in enumerate(_client_shards(passwords))
+        if shard
+    }
+    app_secret = state_out.get_secret(label="cluster.karapace-k8s.app")
+    assert app_secret.latest_content == {"operator-password": "password"}
+
+    # removing a client only rewrites its own shard
+    with ctx(ctx.on.update_status(), state_out) as manager:
+        charm: KarapaceCharm = cast(KarapaceCharm, manager.charm)
+        charm.context.cluster.update({"relation-100": ""})
+        assert "relation-100" not in charm.context.cluster.client_passwords
+        assert len(charm.context.cluster.client_passwords) == len(passwords) - 1
+
+
+def _idle_state(
+    karapace_container, kafka_relation, clients: int, leader: bool, peer_app_data: dict = {}
+) -> State:
+    """State of a running unit with `clients` client applications, all already provisioned."""
+    client_ids = range(100, 100 + clients)
+    secret = Secret(
+        tracked_content={"operator-password": "password"},
+        label="cluster.karapace-k8s.app",
+        owner="app",
+    )
+    passwords = {f"relation-{i}": "password" for i in client_ids}
+    client_secrets = [
+        Secret(tracked_content=shard, label=f"cluster.karapace-k8s.clients.{i}", owner="app")
+        for i, shard in enumerate(_client_shards(passwords))
+        if shard
+    ]
+    peer_relation = PeerRelation(
+        endpoint="cluster",
+        interface="cluster",
+        local_app_data={"internal-secret": secret.id} | peer_app_data,
+        local_unit_data={"private-address": "treebeard"},
+    )
+    client_relations = [
+        Relation(
+            endpoint="karapace",
+            interface="karapace_client",
+            remote_app_name=f"app-{i}",
+            id=i,
+            remote_app_data={"subject": f"subject-{i}", "extra-user-roles": "user"},
+        )
+        for i in client_ids
+    ]
+    # the current layer of the charm, as planned by a previous start
+    with patch.object(KarapaceWorkload, "read", return_value=[]):
+        layer = KarapaceWorkload(container=MagicMock())._karapace_layer
+    karapace_container = dataclasses.replace(karapace_container, layers={"karapace": layer})
+
+    return State(
+        containers=[karapace_container],
+        relations=[peer_relation, kafka_relation, *client_relations],
+        secrets=[secret, *client_secrets],
+        leader=leader,
+    )
+
+
+def _run_idle(ctx: Context, state_in: State, health: KarapaceHealth = HEALTHY) -> State:
+    """Runs update-status on a healthy unit whose config file is already up to date."""
+    with (
+        patch("managers.health.HealthManager.get_health", return_value=health),
+        patch("workload.KarapaceWorkload.active", return_value=True),
+        ctx(ctx.on.update_status(), state_in) as manager,
+    ):
+        charm: KarapaceCharm = cast(KarapaceCharm, manager.charm)
+        with patch(
+            "managers.config.ConfigManager.parsed_confile",
+            new_callable=PropertyMock,
+            return_value=charm.config_manager.config,
+        ):
+            return manager.run()
+
+
+def _hashed(username: str) -> dict[str, str]:
+    return {"username": username, "algorithm": "sha512", "salt": "test", "password_hash": "test"}
+
+
+def _provisioned_authfile(tmp_path, client_ids) -> Mount:
+    """An authfile already holding the operator and all client users, with their ACLs."""
+    users = [_hashed("operator")]
+    permissions = [{"username": "operator", "operation": "Write", "resource": ".*"}]
+    for i in client_ids:
+        username = f"relation-{i}"
+        users.append(_hashed(username))
+        permissions += [
+            {"username": username, "operation": "Read", "resource": "Config:"},
+            {"username": username, "operation": "Read", "resource": f"Subject:subject-{i}.*"},
+        ]
+    authfile = tmp_path / "authfile.json"
+    authfile.write_text(json.dumps({"users": users, "permissions": permissions}))
+
+    return Mount(location=f"{PATHS['CONF']}/authfile.json", source=authfile)
+
+
+@pytest.mark.parametrize("clients", [10, 500])
+def test_update_status_hook_tool_budget(
+    ctx: Context,
+    karapace_container,
+    kafka_relation,
+    patched_workload_write,
+    hook_tool_calls,
+    tmp_path,
+    clients,
+):
+    karapace_container = dataclasses.replace(
+        karapace_container,
+        mounts={"authfile": _provisioned_authfile(tmp_path, range(100, 100 + clients))},
+        execs={Exec(["karapace_mkpasswd"], stdout=json.dumps(_hashed("operator")))},
+    )
+    state_in = _idle_state(karapace_container, kafka_relation, clients, leader=False)
+
+    # the first hook reads the client requests, and hashes the operator password once
+    state_in = _run_idle(ctx, state_in)
+    assert hook_tool_calls["exec"] == 1
+    hook_tool_calls.clear()
+
+    _run_idle(ctx, state_in)
+
+    # nothing grows with the number of clients, their databags are not read again
+    assert hook_tool_calls["relation-get"] <= 5
+    assert hook_tool_calls["secret-get"] <= 6 + CLIENT_SECRET_SHARDS
+    # ops checks leadership on every read of an app databag, answered from its lease cache
+    # after the first `is-leader` in production
+    assert hook_tool_calls["is-leader"] <= 160
+    # the operator password is not hashed again
+    assert not hook_tool_calls["exec"]
+    assert hook_tool_calls["pebble"] <= 10
+    assert not hook_tool_calls["relation-set"]
+    assert not hook_tool_calls["secret-set"]
+
+
+def test_client_requests_read_again_on_relation_changed(
+    ctx: Context, karapace_container, kafka_relation, patched_workload_write, patched_exec
+):
+    patched_exec.return_value = json.dumps(_hashed("operator"))
+    state_in = _idle_state(karapace_container, kafka_relation, clients=1, leader=False)
+    state_in = _run_idle(ctx, state_in)
+    client_relation = next(r for r in state_in.relations if r.endpoint == "karapace")
+    client_relation = dataclasses.replace(
+        client_relation, remote_app_data={"subject": "other", "extra-user-roles": "admin"}
+    )
+    state_in = dataclasses.replace(
+        state_in,
+        relations=[r for r in state_in.relations if r.id != client_relation.id]
+        + [client_relation],
+    )
+
+    # kept in the unit state until the relation changes
+    with (
+        patch("workload.KarapaceWorkload.active", return_value=True),
+        ctx(ctx.on.update_status(), state_in) as manager,
+    ):
+        charm: KarapaceCharm = cast(KarapaceCharm, manager.charm)
+        assert [client.subject for client in charm.context.roster] == ["subject-100"]
+
+    with ctx(ctx.on.relation_changed(client_relation, remote_unit=0), state_in) as manager:
+        charm = cast(KarapaceCharm, manager.charm)
+        manager.run()
+        assert [(client.subject, client.role) for client in charm.context.roster] == [
+            ("other", "admin")
+        ]
+
+
+def test_update_status_publishes_client_data_once(
+    ctx: Context,
+    karapace_container,
+    kafka_relation,
+    patched_workload_write,
+    patched_exec,
+):
+    clients = 20
+    patched_exec.return_value = json.dumps(
+        {"username": "user", "algorithm": "sha512", "salt": "test", "password_hash": "test"}
+    )
+    state_in = _idle_state(karapace_container, kafka_relation, clients, leader=True)
+
+    with patch.object(
+        KarapaceProviderData,
+        "update_relation_data",
+        autospec=True,
+        side_effect=KarapaceProviderData.update_relation_data,
+    ) as update_relation_data:
+        state_out = _run_idle(ctx, state_in)
+        assert update_relation_data.call_count == clients
+
+        # nothing changed, so no relation-changed is fired on the clients
+        update_relation_data.reset_mock()
+        state_out = _run_idle(ctx, state_out)
+        update_relation_data.assert_not_called()
+
+    relation = state_out.get_relation(100)
+    assert relation.local_app_data["subject"] == "subject-100"
+    assert relation.local_app_data["tls"] == "disabled"
+
+
+def test_repeated_leader_hooks_do_not_write_peer_data(
+    ctx: Context,
+    karapace_container,
+    kafka_relation,
+    patched_workload_write,
+    patched_exec,
+):
+    patched_exec.return_value = json.dumps(
+        {"username": "user", "algorithm": "sha512", "salt": "test", "password_hash": "test"}
+    )
+    # written by a previous hook process, as the string of a set
+    state_in = _idle_state(
+        karapace_container,
+        kafka_relation,
+        clients=5,
+        leader=True,
+        peer_app_data={"super-users": "{'relation-104', 'operator'}"},
+    )
+
+    state_out = _run_idle(ctx, state_in)
+    assert json.loads(state_out.get_relations("cluster")[0].local_app_data["super-users"]) == [
+        "operator"
+    ]
+
+    with patch.object(
+        RelationDataContent, "update", autospec=True, side_effect=RelationDataContent.update
+    ) as update:
+        for _ in range(3):
+            state_out = _run_idle(ctx, state_out)
+
+    assert not [call for call in update.call_args_list if call.args[0].relation.name == "cluster"]
+
+
+def test_leader_applies_registry_service(
+    ctx: Context,
+    karapace_container,
+    kafka_relation,
+    patched_workload_write,
+    patched_exec,
+    patched_k8s_service,
+):
+    patched_exec.return_value = json.dumps(
+        {"username": "user", "algorithm": "sha512", "salt": "test", "password_hash": "test"}
+    )
+    state_in = _idle_state(karapace_container, kafka_relation, clients=0, leader=True)
+    state_in = dataclasses.replace(state_in, config={"expose-external": "loadbalancer"})
+
+    state_out = _run_idle(ctx, state_in)
+    patched_k8s_service.assert_called_once_with("loadbalancer")
+
+    # applied again only once the Service changes
+    state_out = _run_idle(ctx, state_out)
+    patched_k8s_service.assert_called_once()
+
+    _run_idle(ctx, dataclasses.replace(state_out, config={"expose-external": "nodeport"}))
+    patched_k8s_service.assert_called_with("nodeport")
+    assert patched_k8s_service.call_count == 2
+
+
+def test_registry_service_spec():
+    manager = K8sManager(pod_name="karapace-k8s-0", namespace="test")
+    with patch.object(K8sManager, "client", new_callable=PropertyMock) as client:
+        client.return_value.get.return_value.metadata.uid = "sts-uid"
+        manager.apply_service("nodeport")
+
+    service = client.return_value.apply.call_args.args[0]
+    assert service.metadata.name == "karapace-k8s-registry"
+    assert service.metadata.ownerReferences[0].uid == "sts-uid"
+    assert service.spec.type == "NodePort"
+    assert service.spec.selector == {"app.kubernetes.io/name": "karapace-k8s"}
+    assert not service.spec.publishNotReadyAddresses
+    assert [port.port for port in service.spec.ports] == [8081]
+
+
+def test_nodeport_endpoint_lists_every_node():
+    manager = K8sManager(pod_name="karapace-k8s-0", namespace="test")
+    service = Service(spec=ServiceSpec(ports=[ServicePort(port=8081, nodePort=30081)]))
+    nodes = [
+        Node(status=NodeStatus(addresses=[NodeAddress(address="10.0.0.2", type="InternalIP")])),
+        Node(
+            status=NodeStatus(
+                addresses=[
+                    NodeAddress(address="10.0.0.1", type="InternalIP"),
+                    NodeAddress(address="203.0.113.1", type="ExternalIP"),
+                ]
+            )
+        ),
+    ]
+    with patch.object(K8sManager, "client", new_callable=PropertyMock) as client:
+        client.return_value.get.return_value = service
+        client.return_value.list.return_value = nodes
+        endpoint = manager.get_service_endpoint("nodeport")
+
+    assert endpoint == "10.0.0.2:30081,203.0.113.1:30081"
+
+
+def test_k8s_client_built_once():
+    manager = K8sManager(pod_name="karapace-k8s-0", namespace="test")
+    with patch("src.managers.k8s.Client") as client:
+        assert manager.client is manager.client
+
+    client.assert_called_once()
+
+
+@pytest.mark.nopatched_disable_service_links
+@pytest.mark.parametrize("enabled", [None, True, False])
+def test_disable_service_links_only_patches_if_enabled(enabled):
+    manager = K8sManager(pod_name="karapace-k8s-0", namespace="test")
+    sts = StatefulSet(
+        metadata=ObjectMeta(name="karapace-k8s", uid="sts-uid"),
+        spec=StatefulSetSpec(
+            selector=LabelSelector(matchLabels={"app.kubernetes.io/name": "karapace-k8s"}),
+            serviceName="karapace-k8s-endpoints",
+            template=PodTemplateSpec(spec=PodSpec(containers=[], enableServiceLinks=enabled)),
+        ),
+    )
+    with patch.object(K8sManager, "client", new_callable=PropertyMock) as client:
+        client.return_value.get.return_value = sts
+        manager.disable_service_links()
+
+    assert client.return_value.patch.called == (enabled is not False)
+
+
+def test_registry_service_not_applied_if_up_to_date():
+    manager = K8sManager(pod_name="karapace-k8s-0", namespace="test")
+    with patch.object(K8sManager, "client", new_callable=PropertyMock) as client:
+        sts = client.return_value.get.return_value
+        sts.metadata.uid = "sts-uid"
+        manager.apply_service("false")
+        applied = client.return_value.apply.call_args.args[0]
+
+        # the live Service now holds the applied spec
+        client.return_value.reset_mock()
+        client.return_value.get.side_effect = lambda resource, name: (
+            applied if resource is Service else sts
+        )
+        manager.apply_service("false")
+        client.return_value.apply.assert_not_called()
+        # the StatefulSet is only fetched to apply changes
+        assert [call.args[0] for call in client.return_value.get.call_args_list] == [Service]
+
+        manager.apply_service("loadbalancer")
+        client.return_value.apply.assert_called_once()
+
+
+def test_registry_service_without_trust():
+    manager = K8sManager(pod_name="karapace-k8s-0", namespace="test")
+
+    def get(resource, name):
+        code = 404 if resource is Service else 403
+        raise ApiError(response=httpx.Response(code, json={"code": code, "message": "denied"}))
+
+    with patch.object(K8sManager, "client", new_callable=PropertyMock) as client:
+        client.return_value.get.side_effect = get
+        manager.apply_service("false")
+
+    client.return_value.apply.assert_not_called()
+
+
+def test_workers_layer():
+    environment = ["KARAPACE_CLIENT_ID=sr-0", "KARAPACE_HOST=karapace-k8s-0.endpoints"]
+    workload = KarapaceWorkload(container=MagicMock(), workers=3)
+    with patch.object(KarapaceWorkload, "read", return_value=environment):
+        layer = workload._karapace_layer.to_dict()
+
+    services = layer["services"]
+    assert workload.services == ["karapace", "karapace-1", "karapace-2"]
+    assert [name for name, service in services.items() if service["startup"] == "enabled"] == [
+        "karapace",
+        "karapace-1",
+        "karapace-2",
+        "karapace-exporter",
+    ]
+    # all workers share the registry port, and advertise their own one
+    assert [
+        (
+            services[name]["environment"]["KARAPACE_PORT"],
+            services[name]["environment"]["KARAPACE_ADVERTISED_PORT"],
+            services[name]["environment"]["KARAPACE_CLIENT_ID"],
+            services[name]["environment"]["KARAPACE_MASTER_ELIGIBILITY"],
+        )
+        for name in workload.services
+    ] == [
+        ("8081", "8082", "sr-0-0", "True"),
+        ("8081", "8083", "sr-0-1", "False"),
+        ("8081", "8084", "sr-0-2", "False"),
+    ]
+    assert services["karapace-1"]["command"].endswith("reuseport.py 8083 karapace")
+    assert layer["checks"]["karapace-ready"]["tcp"]["port"] == 8082
+
+
+def test_single_worker_layer_unchanged():
+    workload = KarapaceWorkload(container=MagicMock(), workers=1)
+    with patch.object(KarapaceWorkload, "read", return_value=["KARAPACE_PORT=8081"]):
+        services = workload._karapace_layer.to_dict()["services"]
+
+    assert workload.services == ["karapace"]
+    assert services["karapace"]["command"] == "python3 -m karapace"
+    assert services["karapace"]["environment"] == {"KARAPACE_PORT": "8081"}
+    assert services["karapace-1"]["startup"] == "disabled"
+
+
+def test_former_balancer_disabled_and_stopped():
+    container = MagicMock()
+    balancer = pebble.Service(
+        "karapace-balancer", {"command": "python3 balancer.py", "startup": "enabled"}
+    )
+    container.get_plan.return_value.services = {"karapace-balancer": balancer}
+    container.get_services.return_value = {"karapace-balancer": MagicMock(is_running=lambda: True)}
+    workload = KarapaceWorkload(container=container, workers=2)
+    with patch.object(KarapaceWorkload, "read", return_value=["KARAPACE_PORT=8081"]):
+        workload._replan(workload._karapace_layer)
+
+    # planned services are never removed, only disabled
+    disabled = container.add_layer.call_args_list[1].args[1].to_dict()
+    assert disabled["services"] == {
+        "karapace-balancer": {"override": "merge", "startup": "disabled"}
+    }
+    container.stop.assert_called_once_with("karapace-balancer")
+
+
+@pytest.mark.parametrize(
+    "cpu_max,nproc,workers",
+    [("250000 100000", "", 3), ("50000 100000", "", 1), ("max 100000", "16", 8)],
+)
+def test_workers_from_cpu_allocation(cpu_max, nproc, workers):
+    workload = KarapaceWorkload(container=MagicMock(), workers=0)
+    with (
+        patch.object(KarapaceWorkload, "read", return_value=[cpu_max]),
+        patch.object(KarapaceWorkload, "exec", return_value=f"{nproc}\n"),
+    ):
+        assert workload.workers == workers
+
+
+def test_workers_change_restarts(
+    ctx: Context,
+    karapace_container,
+    kafka_relation,
+    patched_workload_write,
+    patched_exec,
+    patched_restart,
+):
+    patched_exec.return_value = json.dumps(
+        {"username": "user", "algorithm": "sha512", "salt": "test", "password_hash": "test"}
+    )
+    state_in = _idle_state(karapace_container, kafka_relation, clients=0, leader=True)
+
+    _run_idle(ctx, state_in)
+    patched_restart.assert_not_called()
+
+    _run_idle(ctx, dataclasses.replace(state_in, config={"workers": 2}))
+    patched_restart.assert_called_once()
+
+
+def test_config_file_read_once_per_config_changed(
+    ctx: Context,
+    karapace_container,
+    peer_relation,
+    kafka_relation,
+    patched_workload_write,
+    patched_workload_read,
+    patched_exec,
+):
+    patched_exec.side_effect = patched_exec_side_effects
+    patched_workload_read.return_value = []
+    state_in = State(containers=[karapace_container], relations=[peer_relation, kafka_relation])
+
+    ctx.run(ctx.on.config_changed(), state_in)
+
+    config_path = KarapaceWorkload.paths.karapace_config
+    assert patched_workload_write.call_args_list
+    assert [call.args[0] for call in patched_workload_read.call_args_list].count(config_path) == 1
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_restart_runs_each_service_once(workers):
+    container = MagicMock()
+    workload = KarapaceWorkload(container=container, workers=workers)
+    with (
+        patch.object(KarapaceWorkload, "read", return_value=["KARAPACE_PORT=8081"]),
+        patch.object(KarapaceWorkload, "write") as write,
+    ):
+        container.get_plan.return_value.services = workload._karapace_layer.services
+        workload.restart()
+
+        # an unchanged plan restarts every service, without pushing the scripts again
+        write.assert_not_called()
+        container.replan.assert_called_once()
+        # along with the notifier telling the charm once Karapace is ready
+        container.restart.assert_called_once_with(
+            *workload.services, workload.READY_NOTIFIER_SERVICE
+        )
+
+        # services missing from the plan, e.g after a container restart, are started by replan
+        container.reset_mock()
+        container.get_plan.return_value.services = {}
+        workload.restart()
+
+        # the exporter, latency report and ready notifier, and the worker launcher with more
+        # than one worker
+        assert write.call_count == (4 if workers > 1 else 3)
+        container.replan.assert_called_once()
+        container.restart.assert_called_once_with(workload.READY_NOTIFIER_SERVICE)
+
+
+def test_workers_share_the_registry_port(tmp_path):
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port, own_ports = sock.getsockname()[1], []
+    for _ in range(2):
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            own_ports.append(sock.getsockname()[1])
+
+    # Karapace serves its REST API with `aiohttp.web.run_app`
+    (tmp_path / "registry").mkdir()
+    (tmp_path / "registry" / "__main__.py").write_text(
+        f"import aiohttp.web\naiohttp.web.run_app(app='app', host='127.0.0.1', port={port})\n"
+    )
+    calls = []
+    with (
+        patch.object(sys, "path", [str(tmp_path), *sys.path]),
+        patch.object(sys, "argv", list(sys.argv)),
+    ):
+        # one process per worker
+        for own_port in own_ports:
+            run_app = MagicMock()
+            aiohttp = ModuleType("aiohttp")
+            aiohttp.web = SimpleNamespace(run_app=run_app)  # type: ignore[attr-defined]
+            with patch.dict(sys.modules, {"aiohttp": aiohttp, "aiohttp.web": aiohttp.web}):
+                reuseport.main(own_port, "registry")
+            calls.append(run_app.call_args)
+
+    listeners = [call.kwargs["sock"] for call in calls]
+    try:
+        # both workers bound the registry port, and their own one
+        assert [[sock.getsockname()[1] for sock in socks] for socks in listeners] == [
+            [port, own_port] for own_port in own_ports
+        ]
+        assert all(call.args == ("app",) for call in calls)
+    finally:
+        for sock in itertools.chain(*listeners):
+            sock.close()
+
+
+def test_scrape_jobs_published(ctx: Context, karapace_container, peer_relation):
+    metrics_relation = Relation(endpoint="metrics-endpoint", interface="prometheus_scrape")
+    state_in = State(
+        containers=[karapace_container],
+        relations=[peer_relation, metrics_relation],
+        leader=True,
+        config={"workers": 2},
+    )
+
+    state_out = ctx.run(ctx.on.relation_joined(metrics_relation, remote_unit=0), state_in)
+
+    relation = state_out.get_relation(metrics_relation.id)
+    jobs = json.loads(relation.local_app_data["scrape_jobs"])
+    assert [job["static_configs"][0]["targets"] for job in jobs] == [
+        ["*:8005", "*:8006", "*:8090"],
+    ]
+    assert json.loads(relation.local_app_data["scrape_metadata"])["application"] == "karapace-k8s"
+    assert relation.local_unit_data["prometheus_scrape_unit_name"] == "karapace-k8s/0"
+    assert relation.local_unit_data["prometheus_scrape_unit_address"]
+
+    rules = json.loads(relation.local_app_data["alert_rules"])
+    assert {rule["alert"] for group in rules["groups"] for rule in group["rules"]} >= {
+        "KarapaceP99LatencyRegression",
+        "KarapaceRepeatedRestarts",
+        "KarapaceSlowSchemasReplay",
+    }
+
+
+def test_rejected_alert_rules_logged(ctx: Context, karapace_container, peer_relation):
+    report = {"valid": False, "errors": "invalid rule", "scrape_job_errors": "invalid job"}
+    metrics_relation = Relation(
+        endpoint="metrics-endpoint",
+        interface="prometheus_scrape",
+        remote_app_data={"event": json.dumps(report)},
+    )
+    state_in = State(
+        containers=[karapace_container], relations=[peer_relation, metrics_relation], leader=True
+    )
+
+    ctx.run(ctx.on.relation_changed(metrics_relation, remote_unit=0), state_in)
+
+    errors = [line.message for line in ctx.juju_log if line.level == "ERROR"]
+    assert "Prometheus rejected the alert rules: invalid rule" in errors
+    assert "Prometheus rejected the scrape jobs: invalid job" in errors
+
+
+def test_dashboards_published(ctx: Context, karapace_container, peer_relation):
+    dashboard_relation = Relation(endpoint="grafana-dashboard", interface="grafana_dashboard")
+    state_in = State(
+        containers=[karapace_container],
+        relations=[peer_relation, dashboard_relation],
+        leader=True,
+    )
+
+    # before any Grafana unit joins
+    state_out = ctx.run(ctx.on.relation_created(dashboard_relation), state_in)
+
+    data = json.loads(state_out.get_relation(dashboard_relation.id).local_app_data["dashboards"])
+    template = data["templates"]["file:karapace"]
+    assert template["inject_dropdowns"]
+    dashboard = json.loads(lzma.decompress(base64.b64decode(template["content"])))
+    titles = {panel["title"] for panel in dashboard["panels"]}
+    assert {"p99 latency per endpoint", "_schemas replay time", "Resident memory"} <= titles
+
+
+def test_rejected_dashboards_logged(ctx: Context, karapace_container, peer_relation):
+    report = {"valid": False, "errors": [{"dashboard_id": "file:karapace", "error": "invalid"}]}
+    dashboard_relation = Relation(
+        endpoint="grafana-dashboard",
+        interface="grafana_dashboard",
+        remote_app_data={"event": json.dumps(report)},
+    )
+    state_in = State(
+        containers=[karapace_container], relations=[peer_relation, dashboard_relation], leader=True
+    )
+
+    ctx.run(ctx.on.relation_changed(dashboard_relation, remote_unit=0), state_in)
+
+    errors = [line.message for line in ctx.juju_log if line.level == "ERROR"]
+    assert [error for error in errors if error.startswith("Grafana rejected the dashboards")]
+
+
+def test_charm_metrics_written_on_update_status(
+    ctx: Context,
+    karapace_container,
+    kafka_relation,
+    patched_workload_write,
+    patched_exec,
+):
+    patched_exec.return_value = json.dumps(
+        {"username": "user", "algorithm": "sha512", "salt": "test", "password_hash": "test"}
+    )
+    state_in = _idle_state(karapace_container, kafka_relation, clients=3, leader=False)
+
+    state_out = _run_idle(ctx, state_in)
+
+    metrics = {
+        call.kwargs["content"]
+        for call in patched_workload_write.call_args_list
+        if call.kwargs["path"] == "/etc/karapace/charm-metrics.prom"
+    }
+    assert len(metrics) == 1
+    samples = [line for line in metrics.pop().splitlines() if not line.startswith("#")]
+    # the operator and the client users, no time-to-ready, probe nor dispatch measured yet
+    assert samples == ["karapace_charm_authfile_users 4", "karapace_charm_restarts_total 0"]
+
+    # the next dispatch exports the execution metrics of the previous one
+    patched_workload_write.reset_mock()
+    _run_idle(ctx, state_out)
+    metrics = {
+        call.kwargs["content"]
+        for call in patched_workload_write.call_args_list
+        if call.kwargs["path"] == "/etc/karapace/charm-metrics.prom"
+    }
+    assert len(metrics) == 1
+    samples = [line for line in metrics.pop().splitlines() if not line.startswith("#")]
+    assert 'karapace_charm_hooks_total{event="update-status"} 1' in samples
+    assert [sample for sample in samples if sample.startswith("karapace_charm_pebble_calls")]
+    assert not [sample for sample in samples if "defer" in sample]
+
+
+def test_time_to_ready_reported_by_karapace(
+    ctx: Context,
+    karapace_container,
+    kafka_relation,
+    patched_workload_write,
+    patched_exec,
+):
+    patched_exec.return_value = json.dumps(
+        {"username": "user", "algorithm": "sha512", "salt": "test", "password_hash": "test"}
+    )
+    state_in = _idle_state(karapace_container, kafka_relation, clients=0, leader=False)
+
+    # measured by Karapace from its process start, whenever update-status runs
+    _run_idle(ctx, state_in, health=dataclasses.replace(HEALTHY, startup_seconds=42.0))
+
+    metrics = [
+        call.kwargs["content"]
+        for call in patched_workload_write.call_args_list
+        if call.kwargs["path"] == "/etc/karapace/charm-metrics.prom"
+    ]
+    assert "karapace_charm_time_to_ready_seconds 42" in metrics[-1].splitlines()
+
+
+def test_hook_metrics_flushed_at_most_once_per_interval(
+    ctx: Context, karapace_container, kafka_relation_no_data, patched_workload_write, patched_exec
+):
+    patched_exec.return_value = json.dumps(
+        {"username": "user", "algorithm": "sha512", "salt": "test", "password_hash": "test"}
+    )
+    state_in = _idle_state(karapace_container, kafka_relation_no_data, clients=0, leader=False)
+    state_in = dataclasses.replace(
+        state_in,
+        stored_states=[
+            StoredState(
+                owner_path="KarapaceCharm/ClusterContext[charm_context]",
+                name="unit_state",
+                content={"charm_metrics": "karapace_charm_restarts_total 0\n"},
+            )
+        ],
+    )
+
+    # no Kafka credentials yet, so the event is deferred
+    state_out = ctx.run(ctx.on.config_changed(), state_in)
+
+    metrics = [
+        call.kwargs["content"]
+        for call in patched_workload_write.call_args_list
+        if call.kwargs["path"] == "/etc/karapace/charm-metrics.prom"
+    ]
+    assert len(metrics) == 1
+    assert 'karapace_charm_hooks_total{event="config-changed"} 1' in metrics[0]
+    assert 'karapace_charm_deferred_events{event="config_changed"} 1' in metrics[0]
+
+    # flushed less than a minute ago
+    patched_workload_write.reset_mock()
+    ctx.run(ctx.on.config_changed(), state_out)
+
+    assert not [
+        call
+        for call in patched_workload_write.call_args_list
+        if call.kwargs["path"] == "/etc/karapace/charm-metrics.prom"
+    ]
+
+
+def test_exporter_serves_metrics_file(tmp_path):
+    metrics_file = tmp_path / "charm-metrics.prom"
+    metrics_file.write_text("karapace_charm_restarts_total 2\n")
+    server = HTTPServer(("127.0.0.1", 0), exporter.handler(metrics_file))
+    Thread(target=server.serve_forever, daemon=True).start()
+
+    try:
+        url = f"http://127.0.0.1:{server.server_port}"
+        with urllib.request.urlopen(f"{url}/metrics") as response:
+            assert response.read() == b"karapace_charm_restarts_total 2\n"
+
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(f"{url}/other")
+    finally:
+        server.shutdown()
+
+
+@pytest.mark.parametrize("schema_registry_ready", [True, False])
+def test_ready_notifier(schema_registry_ready):
+    class HealthHandler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:  # noqa: N802
+            body = json.dumps({"schema_registry_ready": schema_registry_ready}).encode()
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args) -> None:
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), HealthHandler)
+    Thread(target=server.serve_forever, daemon=True).start()
+
+    try:
+        url = f"http://127.0.0.1:{server.server_port}/_health"
+        with patch("src.readynotify.subprocess.run") as run:
+            run.return_value.returncode = 0
+            returncode = readynotify.main(url, "canonical.com/karapace/ready", timeout=0.5)
+    finally:
+        server.shutdown()
+
+    # notified once ready, giving up otherwise
+    assert returncode == (0 if schema_registry_ready else 1)
+    assert run.called == schema_registry_ready
+    if schema_registry_ready:
+        assert run.call_args.args[0][1:] == ["notify", "canonical.com/karapace/ready"]
+
+
+def test_logs_forwarded_to_loki_units(ctx: Context, karapace_container, peer_relation):
+    logging_relation = Relation(
+        endpoint="logging",
+        interface="loki_push_api",
+        remote_app_name="loki",
+        remote_units_data={
+            0: {"endpoint": json.dumps({"url": "http://loki-0.loki:3100/loki/api/v1/push"})},
+            1: {"endpoint": json.dumps({"url": "http://loki-1.loki:3100/loki/api/v1/push"})},
+        },
+    )
+    state_in = State(containers=[karapace_container], relations=[peer_relation, logging_relation])
+
+    state_out = ctx.run(ctx.on.relation_changed(logging_relation, remote_unit=0), state_in)
+
+    targets = state_out.get_container("karapace").plan.to_dict()["log-targets"]
+    assert {name: target["location"] for name, target in targets.items()} == {
+        "loki-0": "http://loki-0.loki:3100/loki/api/v1/push",
+        "loki-1": "http://loki-1.loki:3100/loki/api/v1/push",
+    }
+    assert targets["loki-0"]["services"] == ["all"]
+    assert targets["loki-0"]["labels"]["juju_unit"] == "karapace-k8s/0"
+
+    # the departed unit no longer gets any logs
+    logging_relation = dataclasses.replace(
+        logging_relation, remote_units_data={0: logging_relation.remote_units_data[0]}
+    )
+    state_in = dataclasses.replace(state_out, relations=[peer_relation, logging_relation])
+    state_out = ctx.run(
+        ctx.on.relation_departed(logging_relation, remote_unit=1, departing_unit=1), state_in
+    )
+
+    targets = state_out.get_container("karapace").plan.to_dict()["log-targets"]
+    assert targets["loki-0"]["services"] == ["all"]
+    assert "-all" in targets["loki-1"]["services"]
+
+
+def test_loki_endpoints_read_only_when_planned(ctx: Context, karapace_container, peer_relation):
+    logging_relation = Relation(
+        endpoint="logging",
+        interface="loki_push_api",
+        remote_app_name="loki",
+        remote_units_data={
+            0: {"endpoint": json.dumps({"url": "http://loki-0.loki:3100/loki/api/v1/push"})},
+        },
+    )
+    state_in = State(containers=[karapace_container], relations=[peer_relation, logging_relation])
+
+    # not related to Kafka, so nothing is planned
+    with patch(
+        "core.cluster.ClusterContext.loki_endpoints", new_callable=PropertyMock
+    ) as loki_endpoints:
+        ctx.run(ctx.on.update_status(), state_in)
+
+    loki_endpoints.assert_not_called()
+
+
+def test_access_log_sampling_layer():
+    workload = KarapaceWorkload(container=MagicMock(), access_log_sampling=0.25)
+    with patch.object(KarapaceWorkload, "read", return_value=[]):
+        command = workload._karapace_layer.to_dict()["services"]["karapace"]["command"]
+
+    assert command.endswith("logsampler.py 0.25 /var/log/karapace python3 -m karapace")
+
+
+def test_access_logs_off_by_default():
+    workload = KarapaceWorkload(container=MagicMock())
+    with patch.object(KarapaceWorkload, "read", return_value=[]):
+        command = workload._karapace_layer.to_dict()["services"]["karapace"]["command"]
+
+    assert command == "python3 -m karapace"
+    assert not workload.access_logs
+
+    # captures turn access logging on, through the wrapper, even with no entry kept in the logs
+    workload = KarapaceWorkload(container=MagicMock(), access_log_capture=True)
+    with patch.object(KarapaceWorkload, "read", return_value=[]):
+        service = workload._karapace_layer.to_dict()["services"]["karapace"]
+
+    assert service["command"].endswith("logsampler.py 0.0 /var/log/karapace python3 -m karapace")
+    assert service["environment"]["KARAPACE_ACCESS_LOGS_DEBUG"] == "True"
+
+
+def test_logsampler_keeps_fraction_of_access_logs():
+    lines = [b"karapace.schema_reader\tMainThread\tINFO\treplaying\n"] + [
+        b"aiohttp.access\tMainThread\tDEBUG\tGET /subjects 200\n"
+    ] * 8
+    out = io.BytesIO()
+
+    logsampler.sample(lines, out, fraction=0.25)
+
+    kept = out.getvalue().splitlines()
+    assert kept[0].startswith(b"karapace.schema_reader")
+    assert len(kept) == 1 + 2
+
+
+def test_logsampler_captures_access_logs(tmp_path):
+    (tmp_path / "access-capture.json").write_text(
+        json.dumps({"until": time.time() + 60, "max-entries": 3})
+    )
+    lines = [b"aiohttp.access\tMainThread\tDEBUG\tGET /subjects 200\n"] * 5
+
+    # captured whatever the fraction kept in the logs
+    logsampler.sample(lines, io.BytesIO(), fraction=0, capture=logsampler.Capture(tmp_path))
+
+    assert (tmp_path / "access.log").read_bytes() == lines[0] * 3
+
+
+def test_accesslog_report_per_route():
+    lines = [
+        f'aiohttp.access\tMainThread\tDEBUG\t{ms / 1000}s 10.1.0.5 "GET /schemas/ids/{ms} '
+        f'HTTP/1.1" 200 "python-requests" response=12b request_body=-b'
+        for ms in range(1, 101)
+    ] + [
+        'aiohttp.access\tMainThread\tDEBUG\t0.5s - "POST /compatibility/subjects/orders-value/'
+        'versions/latest?verbose=true HTTP/1.1" 200 "-" response=12b request_body=80b',
+        "karapace.schema_reader\tMainThread\tINFO\tnot an access log entry",
+    ]
+
+    report = accesslog.report(lines, max_entries=1000)
+
+    assert report["entries"] == 101
+    assert not report["truncated"]
+    assert report["routes"] == {
+        "GET /schemas/ids/{id}": {"count": 100, "p50-ms": 50.0, "p95-ms": 95.0, "p99-ms": 99.0},
+        "POST /compatibility/subjects/{subject}/versions/{version}": {
+            "count": 1,
+            "p50-ms": 500.0,
+            "p95-ms": 500.0,
+            "p99-ms": 500.0,
+        },
+    }
+    assert accesslog.report(lines, max_entries=10)["truncated"]
+
+
+def _capture_state(state: State) -> dict:
+    return next(
+        stored.content.get("access_capture", {})
+        for stored in state.stored_states
+        if stored.owner_path == "KarapaceCharm/ClusterContext[charm_context]"
+    )
+
+
+def test_latency_report_action(ctx: Context, karapace_container, peer_relation, patched_exec):
+    state_in = State(containers=[karapace_container], relations=[peer_relation])
+
+    with (
+        patch("workload.KarapaceWorkload.active", return_value=True),
+        patch("workload.KarapaceWorkload.write") as write,
+        patch("events.restart.RestartHandler.request_restart") as request_restart,
+    ):
+        # started, returning straight away
+        state_out = ctx.run(
+            ctx.on.action("latency-report", params={"duration": 30, "max-entries": 1000}),
+            state_in,
+        )
+        assert ctx.action_results
+        assert ctx.action_results["status"] == "capturing"
+        assert json.loads(write.call_args.kwargs["content"])["max-entries"] == 1000
+        # access logging is off, Karapace restarts with it on for the capture
+        request_restart.assert_called_once()
+        capture = _capture_state(state_out)
+        assert 29 < capture["until"] - time.time() <= 30
+
+        # still running
+        ctx.run(ctx.on.action("latency-report"), state_out)
+        assert ctx.action_results == {"status": "capturing", "remaining-seconds": "30"}
+
+    patched_exec.return_value = json.dumps(
+        {
+            "entries": 3,
+            "truncated": False,
+            "routes": {
+                "GET /subjects": {"count": 1, "p50-ms": 1.0, "p95-ms": 1.0, "p99-ms": 1.0},
+                "GET /schemas/ids/{id}": {"count": 2, "p50-ms": 2.0, "p95-ms": 3.0, "p99-ms": 3.0},
+            },
+        }
+    )
+    with (
+        patch("workload.KarapaceWorkload.active", return_value=True),
+        patch("managers.access_log.time.time", return_value=capture["until"] + 1),
+        patch("events.logging.time.time", return_value=capture["until"] + 1),
+    ):
+        state_out = ctx.run(ctx.on.action("latency-report"), state_out)
+
+    assert "1000" in patched_exec.call_args_list[-2].kwargs["command"]
+    assert not _capture_state(state_out)
+    assert ctx.action_results == {
+        "status": "done",
+        "entries": "3",
+        "truncated": "false",
+        "route-0": {
+            "route": "GET /schemas/ids/{id}",
+            "count": "2",
+            "p50-ms": "2.0",
+            "p95-ms": "3.0",
+            "p99-ms": "3.0",
+        },
+        "route-1": {
+            "route": "GET /subjects",
+            "count": "1",
+            "p50-ms": "1.0",
+            "p95-ms": "1.0",
+            "p99-ms": "1.0",
+        },
+    }
+
+
+def test_access_logging_turned_off_after_capture(
+    ctx: Context, karapace_container, kafka_relation, patched_exec
+):
+    patched_exec.return_value = json.dumps(_hashed("operator"))
+    # Karapace still runs with the layer of the capture, which has ended
+    with patch.object(KarapaceWorkload, "read", return_value=[]):
+        layer = KarapaceWorkload(container=MagicMock(), access_log_capture=True)._karapace_layer
+    state_in = _idle_state(karapace_container, kafka_relation, clients=0, leader=False)
+    state_in = dataclasses.replace(
+        state_in,
+        containers=[dataclasses.replace(karapace_container, layers={"karapace": layer})],
+        stored_states=[
+            StoredState(
+                owner_path="KarapaceCharm/ClusterContext[charm_context]",
+                name="unit_state",
+                content={"access_capture": {"until": time.time() - 1, "max-entries": 10}},
+            )
+        ],
+    )
+
+    with patch("events.restart.RestartHandler.request_restart") as request_restart:
+        state_out = _run_idle(ctx, state_in)
+
+    request_restart.assert_called_once()
+    # the entries can still be reported
+    assert _capture_state(state_out)
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+import asyncio
+import threading
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+from charms.kafka.v0.client import AsyncKafkaClient, KafkaClient
+
+CLIENT_CONFIG = {
+    "servers": ["kafka-0:9092"],
+    "username": "admin",
+    "password": "password",
+    "security_protocol": "SASL_PLAINTEXT",
+}
+
+
+@pytest.fixture()
+def patched_clients():
+    with (
+        patch("charms.kafka.v0.client.KafkaAdminClient") as admin,
+        patch("charms.kafka.v0.client.KafkaProducer") as producer,
+        patch("charms.kafka.v0.client.KafkaConsumer") as consumer,
+    ):
+        yield admin, producer, consumer
+
+
+def test_context_manager_closes_created_clients_only(patched_clients):
+    admin, producer, consumer = patched_clients
+
+    with KafkaClient(**CLIENT_CONFIG) as client:
+        client.describe_topics(["_schemas"])
+
+    admin.return_value.close.assert_called_once()
+    producer.assert_not_called()
+    consumer.assert_not_called()
+
+
+def test_close_without_clients_creates_none(patched_clients):
+    client = KafkaClient(**CLIENT_CONFIG)
+    client.close()
+    # closing twice is harmless
+    client.close()
+
+    for patched_client in patched_clients:
+        patched_client.assert_not_called()
+
+
+def test_timeouts_passed_to_clients(patched_clients):
+    admin, _, consumer = patched_clients
+
+    with KafkaClient(
+        **CLIENT_CONFIG, request_timeout_ms=5000, connection_timeout_ms=1000
+    ) as client:
+        client.describe_topics(["_schemas"])
+        client.subscribe_to_topic("_schemas")
+
+    admin_config = admin.call_args.kwargs
+    assert admin_config["request_timeout_ms"] == 5000
+    assert admin_config["api_version_auto_timeout_ms"] == 1000
+    assert admin_config["reconnect_backoff_max_ms"] == 1000
+
+    consumer_config = consumer.call_args.kwargs
+    assert consumer_config["session_timeout_ms"] < consumer_config["request_timeout_ms"]
+    consumer.return_value.close.assert_called_once()
+
+
+def test_connection_timeout_unset_keeps_library_defaults(patched_clients):
+    admin, _, _ = patched_clients
+
+    with KafkaClient(**CLIENT_CONFIG) as client:
+        client.describe_topics(["_schemas"])
+
+    admin_config = admin.call_args.kwargs
+    assert "api_version_auto_timeout_ms" not in admin_config
+    assert "reconnect_backoff_max_ms" not in admin_config
+
+
+def test_async_client_runs_calls(patched_clients):
+    admin, _, _ = patched_clients
+    admin.return_value.describe_topics.return_value = [{"topic": "_schemas"}]
+
+    async def run():
+        async with AsyncKafkaClient(**CLIENT_CONFIG) as client:
+            return await client.describe_topics(["_schemas"])
+
+    assert asyncio.run(run()) == [{"topic": "_schemas"}]
+    admin.return_value.close.assert_called_once()
+
+
+def test_async_client_waits_for_timed_out_calls_on_close(patched_clients):
+    admin, _, _ = patched_clients
+    release = threading.Event()
+    closed_after_release = []
+
+    # the call outlives its timeout in the worker thread
+    admin.return_value.describe_topics.side_effect = lambda **_: release.wait(5)
+    admin.return_value.close.side_effect = lambda: closed_after_release.append(release.is_set())
+
+    async def run():
+        client = AsyncKafkaClient(**CLIENT_CONFIG, request_timeout_ms=100, connection_timeout_ms=0)
+        with pytest.raises(asyncio.TimeoutError):
+            await client.describe_topics(["_schemas"])
+
+        asyncio.get_running_loop().call_later(0.2, release.set)
+        await client.close()
+
+    asyncio.run(run())
+
+    assert closed_after_release == [True]
+
+
+def test_topic_size_asks_each_replica_broker(patched_clients):
+    admin, _, _ = patched_clients
+    admin.return_value.describe_topics.return_value = [
+        {"topic": "_schemas", "partitions": [{"partition": 0, "replicas": [1, 2]}]}
+    ]
+
+    def response(broker: int):
+        # log dirs, with the replicas hosted on the broker only
+        log_dir = (0, "/var/lib/kafka", [("_schemas", [(0, 1000 + broker, 0, False)])])
+        return SimpleNamespace(log_dirs=[log_dir])
+
+    with patch("charms.kafka.v0.client.KafkaNetworkClient") as network_client:
+        network_client.return_value.ready.return_value = True
+        network_client.return_value.send.side_effect = lambda broker, _: MagicMock(
+            failed=lambda: False, value=response(broker)
+        )
+        with KafkaClient(**CLIENT_CONFIG) as client:
+            sizes = client.topic_size("_schemas")
+
+    assert sizes == {1: 1001, 2: 1002}
+    assert [call.args[0] for call in network_client.return_value.send.call_args_list] == [1, 2]
+    network_client.return_value.close.assert_called_once()
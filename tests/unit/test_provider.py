@@ -2,10 +2,15 @@
 # Copyright 2024 Canonical Ltd.
 # See LICENSE file for licensing details.
 
+import dataclasses
 import json
-from unittest.mock import patch
+from typing import cast
+from unittest.mock import PropertyMock, patch
 
-from ops.testing import Context, Secret, State
+import pytest
+from ops.testing import Context, Relation, Secret, State
+from src.charm import KarapaceCharm
+from src.literals import INTERNAL_USERS
 
 CHARM_KEY = "karapace"
 KAFKA = "kafka"
@@ -157,3 +162,146 @@ def test_relation_broken(
 
     # Assert user gets removed from databag as well
     assert not state_out.get_relations("cluster")[0].local_app_data.get("relation-5000")
+
+
+def test_roster_built_once_per_dispatch(ctx: Context, karapace_container, peer_relation):
+    admin = Relation(
+        endpoint="karapace",
+        interface="karapace_client",
+        remote_app_name="admin-app",
+        remote_app_data={"subject": "admin-subject", "extra-user-roles": "admin"},
+    )
+    user = Relation(
+        endpoint="karapace",
+        interface="karapace_client",
+        remote_app_name="user-app",
+        remote_app_data={"subject": "user-subject", "extra-user-roles": "user"},
+    )
+    pending_admin = Relation(
+        endpoint="karapace",
+        interface="karapace_client",
+        remote_app_name="pending-app",
+        remote_app_data={"subject": "pending-subject", "extra-user-roles": "admin"},
+    )
+    peer_relation = dataclasses.replace(
+        peer_relation,
+        local_app_data=dict(peer_relation.local_app_data)
+        | {f"relation-{admin.id}": "admin-password", f"relation-{user.id}": "user-password"},
+    )
+    state_in = State(
+        containers=[karapace_container],
+        relations=[peer_relation, admin, user, pending_admin],
+        leader=True,
+    )
+
+    with ctx(ctx.on.start(), state_in) as manager:
+        charm = cast(KarapaceCharm, manager.charm)
+        roster = charm.context.roster
+
+        assert [(client.username, client.role, client.password) for client in roster] == [
+            (f"relation-{admin.id}", "admin", "admin-password"),
+            (f"relation-{user.id}", "user", "user-password"),
+            (f"relation-{pending_admin.id}", "admin", ""),
+        ]
+        assert charm.context.super_users == set(INTERNAL_USERS) | {f"relation-{admin.id}"}
+        assert charm.context.roster is roster
+
+        # a new client password invalidates the roster
+        charm.context.cluster.update({f"relation-{pending_admin.id}": "pending-password"})
+        assert charm.context.roster is not roster
+        assert f"relation-{pending_admin.id}" in charm.context.super_users
+
+
+def test_client_credentials_propagate_on_peer_relation_changed(
+    ctx: Context,
+    karapace_container,
+    peer_relation,
+    kafka_relation,
+    requirer_relation,
+    patched_workload_write,
+    patched_exec,
+):
+    patched_exec.side_effect = patched_exec_side_effects
+    state_in = State(
+        containers=[karapace_container],
+        relations=[peer_relation, kafka_relation, requirer_relation],
+        leader=True,
+    )
+    with patch("workload.KarapaceWorkload.active", return_value=True):
+        state_out = ctx.run(ctx.on.relation_changed(requirer_relation), state_in)
+
+    client_users = state_out.get_relation(peer_relation.id).local_app_data["client-users"]
+    assert json.loads(client_users) == ["relation-5000"]
+
+    # the very next hook on other units adds the client, without waiting for update-status
+    patched_workload_write.reset_mock()
+    patched_workload_write.side_effect = patched_write_side_effects
+    other_unit = dataclasses.replace(state_out, leader=False)
+    peer = other_unit.get_relation(peer_relation.id)
+    ctx.run(ctx.on.relation_changed(peer, remote_unit=1), other_unit)
+
+    patched_workload_write.assert_called_once()
+    authfile = json.loads(patched_workload_write.call_args.kwargs["content"])
+
+    # once synced, further peer changes do not rewrite the authfile
+    patched_workload_write.reset_mock()
+    with patch(
+        "managers.auth.KarapaceAuth.parsed_authfile",
+        new_callable=PropertyMock,
+        return_value=authfile,
+    ):
+        ctx.run(ctx.on.relation_changed(peer, remote_unit=1), other_unit)
+
+    patched_workload_write.assert_not_called()
+
+
+@pytest.mark.parametrize("protocol,scheme", [("http", ""), ("https", "https://")])
+def test_service_endpoint_for_clients_requesting_it(
+    ctx: Context,
+    karapace_container,
+    peer_relation_with_provider,
+    kafka_relation,
+    requirer_relation,
+    patched_workload_write,
+    patched_exec,
+    protocol,
+    scheme,
+):
+    patched_exec.return_value = json.dumps(
+        {"username": "user", "algorithm": "sha512", "salt": "test", "password_hash": "test"}
+    )
+    units_client = Relation(
+        endpoint="karapace",
+        interface="karapace_client",
+        remote_app_name="units-app",
+        remote_app_data={"subject": "units-subject", "extra-user-roles": "user"},
+    )
+    requirer_relation = dataclasses.replace(
+        requirer_relation,
+        remote_app_data=dict(requirer_relation.remote_app_data) | {"endpoint-type": "service"},
+    )
+    state_in = State(
+        containers=[karapace_container],
+        relations=[peer_relation_with_provider, kafka_relation, requirer_relation, units_client],
+        leader=True,
+    )
+    # endpoints follow the listener the unit runs with
+    with (
+        patch("workload.KarapaceWorkload.active", return_value=True),
+        patch(
+            "workload.KarapaceWorkload.listener_protocol",
+            new_callable=PropertyMock,
+            return_value=protocol,
+        ),
+    ):
+        state_out = ctx.run(ctx.on.relation_changed(requirer_relation), state_in)
+        state_out = ctx.run(
+            ctx.on.relation_changed(state_out.get_relation(units_client.id)), state_out
+        )
+
+    service_client = state_out.get_relation(requirer_relation.id).local_app_data
+    assert (
+        service_client["endpoints"] == f"{scheme}karapace-k8s-registry.test.svc.cluster.local:8081"
+    )
+    units = state_out.get_relation(units_client.id).local_app_data
+    assert units["endpoints"] == f"{scheme}karapace-k8s-0.karapace-k8s-endpoints:8081"
@@ -2,15 +2,30 @@
 # Copyright 2023 Canonical Ltd.
 # See LICENSE file for licensing details.
 
+import dataclasses
+import json
 import socket
+from datetime import timedelta
 from pathlib import Path
+from types import SimpleNamespace
 from typing import cast
-from unittest.mock import patch
+from unittest.mock import PropertyMock, patch
 
+import pytest
 import yaml
-from ops.testing import Context, State
+from charmlibs.interfaces.tls_certificates import (
+    Certificate,
+    CertificateAvailableEvent,
+    CertificateRequestAttributes,
+    CertificateSigningRequest,
+    PrivateKey,
+    TLSCertificatesRequiresV4,
+)
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from ops.testing import ActionFailed, Context, PeerRelation, State
 from src.charm import KarapaceCharm
-from src.literals import SUBSTRATE, Status
+from src.literals import SUBSTRATE, TLS_RENEWAL_EARLIEST, TLS_RENEWAL_LATEST, Status
 
 ACTIONS = str(yaml.safe_load(Path("./actions.yaml").read_text()))
 METADATA = str(yaml.safe_load(Path("./metadata.yaml").read_text()))
@@ -58,4 +73,321 @@ def test_sans_config(
                     "karapace-k8s-0",
                     "karapace-k8s-0.karapace-k8s-endpoints",
                     sock_dns,
+                    "karapace-k8s-registry",
+                    f"karapace-k8s-registry.{charm.model.name}.svc.cluster.local",
                 ]
+
+
+def _generate_bundle(private_key: PrivateKey) -> dict[str, str]:
+    ca_key = PrivateKey.generate()
+    ca = Certificate.generate_self_signed_ca(
+        CertificateRequestAttributes(common_name="ca", is_ca=True),
+        ca_key,
+        validity=timedelta(days=1),
+    )
+    csr = CertificateSigningRequest.generate(
+        CertificateRequestAttributes(common_name="karapace-k8s-0"), private_key
+    )
+    certificate = Certificate.generate(csr, ca, ca_key, validity=timedelta(days=1))
+    return {"private-key": private_key.raw, "certificate": certificate.raw, "ca-cert": ca.raw}
+
+
+def test_tls_bundle_installed_only_on_change(
+    ctx: Context,
+    karapace_container,
+    peer_relation,
+    kafka_relation_tls,
+    tls_relation,
+    patched_workload_write,
+    patched_workload_read,
+    patched_exec,
+):
+    state_in = State(
+        containers=[karapace_container],
+        relations=[peer_relation, kafka_relation_tls, tls_relation],
+        leader=True,
+    )
+    private_key = PrivateKey.generate()
+    bundle = _generate_bundle(private_key)
+    patched_workload_read.return_value = []
+
+    with ctx(ctx.on.start(), state_in) as manager:
+        charm: KarapaceCharm = cast(KarapaceCharm, manager.charm)
+
+        # incomplete bundle, nothing written
+        charm.context.server.update({"private-key": bundle["private-key"]})
+        assert not charm.tls_manager.install_bundle()
+        assert patched_workload_write.call_count == 0
+
+        charm.context.server.update(bundle)
+        assert charm.tls_manager.install_bundle()
+        assert {call.kwargs["content"] for call in patched_workload_write.call_args_list} == set(
+            bundle.values()
+        )
+        # written aside, then renamed over the installed files
+        assert {call.kwargs["path"] for call in patched_workload_write.call_args_list} == {
+            f"{path}.tmp" for path in charm.tls_manager.bundle
+        }
+        assert {call.args[0] for call in patched_exec.call_args_list} == {
+            f"mv -f {path}.tmp {path}" for path in charm.tls_manager.bundle
+        }
+
+        # same contents already on disk, nothing written
+        patched_workload_write.reset_mock()
+        patched_exec.reset_mock()
+        patched_workload_read.side_effect = lambda path: charm.tls_manager.bundle[path].split("\n")
+        assert not charm.tls_manager.install_bundle()
+        assert patched_workload_write.call_count == 0
+        assert patched_exec.call_count == 0
+        patched_workload_read.side_effect = None
+
+        # renewed certificate for another key, the bundle is not installed
+        charm.context.server.update(
+            {"certificate": _generate_bundle(PrivateKey.generate())["certificate"]}
+        )
+        assert not charm.tls_manager.install_bundle()
+        assert patched_workload_write.call_count == 0
+
+
+def test_https_listener_with_certificate(
+    ctx: Context,
+    karapace_container,
+    peer_relation,
+    kafka_relation_tls,
+    tls_relation,
+):
+    peer_relation = dataclasses.replace(
+        peer_relation, local_app_data=peer_relation.local_app_data | {"tls": "enabled"}
+    )
+    state_in = State(
+        containers=[karapace_container],
+        relations=[peer_relation, kafka_relation_tls, tls_relation],
+        leader=True,
+    )
+
+    with ctx(ctx.on.start(), state_in) as manager:
+        charm: KarapaceCharm = cast(KarapaceCharm, manager.charm)
+
+        # no certificate yet, the listener stays on HTTP
+        assert charm.config_manager.config["advertised_protocol"] == "http"
+        assert charm.config_manager.config["server_tls_certfile"] is None
+        assert charm.health_manager.url.startswith("http://")
+
+        charm.context.server.update(_generate_bundle(PrivateKey.generate()))
+
+        config = charm.config_manager.config
+        assert config["advertised_protocol"] == "https"
+        assert config["server_tls_certfile"] == charm.workload.paths.ssl_certfile
+        assert config["server_tls_keyfile"] == charm.workload.paths.ssl_keyfile
+
+        # still serving HTTP until restarted with the certificate
+        assert charm.health_manager.url.startswith("http://")
+        assert charm.provider._endpoints("units") == "karapace-k8s-0.karapace-k8s-endpoints:8081"
+
+        charm.workload.container.add_layer(
+            "karapace",
+            {
+                "services": {
+                    "karapace": {
+                        "override": "merge",
+                        "environment": {
+                            "KARAPACE_SERVER_TLS_CERTFILE": config["server_tls_certfile"]
+                        },
+                    }
+                }
+            },
+            combine=True,
+        )
+        assert charm.health_manager.url.startswith("https://")
+        assert charm.health_manager.ssl_context
+        assert (
+            charm.provider._endpoints("units")
+            == "https://karapace-k8s-0.karapace-k8s-endpoints:8081"
+        )
+
+
+def test_first_certificate_restarts_once(
+    ctx: Context,
+    karapace_container,
+    peer_relation,
+    kafka_relation_tls,
+    tls_relation,
+    patched_workload_write,
+    patched_workload_read,
+    patched_restart,
+    patched_exec,
+):
+    peer_relation = dataclasses.replace(
+        peer_relation, local_app_data=peer_relation.local_app_data | {"tls": "enabled"}
+    )
+    state_in = State(
+        containers=[karapace_container],
+        relations=[peer_relation, kafka_relation_tls, tls_relation],
+        leader=True,
+    )
+    private_key = PrivateKey.generate()
+    bundle = _generate_bundle(private_key)
+    hashed_password = json.dumps(
+        {"username": "user", "algorithm": "sha512", "salt": "test", "password_hash": "test"}
+    )
+
+    # files of the workload container, starting with the rendered HTTP config
+    files: dict[str, str] = {}
+
+    def read(path: str) -> list[str]:
+        return files[path].split("\n") if path in files else []
+
+    def container_exec(command: str, **_) -> str:
+        if command.startswith("mv "):
+            source, target = command.split()[-2:]
+            files[target] = files.pop(source)
+            return ""
+        return hashed_password
+
+    patched_exec.side_effect = container_exec
+
+    patched_workload_write.side_effect = lambda content, path: files.update({path: content})
+    patched_workload_read.side_effect = read
+    # the config the unit restarts with
+    restarted_with = []
+    patched_restart.side_effect = lambda: restarted_with.append(json.loads(files[config_path]))
+
+    with (
+        patch.object(
+            TLSCertificatesRequiresV4,
+            "private_key",
+            new_callable=PropertyMock,
+            return_value=private_key,
+        ),
+        # the layer is up to date once restarted
+        patch("workload.KarapaceWorkload.layer_changed", return_value=False),
+        patch("managers.health.HealthManager.get_health", return_value=None),
+        ctx(ctx.on.update_status(), state_in) as manager,
+    ):
+        charm: KarapaceCharm = cast(KarapaceCharm, manager.charm)
+        config_path = charm.workload.paths.karapace_config
+        charm.context.server.update({"private-key": private_key.raw})
+        charm.config_manager.write_config_file()
+        assert json.loads(files[config_path])["advertised_protocol"] == "http"
+
+        charm.tls._on_certificate_available(
+            cast(
+                CertificateAvailableEvent,
+                SimpleNamespace(
+                    certificate=Certificate.from_string(bundle["certificate"]),
+                    ca=Certificate.from_string(bundle["ca-cert"]),
+                ),
+            )
+        )
+
+    assert [config["advertised_protocol"] for config in restarted_with] == ["https"]
+    assert files[charm.workload.paths.ssl_certfile] == bundle["certificate"]
+
+
+@pytest.mark.parametrize("key_type", ["rsa", "ecdsa"])
+def test_set_tls_private_key_key_types(
+    ctx: Context, karapace_container, peer_relation, kafka_relation_tls, tls_relation, key_type
+):
+    state_in = State(
+        containers=[karapace_container],
+        relations=[peer_relation, kafka_relation_tls, tls_relation],
+        config={"tls-key-type": key_type},
+    )
+
+    with ctx(ctx.on.action("set-tls-private-key"), state_in) as manager:
+        charm: KarapaceCharm = cast(KarapaceCharm, manager.charm)
+        manager.run()
+
+        private_key = charm.context.server.private_key
+        assert PrivateKey.from_string(private_key).is_valid()
+        assert ("BEGIN RSA PRIVATE KEY" in private_key) == (key_type == "rsa")
+
+        # CSRs are signed with the unit key, whatever its type
+        csr = CertificateSigningRequest.generate(
+            CertificateRequestAttributes(common_name="karapace-k8s-0"),
+            PrivateKey.from_string(private_key),
+        )
+        assert csr.matches_private_key(PrivateKey.from_string(private_key))
+
+
+def test_set_tls_private_key_rejects_weak_keys(
+    ctx: Context, karapace_container, peer_relation, kafka_relation_tls, tls_relation
+):
+    weak_key = (
+        ec.generate_private_key(ec.SECP192R1())
+        .private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        )
+        .decode()
+    )
+    state_in = State(
+        containers=[karapace_container],
+        relations=[peer_relation, kafka_relation_tls, tls_relation],
+    )
+
+    with pytest.raises(ActionFailed):
+        ctx.run(ctx.on.action("set-tls-private-key", params={"internal-key": weak_key}), state_in)
+
+
+def test_renewal_windows_do_not_overlap(karapace_container, tls_relation):
+    # unit ids left over after scaling down and up again
+    unit_ids = [0, 3, 7]
+    fractions = []
+    for unit_id in unit_ids:
+        peer_relation = PeerRelation(
+            endpoint="cluster",
+            interface="cluster",
+            local_app_data={"operator-password": "password"},
+            local_unit_data={"private-address": "treebeard"},
+            peers_data={peer: {} for peer in unit_ids if peer != unit_id},
+        )
+        state_in = State(
+            containers=[karapace_container],
+            relations=[peer_relation, tls_relation],
+            planned_units=3,
+        )
+        ctx = Context(KarapaceCharm, unit_id=unit_id)
+        with ctx(ctx.on.start(), state_in) as manager:
+            charm: KarapaceCharm = cast(KarapaceCharm, manager.charm)
+            fractions.append(charm.tls.renewal_relative_time)
+            assert charm.tls.certificates.renewal_relative_time == fractions[-1]
+
+    window = (TLS_RENEWAL_LATEST - TLS_RENEWAL_EARLIEST) / 3
+    for slot, fraction in enumerate(fractions):
+        assert TLS_RENEWAL_LATEST - slot * window - window / 2 <= fraction
+        assert fraction <= TLS_RENEWAL_LATEST - slot * window
+
+
+def test_renewal_time_not_computed_on_other_hooks(
+    ctx: Context, karapace_container, peer_relation, tls_relation
+):
+    state_in = State(containers=[karapace_container], relations=[peer_relation, tls_relation])
+
+    with patch(
+        "events.tls.TLSHandler.renewal_relative_time", new_callable=PropertyMock
+    ) as renewal_relative_time:
+        ctx.run(ctx.on.update_status(), state_in)
+
+    renewal_relative_time.assert_not_called()
+
+
+def test_get_tls_renewal_schedule(ctx: Context, karapace_container, peer_relation, tls_relation):
+    peer_relation = dataclasses.replace(
+        peer_relation,
+        local_unit_data=peer_relation.local_unit_data
+        | {
+            "certificate-expiry": "2026-01-01T00:00:00+00:00",
+            "certificate-renewal": "2025-11-01T00:00:00+00:00",
+        },
+        peers_data={1: {}},
+    )
+    state_in = State(containers=[karapace_container], relations=[peer_relation, tls_relation])
+
+    ctx.run(ctx.on.action("get-tls-renewal-schedule"), state_in)
+
+    assert ctx.action_results == {
+        "unit-0": {"expiry": "2026-01-01T00:00:00+00:00", "renewal": "2025-11-01T00:00:00+00:00"},
+        "unit-1": {"expiry": "none", "renewal": "none"},
+    }